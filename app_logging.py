@@ -0,0 +1,99 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+LOG_FILE = Path('app.log')
+# ローテーションするファイルサイズと世代数
+MAX_BYTES = 5 * 1024 * 1024
+BACKUP_COUNT = 3
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+class JsonFormatter(logging.Formatter):
+    """ログレコードを1行のJSONに変換する"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'function': record.funcName,
+            'line': record.lineno,
+            'thread': record.threadName,
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """呼び出し元スレッドでは最小限の処理だけを行うQueueHandler"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # メッセージの確定と例外情報の文字列化だけを行い、整形は書き込みスレッドに任せる
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+def setup_logging(debug_mode: bool = False, log_file: Optional[Path] = None):
+    """
+    ロギングの設定
+
+    全てのログはキュー経由で専用スレッドに渡され、ローテーションするJSONファイルと
+    標準エラー出力に書き込まれる。呼び出し元のスレッドはキューへの追加だけを行う。
+
+    Args:
+        debug_mode: Trueの場合はDEBUGレベルまで出力し、コンソールにも詳細を表示する
+        log_file: ログファイルのパス（省略時は app.log）
+    """
+    global _listener
+    shutdown_logging()
+
+    log_file = Path(log_file) if log_file else LOG_FILE
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT, encoding='utf-8', delay=True
+    )
+    file_handler.setFormatter(JsonFormatter())
+    file_handler.setLevel(logging.DEBUG if debug_mode else logging.INFO)
+
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.DEBUG if debug_mode else logging.ERROR)
+    console_handler.setFormatter(logging.Formatter(
+        '%(asctime)s - %(levelname)s - %(message)s' if debug_mode else '%(message)s'
+    ))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(
+        log_queue, file_handler, console_handler, respect_handler_level=True
+    )
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_QueueHandler(log_queue))
+    root.setLevel(logging.DEBUG if debug_mode else logging.INFO)
+
+    _listener.start()
+
+def shutdown_logging():
+    """キューに残ったログを書き出して書き込みスレッドを停止する"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+atexit.register(shutdown_logging)
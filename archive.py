@@ -0,0 +1,225 @@
+import logging
+import re
+import sqlite3
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Optional, Type
+import change_log
+from database import MeditationRecord, db
+from metrics import metrics
+
+logger = logging.getLogger('archive')
+
+RECORD_TABLE = MeditationRecord._meta.table_name
+# 瞑想記録と全アーカイブをまとめて参照する一時ビュー
+ARCHIVE_VIEW = 'all_meditation_records'
+ARCHIVE_PATTERN = re.compile(r'meditation_archive_(\d{4})\.db$')
+
+class ArchivedMeditationRecord(MeditationRecord):
+    """アーカイブを含む全期間の瞑想記録（読み取り専用）"""
+
+    class Meta:
+        table_name = ARCHIVE_VIEW
+
+class ArchiveManager:
+    """
+    古い瞑想記録を年ごとのアーカイブデータベースに移すマネージャー
+
+    アーカイブは archives/meditation_archive_YYYY.db に置く。検索・エクスポート・
+    統計では attach で全アーカイブを接続し、ARCHIVE_VIEW を通して現在の
+    データベースと区別なく参照できる。アーカイブがなければ現在のテーブルを
+    そのまま使う。
+    """
+
+    def __init__(self, db_path: Optional[Path] = None, archive_dir: Optional[Path] = None):
+        self.db_path = Path(db_path) if db_path else Path('meditation.db')
+        self.archive_dir = Path(archive_dir) if archive_dir else self.db_path.parent / 'archives'
+
+    def archive_path(self, year: int) -> Path:
+        return self.archive_dir / f'meditation_archive_{year:04d}.db'
+
+    def archive_files(self) -> Dict[int, Path]:
+        """{年: アーカイブファイル}（年の昇順）"""
+        if not self.archive_dir.is_dir():
+            return {}
+        files = {}
+        for path in self.archive_dir.iterdir():
+            match = ARCHIVE_PATTERN.match(path.name)
+            if match:
+                files[int(match.group(1))] = path
+        return dict(sorted(files.items()))
+
+    def attach(self, conn: sqlite3.Connection) -> str:
+        """
+        全アーカイブを接続して、全期間を参照するテーブル名を返す
+
+        何度呼んでもよく、新しく作られたアーカイブだけを追加で接続する。
+
+        Args:
+            conn: 瞑想記録のデータベースへの接続
+
+        Returns:
+            アーカイブがあれば ARCHIVE_VIEW、なければ瞑想記録のテーブル名
+        """
+        files = self.archive_files()
+        if not files:
+            conn.execute(f'DROP VIEW IF EXISTS temp.{ARCHIVE_VIEW}')
+            return RECORD_TABLE
+
+        attached = {row[1] for row in conn.execute('PRAGMA database_list')}
+        schemas = []
+        for year, path in files.items():
+            schema = f'archive_{year}'
+            if schema not in attached:
+                try:
+                    conn.execute('ATTACH DATABASE ? AS ' + schema, (str(path),))
+                except sqlite3.OperationalError as e:
+                    # 同時に接続できるデータベース数の上限を超えた場合など
+                    logger.warning(f'Failed to attach archive {path}: {str(e)}')
+                    continue
+            schemas.append(schema)
+
+        selects = [f'SELECT * FROM main.{RECORD_TABLE}']
+        selects += [f'SELECT * FROM {schema}.{RECORD_TABLE}' for schema in schemas]
+        conn.execute(f'DROP VIEW IF EXISTS temp.{ARCHIVE_VIEW}')
+        conn.execute(f'CREATE TEMP VIEW {ARCHIVE_VIEW} AS ' + ' UNION ALL '.join(selects))
+        return ARCHIVE_VIEW
+
+    def model(self) -> Type[MeditationRecord]:
+        """
+        アーカイブを含む全期間の瞑想記録を検索するためのモデル
+
+        アプリのデータベース接続（database.db）にアーカイブを接続する。
+        検索条件や並び順には、返されたモデルのフィールドを使う。
+
+        Returns:
+            アーカイブがあれば ArchivedMeditationRecord、なければ MeditationRecord
+        """
+        if not self.archive_files():
+            return MeditationRecord
+        self.attach(db.connection())
+        return ArchivedMeditationRecord
+
+    @metrics.timed('archive.run')
+    def archive_old_sessions(self, older_than_days: int) -> Dict[int, int]:
+        """
+        指定日数より前に開始した記録を年ごとのアーカイブに移す
+
+        年ごとに1つのトランザクションでアーカイブへの追加と削除を行う。
+        移動は削除ではないので、変更ログには墓標を残さない（同期や
+        差分エクスポートで削除として扱われないようにする）。
+
+        Args:
+            older_than_days: この日数より前の記録を移す
+
+        Returns:
+            {年: 移した件数}
+        """
+        cutoff = (date.today() - timedelta(days=older_than_days)).strftime('%Y-%m-%d')
+        moved: Dict[int, int] = {}
+
+        conn = sqlite3.connect(str(self.db_path), isolation_level=None)
+        try:
+            table_sql = conn.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (RECORD_TABLE,)
+            ).fetchone()
+            if table_sql is None:
+                return moved
+            table_sql = self._ensure_autoincrement(conn, table_sql[0])
+            change_log.install(conn)
+            self._reserve_archived_ids(conn)
+            years = [int(row[0]) for row in conn.execute(f"""
+                SELECT DISTINCT substr(start_time, 1, 4) FROM {RECORD_TABLE}
+                WHERE start_time < ? ORDER BY 1
+            """, (cutoff,))]
+            if not years:
+                return moved
+
+            self.archive_dir.mkdir(parents=True, exist_ok=True)
+            for year in years:
+                moved[year] = self._move_year(conn, table_sql, year, cutoff)
+        finally:
+            conn.close()
+
+        logger.info(f'Archived sessions before {cutoff}: {moved}')
+        return moved
+
+    def _ensure_autoincrement(self, conn: sqlite3.Connection, table_sql: str) -> str:
+        """
+        瞑想記録のテーブルを AUTOINCREMENT に作り直す（作り直し済みなら何もしない）
+
+        AUTOINCREMENT でないテーブルでは、最大のIDの記録をアーカイブに移すと
+        そのIDが次の追加で再利用され、アーカイブの記録と衝突する。
+
+        Returns:
+            作り直した後のテーブル定義
+        """
+        if re.search(r'\bAUTOINCREMENT\b', table_sql, re.IGNORECASE):
+            return table_sql
+        new_sql = re.sub(r'\bPRIMARY KEY\b', 'PRIMARY KEY AUTOINCREMENT', table_sql, count=1, flags=re.IGNORECASE)
+        indexes = [row[0] for row in conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (RECORD_TABLE,)
+        )]
+        temp_table = f'{RECORD_TABLE}_rebuild'
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(re.sub(r'^CREATE TABLE\s+(IF NOT EXISTS\s+)?("?)\w+\2', f'CREATE TABLE "{temp_table}"',
+                                new_sql, count=1))
+            conn.execute(f'INSERT INTO {temp_table} SELECT * FROM {RECORD_TABLE}')
+            # 変更ログのトリガーもテーブルと一緒に消えるので、呼び出し側で作り直す
+            conn.execute(f'DROP TABLE {RECORD_TABLE}')
+            conn.execute(f'ALTER TABLE {temp_table} RENAME TO {RECORD_TABLE}')
+            for index_sql in indexes:
+                conn.execute(index_sql)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        logger.info(f'Rebuilt {RECORD_TABLE} with AUTOINCREMENT ids')
+        return conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (RECORD_TABLE,)
+        ).fetchone()[0]
+
+    def _reserve_archived_ids(self, conn: sqlite3.Connection):
+        """新しい記録のIDがアーカイブ済みの記録のIDより大きくなるようにする"""
+        archived = 0
+        for path in self.archive_files().values():
+            with sqlite3.connect(str(path)) as archive:
+                row = archive.execute(f'SELECT MAX(id) FROM {RECORD_TABLE}').fetchone()
+            archived = max(archived, row[0] or 0)
+        row = conn.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (RECORD_TABLE,)).fetchone()
+        if row is None:
+            conn.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)', (RECORD_TABLE, archived))
+        elif row[0] < archived:
+            conn.execute('UPDATE sqlite_sequence SET seq = ? WHERE name = ?', (archived, RECORD_TABLE))
+
+    def _move_year(self, conn: sqlite3.Connection, table_sql: str, year: int, cutoff: str) -> int:
+        conn.execute('ATTACH DATABASE ? AS archive', (str(self.archive_path(year)),))
+        try:
+            conn.execute(re.sub(r'^CREATE TABLE\s+', 'CREATE TABLE IF NOT EXISTS archive.', table_sql, count=1))
+            conn.execute(f'CREATE INDEX IF NOT EXISTS archive.{RECORD_TABLE}_start_time '
+                         f'ON {RECORD_TABLE} (start_time)')
+
+            where = 'start_time >= ? AND start_time < ? AND start_time < ?'
+            # '2021' のような数字だけの文字列は DATETIME 列と数値で比較されるので日付で渡す
+            params = (f'{year:04d}-01-01', f'{year + 1:04d}-01-01', cutoff)
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                seq = change_log.latest_seq(conn)
+                # IDは再利用されないので、アーカイブ済みの記録と衝突したら移さずに失敗させる
+                conn.execute(f'INSERT INTO archive.{RECORD_TABLE} '
+                             f'SELECT * FROM main.{RECORD_TABLE} WHERE {where}', params)
+                count = conn.execute(f'DELETE FROM main.{RECORD_TABLE} WHERE {where}', params).rowcount
+                # この移動で削除トリガーが記録した墓標だけを取り消す
+                conn.execute(f'DELETE FROM {change_log.CHANGE_TABLE} WHERE seq > ?', (seq,))
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        finally:
+            conn.execute('DETACH DATABASE archive')
+        return count
+
+# グローバルなArchiveManagerインスタンス
+archive_manager = ArchiveManager()
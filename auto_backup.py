@@ -0,0 +1,316 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+import change_log
+from database import BACKUP_PATH
+from metrics import metrics
+
+logger = logging.getLogger('auto_backup')
+
+# 1ステップでコピーするページ数（この単位で中断・休止する）
+PAGES_PER_STEP = 64
+# バックアップの書き込み速度の上限（バイト/秒）
+MAX_BYTES_PER_SECOND = 4 * 1024 * 1024
+# この件数の瞑想が保存されたらバックアップする
+SESSIONS_PER_BACKUP = 5
+# 変更がなくてもこの間隔（秒）でバックアップを取り直す
+BACKUP_INTERVAL = 24 * 60 * 60
+
+class AutoBackupInterrupted(Exception):
+    """瞑想の開始などでバックアップが中断された"""
+
+class AutoBackupScheduler:
+    """
+    データベースの自動バックアップを補助スレッドで行うスケジューラー
+
+    次のいずれかでバックアップする（瞑想中は行わない）。
+
+    - 未保存の変更があり、瞑想していない状態が idle_delay 秒続いた
+    - 瞑想が sessions_per_backup 件保存された
+    - 前回のバックアップから interval 秒以上たった
+
+    全体のコピーはSQLiteのバックアップAPIで少しずつ行い、ステップごとに
+    休んで書き込み速度を max_bytes_per_second に抑える。pause() されると
+    コピーを中断して、書きかけのファイルは捨てる。
+
+    終了時の flush() は全体をコピーせず、前回のバックアップ以降に変更ログに
+    記録された記録だけをバックアップに反映する。
+    """
+
+    def __init__(self, db_path: Optional[Path] = None, backup_path: Optional[Path] = None,
+                 idle_delay: float = 120.0, check_interval: float = 30.0,
+                 sessions_per_backup: int = SESSIONS_PER_BACKUP, interval: float = BACKUP_INTERVAL,
+                 pages_per_step: int = PAGES_PER_STEP, max_bytes_per_second: int = MAX_BYTES_PER_SECOND):
+        """
+        Args:
+            db_path: データベースファイル
+            backup_path: バックアップファイル（起動時の復元に使うファイル）
+            idle_delay: アイドルになってからバックアップするまでの時間（秒）
+            check_interval: 条件を確認する間隔（秒）
+            sessions_per_backup: バックアップする保存件数
+            interval: 定期バックアップの間隔（秒）
+            pages_per_step: 1ステップでコピーするページ数
+            max_bytes_per_second: 書き込み速度の上限（0以下なら制限しない）
+        """
+        self.db_path = Path(db_path) if db_path else Path('meditation.db')
+        self.backup_path = Path(backup_path) if backup_path else Path(BACKUP_PATH)
+        self.idle_delay = idle_delay
+        self.check_interval = check_interval
+        self.sessions_per_backup = sessions_per_backup
+        self.interval = interval
+        self.pages_per_step = pages_per_step
+        self.max_bytes_per_second = max_bytes_per_second
+        self._lock = threading.Lock()
+        self._paused = False
+        self._idle_since = time.monotonic()
+        self._saved_sessions = 0
+        self._progress: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    @property
+    def progress(self) -> Optional[float]:
+        """実行中のバックアップの進捗（0.0〜1.0、実行中でなければNone）"""
+        return self._progress
+
+    def start(self):
+        """補助スレッドでスケジューラーを開始する"""
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._idle_since = time.monotonic()
+        self._thread = threading.Thread(target=self._loop, name='AutoBackupScheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """スケジューラーを停止する（実行中のコピーは中断する）"""
+        if not self.running:
+            return
+        self._stop_event.set()
+        self._wake_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def pause(self):
+        """バックアップを止める（瞑想の開始時に呼ぶ）"""
+        with self._lock:
+            self._paused = True
+
+    def resume(self):
+        """バックアップできる状態に戻す（瞑想の終了時に呼ぶ）"""
+        with self._lock:
+            self._paused = False
+            self._idle_since = time.monotonic()
+
+    def session_saved(self):
+        """瞑想の記録が保存されたことを知らせる"""
+        with self._lock:
+            self._saved_sessions += 1
+            self._idle_since = time.monotonic()
+            wake = self._saved_sessions >= self.sessions_per_backup
+        if wake:
+            self._wake_event.set()
+
+    def _check_paused(self):
+        with self._lock:
+            if self._paused or self._stop_event.is_set():
+                raise AutoBackupInterrupted()
+
+    def _loop(self):
+        while not self._stop_event.is_set():
+            self._wake_event.wait(self.check_interval)
+            self._wake_event.clear()
+            if self._stop_event.is_set():
+                break
+            reason = self.due_reason()
+            if reason is None:
+                continue
+            try:
+                self.run_backup(reason)
+            except AutoBackupInterrupted:
+                logger.info(f'Automatic backup ({reason}) interrupted')
+            except Exception as e:
+                logger.error(f'Automatic backup failed: {str(e)}')
+
+    def _change_seq(self, conn: sqlite3.Connection, schema: str = 'main') -> Optional[int]:
+        """
+        変更ログの通し番号（変更ログがなければNone）
+
+        墓標の圧縮で MAX(seq) が戻ることがあるので、AUTOINCREMENT の
+        カウンター（sqlite_sequence）を使う。
+        """
+        try:
+            row = conn.execute(f'SELECT seq FROM {schema}.sqlite_sequence WHERE name = ?',
+                               (change_log.CHANGE_TABLE,)).fetchone()
+        except sqlite3.OperationalError:
+            return None
+        return row[0] if row else 0
+
+    def _backed_up_seq(self) -> Optional[int]:
+        if not self.backup_path.exists():
+            return None
+        try:
+            conn = sqlite3.connect(f'{self.backup_path.resolve().as_uri()}?mode=ro', uri=True)
+            try:
+                return self._change_seq(conn)
+            finally:
+                conn.close()
+        except sqlite3.DatabaseError:
+            return None
+
+    def pending_changes(self) -> bool:
+        """前回のバックアップ以降にデータベースが変更されたかどうか"""
+        backed_up = self._backed_up_seq()
+        if backed_up is None:
+            return True
+        conn = sqlite3.connect(str(self.db_path))
+        try:
+            return self._change_seq(conn) != backed_up
+        finally:
+            conn.close()
+
+    def due_reason(self) -> Optional[str]:
+        """今バックアップすべき理由（'sessions' / 'interval' / 'idle'、不要ならNone）"""
+        with self._lock:
+            if self._paused:
+                return None
+            saved = self._saved_sessions
+            idle = time.monotonic() - self._idle_since >= self.idle_delay
+        if not self.db_path.exists():
+            return None
+        if saved >= self.sessions_per_backup:
+            return 'sessions'
+        if not self.backup_path.exists() or time.time() - self.backup_path.stat().st_mtime >= self.interval:
+            return 'interval'
+        if idle and self.pending_changes():
+            return 'idle'
+        return None
+
+    def run_backup(self, reason: str = 'manual', throttle: bool = True):
+        """
+        データベース全体をバックアップする
+
+        一時ファイルに書いてから置き換えるので、中断しても前回のバックアップは残る。
+
+        Args:
+            reason: ログに残す理由
+            throttle: False の場合は速度を抑えず、中断もしない（終了時用）
+
+        Raises:
+            AutoBackupInterrupted: pause() または stop() で中断された場合
+        """
+        with self._lock:
+            saved, self._saved_sessions = self._saved_sessions, 0
+        start = time.perf_counter()
+        temp_path = self.backup_path.with_name(self.backup_path.name + '.tmp')
+        source = sqlite3.connect(str(self.db_path))
+        target = sqlite3.connect(str(temp_path))
+        page_size = source.execute('PRAGMA page_size').fetchone()[0]
+        step_delay = (self.pages_per_step * page_size / self.max_bytes_per_second
+                      if self.max_bytes_per_second > 0 else 0.0)
+
+        def progress(status, remaining, total):
+            self._progress = (total - remaining) / total if total else 1.0
+            self._check_paused()
+            # 休む間も stop() で抜けられるように待つ
+            if remaining and step_delay and self._stop_event.wait(step_delay):
+                raise AutoBackupInterrupted()
+
+        try:
+            if throttle:
+                self._check_paused()
+                source.backup(target, pages=self.pages_per_step, progress=progress)
+            else:
+                source.backup(target)
+            target.close()
+            with open(temp_path, 'rb+') as f:
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.backup_path)
+        except Exception:
+            # 次の機会にやり直せるよう、保存件数を戻す
+            with self._lock:
+                self._saved_sessions += saved
+            raise
+        finally:
+            self._progress = None
+            source.close()
+            target.close()
+            if temp_path.exists():
+                temp_path.unlink()
+        duration = time.perf_counter() - start
+        metrics.record('auto_backup.full', duration)
+        logger.info(f'Automatic backup ({reason}) written to {self.backup_path} in {duration:.3f}s')
+
+    def flush(self) -> str:
+        """
+        前回のバックアップ以降の変更だけをバックアップに反映する（終了時に呼ぶ）
+
+        変更ログで変更された記録を置き換え、データベースにない記録（削除・
+        アーカイブされたもの）を消す。バックアップがない場合や、復元などで
+        変更ログが前回のバックアップより古くなっている場合は全体をコピーする。
+
+        Returns:
+            'unchanged' / 'incremental' / 'full'
+        """
+        start = time.perf_counter()
+        backed_up = self._backed_up_seq()
+        current = None
+        if backed_up is not None:
+            conn = sqlite3.connect(str(self.db_path))
+            try:
+                current = self._change_seq(conn)
+            finally:
+                conn.close()
+        if backed_up is None or current is None or current < backed_up:
+            self.run_backup('shutdown', throttle=False)
+            return 'full'
+        if current == backed_up:
+            return 'unchanged'
+
+        table, changes = change_log.RECORD_TABLE, change_log.CHANGE_TABLE
+        columns = ', '.join(change_log.RECORD_COLUMNS)
+        conn = sqlite3.connect(str(self.backup_path), isolation_level=None)
+        try:
+            conn.execute('ATTACH DATABASE ? AS live', (str(self.db_path),))
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute(f"""
+                    CREATE TEMP TABLE changed_ids AS
+                    SELECT DISTINCT record_id AS id FROM live.{changes} WHERE seq > ?
+                """, (backed_up,))
+                conn.execute(f'DELETE FROM main.{table} WHERE id IN (SELECT id FROM changed_ids)')
+                conn.execute(f'DELETE FROM main.{table} WHERE id NOT IN (SELECT id FROM live.{table})')
+                conn.execute(f"""
+                    INSERT INTO main.{table} ({columns})
+                    SELECT {columns} FROM live.{table} WHERE id IN (SELECT id FROM changed_ids)
+                """)
+                # バックアップ側のトリガーが記録した変更を、元の変更ログで置き換える
+                conn.execute(f'DELETE FROM main.{changes} WHERE seq > ?', (backed_up,))
+                conn.execute(f'INSERT INTO main.{changes} SELECT * FROM live.{changes} WHERE seq > ?',
+                             (backed_up,))
+                conn.execute('UPDATE main.sqlite_sequence SET seq = ? WHERE name = ?', (current, changes))
+                conn.execute('DROP TABLE temp.changed_ids')
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        finally:
+            conn.close()
+        with self._lock:
+            self._saved_sessions = 0
+        duration = time.perf_counter() - start
+        metrics.record('auto_backup.incremental', duration)
+        logger.info(f'Applied changes {backed_up + 1}..{current} to {self.backup_path} in {duration:.3f}s')
+        return 'incremental'
+
+# グローバルなAutoBackupSchedulerインスタンス
+auto_backup_scheduler = AutoBackupScheduler()
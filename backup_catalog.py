@@ -0,0 +1,161 @@
+import logging
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+from database import MeditationRecord
+
+logger = logging.getLogger('backup_catalog')
+
+RECORD_TABLE = MeditationRecord._meta.table_name
+# 一覧に載せない（バックアップと紛らわしくない）拡張子にする
+CATALOG_FILE = 'backup_catalog.sqlite'
+BACKUP_PATTERN = '*.db'
+
+class BackupEntry:
+    """バックアップ1件分の内容の要約"""
+
+    __slots__ = ('path', 'created_at', 'size', 'checksum', 'schema_version',
+                 'record_count', 'first_session', 'last_session')
+
+    def __init__(self, path: str, created_at: str, size: int, checksum: Optional[str] = None,
+                 schema_version: int = 0, record_count: int = 0,
+                 first_session: Optional[str] = None, last_session: Optional[str] = None):
+        self.path = path
+        self.created_at = created_at
+        self.size = size
+        self.checksum = checksum
+        self.schema_version = schema_version
+        self.record_count = record_count
+        self.first_session = first_session
+        self.last_session = last_session
+
+    def to_tuple(self) -> tuple:
+        return tuple(getattr(self, field) for field in self.__slots__)
+
+    def __repr__(self):
+        return f'<BackupEntry {self.path} {self.record_count} records {self.created_at}>'
+
+def describe_backup(path: Path, checksum: Optional[str] = None) -> BackupEntry:
+    """
+    バックアップファイルを読んで要約を作る
+
+    Args:
+        path: バックアップファイル
+        checksum: 作成時に計算したチェックサム
+
+    Returns:
+        バックアップの要約
+
+    Raises:
+        sqlite3.DatabaseError: データベースとして読めない場合
+    """
+    path = Path(path)
+    stat = path.stat()
+    conn = sqlite3.connect(f'{path.resolve().as_uri()}?mode=ro', uri=True)
+    try:
+        schema_version = conn.execute('PRAGMA user_version').fetchone()[0]
+        record_count, first_session, last_session = conn.execute(
+            f'SELECT COUNT(*), MIN(start_time), MAX(start_time) FROM {RECORD_TABLE}'
+        ).fetchone()
+    finally:
+        conn.close()
+    return BackupEntry(
+        path=str(path.resolve()),
+        created_at=datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
+        size=stat.st_size,
+        checksum=checksum,
+        schema_version=schema_version,
+        record_count=record_count,
+        first_session=first_session,
+        last_session=last_session,
+    )
+
+class BackupCatalog:
+    """
+    バックアップディレクトリの索引
+
+    バックアップの作成時に要約を記録しておき、一覧の表示ではバックアップ
+    ファイル自体を開かずに索引だけを読む。
+    """
+
+    def __init__(self, backup_dir: Path):
+        self.backup_dir = Path(backup_dir)
+        self.catalog_path = self.backup_dir / CATALOG_FILE
+
+    def _connect(self) -> sqlite3.Connection:
+        self.backup_dir.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.catalog_path), timeout=10)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS backup (
+                path TEXT PRIMARY KEY,
+                created_at TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                checksum TEXT,
+                schema_version INTEGER NOT NULL,
+                record_count INTEGER NOT NULL,
+                first_session TEXT,
+                last_session TEXT
+            )
+        """)
+        conn.execute('CREATE INDEX IF NOT EXISTS backup_created_at ON backup (created_at)')
+        return conn
+
+    def add(self, entry: BackupEntry):
+        """要約を記録する（同じパスの記録は置き換える）"""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(f'INSERT OR REPLACE INTO backup ({", ".join(BackupEntry.__slots__)}) '
+                             f'VALUES ({", ".join("?" * len(BackupEntry.__slots__))})', entry.to_tuple())
+        finally:
+            conn.close()
+
+    def remove(self, path: Path):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute('DELETE FROM backup WHERE path = ?', (str(Path(path).resolve()),))
+        finally:
+            conn.close()
+
+    def get(self, path: Path) -> Optional[BackupEntry]:
+        conn = self._connect()
+        try:
+            row = conn.execute(f'SELECT {", ".join(BackupEntry.__slots__)} FROM backup WHERE path = ?',
+                               (str(Path(path).resolve()),)).fetchone()
+        finally:
+            conn.close()
+        return BackupEntry(*row) if row else None
+
+    def entries(self) -> List[BackupEntry]:
+        """記録済みのバックアップ（新しい順）"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(f'SELECT {", ".join(BackupEntry.__slots__)} FROM backup '
+                                f'ORDER BY created_at DESC, path DESC').fetchall()
+        finally:
+            conn.close()
+        return [BackupEntry(*row) for row in rows]
+
+    def refresh(self) -> List[BackupEntry]:
+        """
+        索引をディレクトリの内容に合わせてから一覧を返す
+
+        削除されたファイルの記録を消し、索引にないバックアップ（以前の
+        バージョンで作ったものや手でコピーしたもの）だけを開いて追加する。
+        記録済みのファイルは開かない。
+        """
+        entries = {entry.path: entry for entry in self.entries()}
+        present = set()
+        if self.backup_dir.is_dir():
+            present = {str(path.resolve()) for path in self.backup_dir.glob(BACKUP_PATTERN)}
+
+        for path in set(entries) - present:
+            self.remove(Path(path))
+        for path in present - set(entries):
+            try:
+                self.add(describe_backup(Path(path)))
+            except (OSError, sqlite3.DatabaseError) as e:
+                logger.warning(f'Skipping unreadable backup {path}: {str(e)}')
+        return self.entries()
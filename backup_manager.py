@@ -1,26 +1,135 @@
 import json
-import shutil
+import hashlib
 import sqlite3
 import csv
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable
 import logging
+import os
 from settings import settings
 from i18n import i18n
+from database import MeditationRecord, SCHEMA_VERSION
+from metrics import metrics
+from db_merge import merge_database
+from columnar_export import export_columnar
+from archive import ArchiveManager
+from backup_catalog import BackupCatalog, BackupEntry, describe_backup
+import change_log
+from day_buckets import day_buckets
+from job_runner import JobCancelled
+from parallel_import import ImportReport, import_csv_parallel, parse_csv_row
+from query_service import query_service
+from streak_engine import streak_engine
 
-# ロガーの設定
-logging.basicConfig(
-    filename='app.log',
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# ロガーの設定（出力先は app_logging.setup_logging で設定する）
 logger = logging.getLogger('backup_manager')
 
+RECORD_TABLE = MeditationRecord._meta.table_name
+CSV_HEADER = ['ID', 'Date', 'Start Time', 'End Time', 'Duration', 'Card Name', 'Notes']
+# バックアップと同じ場所に置くチェックサムファイルの拡張子
+CHECKSUM_SUFFIX = '.sha256'
+SQLITE_HEADER = b'SQLite format 3\x00'
+
+# 差分エクスポートの列（CSV_HEADER の後ろに更新日時を付ける）
+CHANGES_HEADER = CSV_HEADER + ['Updated At']
+DELETIONS_HEADER = ['ID', 'Start Time', 'End Time', 'Card Name', 'Deleted At']
+# 差分エクスポートの1ファイルあたりの最大行数
+EXPORT_CHUNK_ROWS = 50000
+# 変更ログ上でのエクスポートの名前（読み終えた墓標を圧縮で消せるようにする）
+EXPORT_CONSUMER = 'export.csv'
+# 進捗を知らせる単位（行数・ページ数）
+PROGRESS_ROWS = 5000
+PROGRESS_PAGES = 256
+# 並列インポートで取り込めなかった行の一覧（取り込んだCSVの横に書く）
+REJECTED_SUFFIX = '.rejected.csv'
+# メッセージに載せる取り込めなかった行番号の数
+REJECTED_SHOWN = 10
+
+# 進捗の通知 progress(済んだ量, 全体の量)。例外を投げると処理を中断する
+ProgressCallback = Callable[[int, int], None]
+
+def _backup_step(progress: Optional[ProgressCallback]) -> dict:
+    """
+    sqlite3 の backup() に渡す引数（進捗を知らせる場合は少しずつコピーする）
+    
+    最後のステップの後はコピーが確定しているので、中断できないよう通知しない。
+    """
+    if progress is None:
+        return {}
+    
+    def report(status, remaining, total):
+        if remaining:
+            progress(total - remaining, total)
+    return {'pages': PROGRESS_PAGES, 'progress': report}
+
+def file_checksum(path: Path) -> str:
+    """ファイル内容のSHA-256（16進文字列）"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ChunkedCsvWriter:
+    """
+    一定行数ごとに別ファイルへ書き出すCSVライター
+
+    各ファイルは書き終えてから最終的な名前に変えるので、取り込む側が
+    書きかけのファイルを読むことはない。
+    """
+
+    def __init__(self, directory: Path, prefix: str, header: List[str], chunk_rows: int = EXPORT_CHUNK_ROWS):
+        self.directory = Path(directory)
+        self.prefix = prefix
+        self.header = header
+        self.chunk_rows = chunk_rows
+        self.files: List[Path] = []
+        self.rows = 0
+        self._file = None
+        self._writer = None
+        self._chunk_rows = 0
+
+    def _open_chunk(self):
+        path = self.directory / f'{self.prefix}_{len(self.files) + 1:04d}.csv'
+        self.files.append(path)
+        self._file = open(path.with_suffix('.part'), 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self.header)
+        self._chunk_rows = 0
+
+    def _close_chunk(self):
+        if self._file is not None:
+            self._file.close()
+            os.replace(self.files[-1].with_suffix('.part'), self.files[-1])
+            self._file = None
+
+    def writerow(self, row: list):
+        if self._file is None or self._chunk_rows >= self.chunk_rows:
+            self._close_chunk()
+            self._open_chunk()
+        self._writer.writerow(row)
+        self._chunk_rows += 1
+        self.rows += 1
+
+    def close(self):
+        self._close_chunk()
+
+    def discard(self):
+        """書き出したファイルを全て削除する（エクスポート失敗時）"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        for path in self.files:
+            for candidate in (path, path.with_suffix('.part')):
+                if candidate.exists():
+                    candidate.unlink()
+
 class BackupManager:
-    def __init__(self):
-        self.db_path = Path('meditation.db')
-        self.backup_dir = settings.backup_dir
+    def __init__(self, db_path: Optional[Path] = None, backup_dir: Optional[Path] = None):
+        self.db_path = Path(db_path) if db_path else Path('meditation.db')
+        self.backup_dir = Path(backup_dir) if backup_dir else settings.backup_dir
+        self.archive_manager = ArchiveManager(self.db_path)
         self._ensure_backup_dir()
 
     def _ensure_backup_dir(self):
@@ -28,22 +137,53 @@ class BackupManager:
         if not self.backup_dir.exists():
             self.backup_dir.mkdir(parents=True)
 
-    def create_backup(self, custom_path: Optional[Path] = None) -> tuple[bool, str]:
+    @metrics.timed('backup.create')
+    def create_backup(self, custom_path: Optional[Path] = None,
+                      progress: Optional[ProgressCallback] = None) -> tuple[bool, str]:
         """
         データベースのバックアップを作成
         
+        SQLiteのバックアップAPIで一時ファイルに書き出してから名前を変えるので、
+        使用中のデータベースでも一貫したバックアップになり、書きかけの
+        バックアップが残ることもない。内容のチェックサムを <バックアップ>.sha256
+        に記録する。
+        
         Args:
             custom_path: カスタムバックアップパス（オプション）
+            progress: 進捗の通知（コピーしたページ数, 全ページ数）
         
         Returns:
             (成功したかどうか, メッセージ)
         """
         try:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            backup_path = custom_path or (self.backup_dir / f'meditation_backup_{timestamp}.db')
+            backup_path = Path(custom_path or (self.backup_dir / f'meditation_backup_{timestamp}.db'))
+            
+            temp_path = backup_path.with_name(backup_path.name + '.tmp')
+            try:
+                source = sqlite3.connect(self.db_path)
+                target = sqlite3.connect(temp_path)
+                try:
+                    source.backup(target, **_backup_step(progress))
+                finally:
+                    source.close()
+                    target.close()
+                with open(temp_path, 'rb+') as f:
+                    os.fsync(f.fileno())
+                os.replace(temp_path, backup_path)
+            finally:
+                if temp_path.exists():
+                    temp_path.unlink()
+            
+            checksum = file_checksum(backup_path)
+            with open(backup_path.with_name(backup_path.name + CHECKSUM_SUFFIX), 'w', encoding='utf-8') as f:
+                f.write(f'{checksum}  {backup_path.name}\n')
             
-            # データベースをコピー
-            shutil.copy2(self.db_path, backup_path)
+            # 一覧を開かずに表示できるよう、内容の要約を索引に記録
+            try:
+                BackupCatalog(backup_path.parent).add(describe_backup(backup_path, checksum))
+            except Exception as e:
+                logger.warning(f'Failed to update backup catalog: {str(e)}')
             
             # 最終バックアップ時刻を更新
             settings.last_backup = timestamp
@@ -51,54 +191,165 @@ class BackupManager:
             logger.info(f'Backup created successfully at {backup_path}')
             return True, i18n.get('backup.success')
             
+        except JobCancelled:
+            raise
         except Exception as e:
             logger.error(f'Backup creation failed: {str(e)}')
             return False, f"{i18n.get('backup.error')}: {str(e)}"
 
-    def restore_backup(self, backup_path: Path) -> tuple[bool, str]:
+    def recorded_checksum(self, backup_path: Path) -> Optional[str]:
+        """バックアップ作成時に記録したチェックサム（記録がなければNone）"""
+        try:
+            entry = BackupCatalog(backup_path.parent).get(backup_path)
+            if entry is not None and entry.checksum:
+                return entry.checksum
+        except sqlite3.DatabaseError:
+            pass
+        try:
+            with open(backup_path.with_name(backup_path.name + CHECKSUM_SUFFIX), 'r', encoding='utf-8') as f:
+                return f.read().split()[0]
+        except (OSError, IndexError):
+            return None
+
+    def list_backups(self) -> List[BackupEntry]:
         """
-        バックアップからデータベースを復元
+        バックアップディレクトリ内のバックアップを新しい順に返す
+        
+        索引から読むので、バックアップファイルは開かない。
+        """
+        return BackupCatalog(self.backup_dir).refresh()
+
+    @metrics.timed('backup.verify')
+    def verify_backup(self, backup_path: Path) -> tuple[bool, str]:
+        """
+        バックアップが復元できる状態か検証
+        
+        ファイルヘッダー、作成時に記録したチェックサム（記録がある場合）、
+        PRAGMA quick_check、スキーマの版と瞑想記録テーブルの列を確認する。
         
         Args:
-            backup_path: 復元するバックアップファイルのパス
+            backup_path: 検証するバックアップファイルのパス
         
         Returns:
-            (成功したかどうか, メッセージ)
+            (問題がないかどうか, メッセージ)
         """
         try:
             if not backup_path.exists():
                 raise FileNotFoundError(i18n.get('error.file_not_found'))
             
-            # 現在のDBをテンポラリバックアップ
-            temp_backup = self.db_path.with_suffix('.db.temp')
-            shutil.copy2(self.db_path, temp_backup)
+            with open(backup_path, 'rb') as f:
+                if f.read(len(SQLITE_HEADER)) != SQLITE_HEADER:
+                    return False, i18n.get('backup.verify_not_database')
             
+            expected = self.recorded_checksum(backup_path)
+            if expected is not None and file_checksum(backup_path) != expected:
+                return False, i18n.get('backup.verify_checksum_mismatch')
+            
+            conn = sqlite3.connect(f'{backup_path.resolve().as_uri()}?mode=ro', uri=True)
             try:
-                # バックアップから復元
-                shutil.copy2(backup_path, self.db_path)
-                temp_backup.unlink()  # テンポラリバックアップを削除
-                
-                logger.info(f'Database restored from {backup_path}')
-                return True, i18n.get('backup.restore_success')
-                
-            except Exception as e:
-                # 復元に失敗した場合、テンポラリバックアップから戻す
-                if temp_backup.exists():
-                    shutil.copy2(temp_backup, self.db_path)
-                    temp_backup.unlink()
-                raise e
-                
+                if [row[0] for row in conn.execute('PRAGMA quick_check')] != ['ok']:
+                    return False, i18n.get('backup.verify_corrupt')
+                version = conn.execute('PRAGMA user_version').fetchone()[0]
+                columns = {row[1] for row in conn.execute(f'PRAGMA table_info({RECORD_TABLE})')}
+            finally:
+                conn.close()
+            
+            required = {field.column_name for field in MeditationRecord._meta.sorted_fields}
+            if version > SCHEMA_VERSION or not required <= columns:
+                return False, i18n.get('backup.verify_schema_mismatch')
+            
+            return True, i18n.get('backup.verify_ok')
+            
+        except sqlite3.DatabaseError as e:
+            logger.warning(f'Backup verification failed for {backup_path}: {str(e)}')
+            return False, f"{i18n.get('backup.verify_corrupt')}: {str(e)}"
+
+    @metrics.timed('backup.restore')
+    def restore_backup(self, backup_path: Path,
+                       progress: Optional[ProgressCallback] = None) -> tuple[bool, str]:
+        """
+        バックアップからデータベースを復元
+        
+        verify_backup で検証してから、SQLiteのバックアップAPIで現在の
+        データベースに直接書き込む。書き込みは1つのトランザクションで行われる
+        ので、途中で失敗しても元の内容のまま残り、一時コピーは作らない。
+        開いているアプリの接続は、次のクエリから復元後の内容を読む。
+        復元後は変更ログを作り直し、画面の集計とクエリのキャッシュを捨てる。
+        
+        Args:
+            backup_path: 復元するバックアップファイルのパス
+            progress: 進捗の通知（コピーしたページ数, 全ページ数）。途中で
+                中断した場合は元の内容のまま残る
+        
+        Returns:
+            (成功したかどうか, メッセージ)
+        """
+        try:
+            valid, message = self.verify_backup(backup_path)
+            if not valid:
+                raise ValueError(message)
+            
+            source = sqlite3.connect(f'{backup_path.resolve().as_uri()}?mode=ro', uri=True)
+            target = sqlite3.connect(self.db_path, timeout=10)
+            try:
+                source.backup(target, **_backup_step(progress))
+                # 変更ログのない以前のバックアップでも差分の読み込みが続けられるようにする
+                change_log.install(target)
+                target.commit()
+            finally:
+                source.close()
+                target.close()
+            
+            # 復元前の内容から作った集計とキャッシュを捨てる
+            day_buckets.invalidate()
+            streak_engine.invalidate()
+            query_service.invalidate()
+            
+            logger.info(f'Database restored from {backup_path}')
+            return True, i18n.get('backup.restore_success')
+            
+        except JobCancelled:
+            raise
         except Exception as e:
             logger.error(f'Restore failed: {str(e)}')
             return False, f"{i18n.get('backup.restore_error')}: {str(e)}"
 
-    def export_csv(self, export_path: Path, date_format: str = 'yyyy-mm-dd') -> tuple[bool, str]:
+    def merge_database(self, source_path: Path) -> tuple[bool, str]:
+        """
+        別のデータベースまたはバックアップの記録を現在のデータベースに統合
+        
+        Args:
+            source_path: 統合するデータベースファイルのパス
+        
+        Returns:
+            (成功したかどうか, メッセージ)
+        """
+        try:
+            if not source_path.exists():
+                raise FileNotFoundError(i18n.get('error.file_not_found'))
+            
+            result = merge_database(source_path, self.db_path)
+            
+            logger.info(f'Database merged from {source_path}: {result}')
+            return True, i18n.get('backup.merge_success').format(
+                inserted=result.inserted, updated=result.updated, skipped=result.skipped
+            )
+            
+        except Exception as e:
+            logger.error(f'Merge failed: {str(e)}')
+            return False, f"{i18n.get('backup.merge_error')}: {str(e)}"
+
+    @metrics.timed('export.csv')
+    def export_csv(self, export_path: Path, date_format: str = 'yyyy-mm-dd',
+                   progress: Optional[ProgressCallback] = None) -> tuple[bool, str]:
         """
         データベースの内容をCSVにエクスポート
         
         Args:
             export_path: エクスポート先のパス
             date_format: 日付フォーマット ('yyyy-mm-dd' or 'yyyy/mm/dd')
+            progress: 進捗の通知（書き出した行数, 全行数）。中断した場合は
+                書きかけのファイルを消す
         
         Returns:
             (成功したかどうか, メッセージ)
@@ -107,37 +358,163 @@ class BackupManager:
             date_format_sql = '%Y-%m-%d' if date_format == 'yyyy-mm-dd' else '%Y/%m/%d'
             
             with sqlite3.connect(self.db_path) as conn:
+                # アーカイブ済みの記録も含めて取得
+                source = self.archive_manager.attach(conn)
+                total = conn.execute(f'SELECT COUNT(*) FROM {source}').fetchone()[0] if progress else 0
                 cursor = conn.cursor()
-                # meditation_recordsテーブルからデータを取得
                 cursor.execute(f"""
-                    SELECT id, 
+                    SELECT id,
                            strftime('{date_format_sql}', date) as formatted_date,
+                           strftime('%H:%M:%S', start_time) as start_time,
+                           strftime('%H:%M:%S', end_time) as end_time,
+                           duration,
                            card_name,
-                           meditation_time,
                            notes
-                    FROM meditation_records
+                    FROM {source}
                     ORDER BY date
                 """)
                 
                 with open(export_path, 'w', newline='', encoding='utf-8') as f:
                     writer = csv.writer(f)
-                    writer.writerow(['ID', 'Date', 'Card Name', 'Meditation Time', 'Notes'])
-                    writer.writerows(cursor.fetchall())
+                    writer.writerow(CSV_HEADER)
+                    if progress is None:
+                        writer.writerows(cursor)
+                    else:
+                        written = 0
+                        try:
+                            for rows in iter(lambda: cursor.fetchmany(PROGRESS_ROWS), []):
+                                writer.writerows(rows)
+                                written += len(rows)
+                                progress(written, total)
+                        except JobCancelled:
+                            f.close()
+                            export_path.unlink()
+                            raise
             
             logger.info(f'CSV exported successfully to {export_path}')
             return True, i18n.get('csv.export_success')
             
+        except JobCancelled:
+            raise
         except Exception as e:
             logger.error(f'CSV export failed: {str(e)}')
             return False, f"{i18n.get('csv.export_error')}: {str(e)}"
 
-    def import_csv(self, import_path: Path, date_format: str = 'yyyy-mm-dd') -> tuple[bool, str]:
+    @metrics.timed('export.csv_incremental')
+    def export_csv_incremental(self, export_dir: Path, date_format: str = 'yyyy-mm-dd',
+                               chunk_rows: int = EXPORT_CHUNK_ROWS) -> tuple[bool, str]:
+        """
+        前回の差分エクスポート以降に追加・変更・削除された記録だけをCSVにエクスポート
+        
+        変更ログの変更番号を基準（処理する側 'export.csv' の位置）にして、追加・変更された
+        記録を meditation_changes_<開始変更番号>_<日時>_NNNN.csv に、削除された記録を
+        meditation_deletions_<開始変更番号>_<日時>_NNNN.csv に書き出す。既存のファイルは
+        変更しないので、出力先のディレクトリにそのまま追記していける。
+        
+        Args:
+            export_dir: エクスポート先のディレクトリ
+            date_format: 日付フォーマット ('yyyy-mm-dd' or 'yyyy/mm/dd')
+            chunk_rows: 1ファイルあたりの最大行数
+        
+        Returns:
+            (成功したかどうか, メッセージ)
+        """
+        writers: List[ChunkedCsvWriter] = []
+        try:
+            export_dir.mkdir(parents=True, exist_ok=True)
+            separator = '-' if date_format == 'yyyy-mm-dd' else '/'
+            
+            conn = sqlite3.connect(self.db_path, isolation_level=None)
+            try:
+                change_log.install(conn)
+                # 基準は変更ログの中だけに持つ（以前の版が設定に保存した基準は移行する）
+                mark = change_log.consumer_cursor(conn, EXPORT_CONSUMER, default=settings.export_mark)
+                # 読み込み中の変更が混ざらないよう、1つの読み取りトランザクションで読む
+                conn.execute('BEGIN')
+                if mark > change_log.latest_seq(conn):
+                    # データベースが復元・置き換えられた場合は全件を出し直す
+                    logger.warning(f'Export mark {mark} is ahead of the change log; exporting all records')
+                    mark = 0
+                cursor = mark
+                
+                # ファイル名は開始時の変更番号で並ぶようにし、同じ秒に実行しても衝突しないようにする
+                prefix = f'{mark:010d}_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
+                changed = ChunkedCsvWriter(export_dir, f'meditation_changes_{prefix}', CHANGES_HEADER, chunk_rows)
+                deleted = ChunkedCsvWriter(export_dir, f'meditation_deletions_{prefix}', DELETIONS_HEADER, chunk_rows)
+                writers = [changed, deleted]
+                while True:
+                    changes, next_cursor = change_log.changes_since(conn, cursor, limit=chunk_rows)
+                    if next_cursor == cursor:
+                        break
+                    for change in changes:
+                        if change['op'] == 'delete':
+                            deleted.writerow([change['record_id'], change['start_time'], change['end_time'],
+                                              change['card_name'], change['deleted_at']])
+                        else:
+                            record = change['record']
+                            record_date = str(record['date'])[:10].replace('-', separator)
+                            changed.writerow([
+                                record['id'], record_date,
+                                str(record['start_time'])[11:19], str(record['end_time'])[11:19],
+                                record['duration'], record['card_name'], record['notes'], record['updated_at'],
+                            ])
+                    cursor = next_cursor
+                conn.execute('COMMIT')
+                changed.close()
+                deleted.close()
+                
+                # 全てのファイルを書き終えてから基準を進める
+                change_log.advance_consumer(conn, EXPORT_CONSUMER, cursor)
+            finally:
+                conn.close()
+            
+            logger.info(f'Incremental CSV export to {export_dir}: '
+                        f'{changed.rows} changed, {deleted.rows} deleted (seq {mark} -> {cursor})')
+            return True, i18n.get('csv.incremental_export_success').format(
+                changed=changed.rows, deleted=deleted.rows, files=len(changed.files) + len(deleted.files)
+            )
+            
+        except Exception as e:
+            for writer in writers:
+                writer.discard()
+            logger.error(f'Incremental CSV export failed: {str(e)}')
+            return False, f"{i18n.get('csv.export_error')}: {str(e)}"
+
+    @metrics.timed('export.columnar')
+    def export_columnar(self, export_path: Path, export_format: str = 'auto') -> tuple[bool, str]:
+        """
+        データベースの内容を分析用の列指向形式にエクスポート
+        
+        pyarrow があれば Parquet / Feather、なければ NumPy の .npz で書き出す。
+        
+        Args:
+            export_path: エクスポート先のパス
+            export_format: 'auto'（拡張子から判断） / 'parquet' / 'feather' / 'npz'
+        
+        Returns:
+            (成功したかどうか, メッセージ)
+        """
+        try:
+            count, used_format = export_columnar(self.db_path, export_path, export_format)
+            
+            logger.info(f'Columnar export ({used_format}) to {export_path}: {count} records')
+            return True, i18n.get('columnar.export_success').format(count=count, format=used_format)
+            
+        except Exception as e:
+            logger.error(f'Columnar export failed: {str(e)}')
+            return False, f"{i18n.get('columnar.export_error')}: {str(e)}"
+
+    @metrics.timed('import.csv')
+    def import_csv(self, import_path: Path, date_format: str = 'yyyy-mm-dd',
+                   progress: Optional[ProgressCallback] = None) -> tuple[bool, str]:
         """
         CSVからデータベースにインポート
         
         Args:
             import_path: インポートするCSVファイルのパス
             date_format: CSVの日付フォーマット ('yyyy-mm-dd' or 'yyyy/mm/dd')
+            progress: 進捗の通知（読み込み中は (行数, 0)、書き込み中は
+                (書き込んだ行数, 全行数)）。中断した場合は何も追加しない
         
         Returns:
             (成功したかどうか, メッセージ)
@@ -153,29 +530,100 @@ class BackupManager:
             
             date_format_py = '%Y-%m-%d' if date_format == 'yyyy-mm-dd' else '%Y/%m/%d'
             
+            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
+            with open(import_path, 'r', encoding='utf-8') as f:
+                rows = []
+                for row in csv.DictReader(f):
+                    rows.append(parse_csv_row(row, date_format_py) + (now, now))
+                    if progress is not None and len(rows) % PROGRESS_ROWS == 0:
+                        progress(len(rows), 0)
+            
+            # 1つのトランザクションで書き込むので、中断した場合は何も残らない
             with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                with open(import_path, 'r', encoding='utf-8') as f:
-                    reader = csv.DictReader(f)
-                    for row in reader:
-                        # 日付を解析してSQLite形式に変換
-                        date_obj = datetime.strptime(row['Date'], date_format_py)
-                        sqlite_date = date_obj.strftime('%Y-%m-%d')
-                        
-                        cursor.execute("""
-                            INSERT INTO meditation_records (date, card_name, meditation_time, notes)
-                            VALUES (?, ?, ?, ?)
-                        """, (sqlite_date, row['Card Name'], row['Meditation Time'], row['Notes']))
-                
+                for start in range(0, len(rows), PROGRESS_ROWS):
+                    conn.executemany(f"""
+                        INSERT INTO {RECORD_TABLE}
+                            (date, start_time, end_time, duration, card_name, notes, created_at, updated_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    """, rows[start:start + PROGRESS_ROWS])
+                    if progress is not None:
+                        progress(min(start + PROGRESS_ROWS, len(rows)), len(rows))
                 conn.commit()
             
             logger.info(f'CSV imported successfully from {import_path}')
             return True, i18n.get('csv.import_success')
             
+        except JobCancelled:
+            raise
         except Exception as e:
             logger.error(f'CSV import failed: {str(e)}')
             return False, f"{i18n.get('csv.import_error')}: {str(e)}"
 
+    @metrics.timed('import.csv_parallel')
+    def import_csv_parallel(self, import_path: Path, date_format: str = 'yyyy-mm-dd',
+                            workers: Optional[int] = None,
+                            progress: Optional[ProgressCallback] = None) -> tuple[bool, str]:
+        """
+        CSVを（大きなファイルは複数のプロセスで）読み込んでインポート
+        
+        import_csv と違い、変換できない行があっても残りの行は取り込み、
+        取り込めなかった行は行番号と理由を「<CSV名>.rejected.csv」に書く。
+        
+        Args:
+            import_path: インポートするCSVファイルのパス
+            date_format: CSVの日付フォーマット ('yyyy-mm-dd' or 'yyyy/mm/dd')
+            workers: 変換に使うプロセス数（省略時はCPU数-1）
+            progress: 進捗の通知（読み終えたバイト数, ファイルの大きさ）。
+                中断した場合は何も追加しない
+        
+        Returns:
+            (成功したかどうか, メッセージ)
+        """
+        try:
+            if not import_path.exists():
+                raise FileNotFoundError(i18n.get('error.file_not_found'))
+            
+            # テンポラリバックアップを作成
+            success, msg = self.create_backup()
+            if not success:
+                raise Exception(f"Backup failed before import: {msg}")
+            
+            date_format_py = '%Y-%m-%d' if date_format == 'yyyy-mm-dd' else '%Y/%m/%d'
+            report = import_csv_parallel(self.db_path, import_path, RECORD_TABLE, date_format_py,
+                                         workers=workers, progress=progress)
+            
+            logger.info(f'CSV imported in parallel from {import_path}: {report}')
+            message = i18n.get('csv.import_report').format(
+                inserted=report.inserted, rejected=len(report.rejected))
+            if report.rejected:
+                shown = ', '.join(str(line) for line, _ in report.rejected[:REJECTED_SHOWN])
+                if len(report.rejected) > REJECTED_SHOWN:
+                    shown += ', ...'
+                message += '\n' + i18n.get('csv.rejected_lines').format(lines=shown)
+                report_path = self._write_rejected(import_path, report)
+                if report_path is not None:
+                    message += '\n' + i18n.get('csv.rejected_report').format(path=report_path)
+            return True, message
+            
+        except JobCancelled:
+            raise
+        except Exception as e:
+            logger.error(f'Parallel CSV import failed: {str(e)}')
+            return False, f"{i18n.get('csv.import_error')}: {str(e)}"
+
+    def _write_rejected(self, import_path: Path, report: ImportReport) -> Optional[Path]:
+        """取り込めなかった行の一覧を書く（書けなかった場合はNone）"""
+        report_path = import_path.with_name(import_path.stem + REJECTED_SUFFIX)
+        try:
+            with open(report_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['Line', 'Error'])
+                writer.writerows(report.rejected)
+            return report_path
+        except OSError as e:
+            # 取り込み自体は終わっているので、一覧が書けなくても失敗にはしない
+            logger.warning(f'Could not write rejected rows to {report_path}: {str(e)}')
+            return None
+
 # グローバルなBackupManagerインスタンス
 backup_manager = BackupManager()
@@ -0,0 +1,132 @@
+from datetime import date, timedelta
+from typing import Optional
+from PySide6.QtWidgets import QWidget, QToolTip
+from PySide6.QtCore import Qt, QEvent, QRect, QSize
+from PySide6.QtGui import QPainter, QColor
+from day_buckets import DayBuckets, day_buckets
+from i18n import i18n
+
+class CalendarHeatmap(QWidget):
+    """
+    日ごとの瞑想時間のカレンダー表示（1列が1週間、月曜始まり）
+
+    セルを子ウィジェットにせず、paintEvent で見えている週の範囲だけを描く。
+    データは DayBuckets から読み、その version が変わったときだけ描き直す。
+    横に長くなるので QScrollArea に入れて使う。
+    """
+
+    CELL = 12
+    GAP = 2
+    LEFT_MARGIN = 28
+    TOP_MARGIN = 16
+    # 段階ごとの色（0 は瞑想なし）
+    COLORS = [QColor('#EBEDF0'), QColor('#C6DBF7'), QColor('#8DB8EE'), QColor('#4A90E2'), QColor('#1F5FAE')]
+    # 最低限表示する週数
+    MIN_WEEKS = 53
+
+    def __init__(self, buckets: Optional[DayBuckets] = None, parent=None):
+        super().__init__(parent)
+        self.buckets = buckets or day_buckets
+        self._version = None
+        self.today = date.today()
+        self.first_monday = self.today
+        self.weeks = 0
+        self.setMouseTracking(True)
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+        self._update_span()
+
+    def _update_span(self):
+        """表示する週の範囲を決める（最初の瞑想の週から今週まで、最低1年）"""
+        self.today = date.today()
+        this_monday = self.today - timedelta(days=self.today.weekday())
+        first = self.buckets.first_day()
+        first_monday = this_monday - timedelta(weeks=self.MIN_WEEKS - 1)
+        if first is not None:
+            first_day = date.fromordinal(first)
+            first_monday = min(first_monday, first_day - timedelta(days=first_day.weekday()))
+        self.first_monday = first_monday
+        self.weeks = (this_monday - first_monday).days // 7 + 1
+
+    def refresh(self) -> bool:
+        """
+        DayBuckets の変更を反映して、変わっていれば描き直す
+
+        Returns:
+            描き直したかどうか
+        """
+        self.buckets.refresh()
+        if self.buckets.version == self._version and self.today == date.today():
+            return False
+        self._version = self.buckets.version
+        weeks = self.weeks
+        self._update_span()
+        if self.weeks != weeks:
+            self.updateGeometry()
+            self.resize(self.sizeHint())
+        self.update()
+        return True
+
+    def sizeHint(self) -> QSize:
+        step = self.CELL + self.GAP
+        return QSize(self.LEFT_MARGIN + self.weeks * step, self.TOP_MARGIN + 7 * step)
+
+    def minimumSizeHint(self) -> QSize:
+        return self.sizeHint()
+
+    def _cell_rect(self, week: int, weekday: int) -> QRect:
+        step = self.CELL + self.GAP
+        return QRect(self.LEFT_MARGIN + week * step, self.TOP_MARGIN + weekday * step, self.CELL, self.CELL)
+
+    def day_at(self, x: int, y: int) -> Optional[date]:
+        """座標にあるセルの日（セルがなければNone）"""
+        step = self.CELL + self.GAP
+        week, weekday = (x - self.LEFT_MARGIN) // step, (y - self.TOP_MARGIN) // step
+        if x < self.LEFT_MARGIN or y < self.TOP_MARGIN or not (0 <= week < self.weeks and 0 <= weekday < 7):
+            return None
+        day = self.first_monday + timedelta(weeks=week, days=weekday)
+        return day if day <= self.today else None
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        rect = event.rect()
+        painter.fillRect(rect, self.palette().window())
+        step = self.CELL + self.GAP
+
+        # 見えている週だけを描く
+        first_week = max((rect.left() - self.LEFT_MARGIN) // step, 0)
+        last_week = min((rect.right() - self.LEFT_MARGIN) // step + 1, self.weeks - 1)
+        if last_week >= first_week:
+            first = self.first_monday + timedelta(weeks=first_week)
+            count = (last_week - first_week + 1) * 7
+            values = self.buckets.range(first.toordinal(), first.toordinal() + count - 1)
+            levels = self.buckets.levels(values)
+            last_index = (self.today - first).days
+            for index in range(min(count, last_index + 1)):
+                week, weekday = divmod(index, 7)
+                painter.fillRect(self._cell_rect(first_week + week, weekday), self.COLORS[levels[index]])
+
+            # 月の最初の週に月を表示
+            painter.setPen(self.palette().windowText().color())
+            for week in range(first_week, last_week + 1):
+                monday = self.first_monday + timedelta(weeks=week)
+                if monday.day <= 7:
+                    painter.drawText(self.LEFT_MARGIN + week * step, self.TOP_MARGIN - 4, str(monday.month))
+
+        if rect.left() < self.LEFT_MARGIN:
+            painter.setPen(self.palette().windowText().color())
+            weekdays = i18n.get('streak.weekdays').split(',')
+            for weekday in (0, 2, 4):
+                painter.drawText(0, self.TOP_MARGIN + weekday * step + self.CELL - 1, weekdays[weekday])
+        painter.end()
+
+    def event(self, event):
+        if event.type() == QEvent.ToolTip:
+            day = self.day_at(event.pos().x(), event.pos().y())
+            if day is None:
+                QToolTip.hideText()
+            else:
+                minutes = self.buckets.range(day.toordinal(), day.toordinal())[0]
+                QToolTip.showText(event.globalPos(), i18n.get('heatmap.tooltip').format(
+                    date=day.isoformat(), minutes=int(minutes)), self)
+            return True
+        return super().event(event)
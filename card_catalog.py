@@ -0,0 +1,149 @@
+import csv
+import hashlib
+import logging
+import marshal
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+from settings import settings
+
+logger = logging.getLogger('card_catalog')
+
+# カタログ形式が変わったら上げる
+CATALOG_VERSION = 1
+# 解釈が空の場合の表示
+NO_INTERPRETATION = '解釈なし'
+
+class Card:
+    """カード1枚分の表示用データ"""
+
+    __slots__ = ('element', 'name', 'first_element', 'second_element',
+                 'image_file', 'image_path', 'positive', 'negative')
+
+    def __init__(self, element: str, name: str, first_element: str, second_element: str,
+                 image_file: str, image_path: str, positive: str, negative: str):
+        self.element = element
+        self.name = name
+        self.first_element = first_element
+        self.second_element = second_element
+        self.image_file = image_file
+        self.image_path = image_path
+        self.positive = positive
+        self.negative = negative
+
+    def to_tuple(self) -> tuple:
+        return tuple(getattr(self, field) for field in self.__slots__)
+
+    def __repr__(self):
+        return f'<Card {self.name} {self.image_file}>'
+
+class CardCatalog:
+    """カード名から表示用データを引くカタログ"""
+
+    def __init__(self, cards: List[Card]):
+        self.cards = cards
+        self._by_name: Dict[str, Card] = {card.name: card for card in cards}
+
+    def names(self) -> List[str]:
+        """CSVの順序でカード名を返す"""
+        return [card.name for card in self.cards]
+
+    def get(self, name: str) -> Optional[Card]:
+        return self._by_name.get(name)
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __contains__(self, name: str):
+        return name in self._by_name
+
+def parse_tattva_csv(csv_path: Path, images_dir: Path) -> List[Card]:
+    """
+    tattva.csv を解析してカードの一覧を作る
+
+    Args:
+        csv_path: tattva.csv のパス
+        images_dir: カード画像のディレクトリ
+
+    Returns:
+        カードの一覧（組み合わせ名が空の行は除く）
+    """
+    cards = []
+    with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+        for row in csv.DictReader(f):
+            name = (row.get('組み合わせ') or '').strip()
+            if not name:
+                continue
+            image_file = (row.get('画像ファイル名') or '').strip()
+            cards.append(Card(
+                element=row.get('元素') or '',
+                name=name,
+                first_element=row.get('第一元素名') or '',
+                second_element=row.get('第二元素名') or '',
+                image_file=image_file,
+                image_path=os.path.join(str(images_dir), image_file),
+                positive=(row.get('ポジティブ解釈') or '').strip() or NO_INTERPRETATION,
+                negative=(row.get('ネガティブ解釈') or '').strip() or NO_INTERPRETATION,
+            ))
+    return cards
+
+def _file_hash(path: Path) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def load_catalog(csv_path: Optional[Path] = None, images_dir: Optional[Path] = None,
+                 cache_file: Optional[Path] = None) -> CardCatalog:
+    """
+    コンパイル済みキャッシュからカードカタログを読み込む
+
+    キャッシュはCSVの更新日時・サイズが同じならそのまま使い、異なる場合は
+    内容のハッシュを比べて、変わっていればCSVを解析し直して作り直す。
+
+    Args:
+        csv_path: tattva.csv のパス（省略時は 'tattva.csv'）
+        images_dir: カード画像のディレクトリ（省略時は 'images'）
+        cache_file: キャッシュファイルのパス
+
+    Returns:
+        カードカタログ
+    """
+    csv_path = Path(csv_path) if csv_path else Path('tattva.csv')
+    images_dir = Path(images_dir) if images_dir else Path('images')
+    cache_file = Path(cache_file) if cache_file else settings.app_dir / '.cache' / 'tattva.catalog'
+
+    stat = csv_path.stat()
+    stamp = (CATALOG_VERSION, str(csv_path.resolve()), str(images_dir), stat.st_mtime_ns, stat.st_size)
+
+    cached = None
+    try:
+        with open(cache_file, 'rb') as f:
+            cached = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+
+    content_hash = None
+    if cached is not None:
+        cached_stamp, cached_hash, records = cached
+        if tuple(cached_stamp) == stamp:
+            return CardCatalog([Card(*record) for record in records])
+        # 更新日時だけが変わった場合は内容を比べて再利用する
+        content_hash = _file_hash(csv_path)
+        if tuple(cached_stamp[:3]) == stamp[:3] and cached_hash == content_hash:
+            _write_cache(cache_file, stamp, content_hash, records)
+            return CardCatalog([Card(*record) for record in records])
+
+    cards = parse_tattva_csv(csv_path, images_dir)
+    _write_cache(cache_file, stamp, content_hash or _file_hash(csv_path),
+                 [card.to_tuple() for card in cards])
+    logger.debug(f'Compiled card catalog from {csv_path}: {len(cards)} cards')
+    return CardCatalog(cards)
+
+def _write_cache(cache_file: Path, stamp: tuple, content_hash: str, records: list):
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        temp = cache_file.with_suffix('.tmp')
+        with open(temp, 'wb') as f:
+            marshal.dump((stamp, content_hash, records), f)
+        os.replace(temp, cache_file)
+    except OSError as e:
+        logger.warning(f'Failed to write card catalog cache: {str(e)}')
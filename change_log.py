@@ -0,0 +1,226 @@
+import sqlite3
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from database import MeditationRecord
+
+RECORD_TABLE = MeditationRecord._meta.table_name
+CHANGE_TABLE = 'record_change'
+CONSUMER_TABLE = 'record_change_consumer'
+
+# 瞑想記録の変更をトリガーで記録する
+# op: 'I'(追加) / 'U'(更新) / 'D'(削除)。削除時はセッションを識別する列を墓標として残す
+# origin: 'local'(この端末での変更) / 'remote'(同期で取り込んだ変更)
+TABLES = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {CHANGE_TABLE} (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        record_id INTEGER NOT NULL,
+        op TEXT NOT NULL,
+        start_time TEXT,
+        end_time TEXT,
+        card_name TEXT,
+        changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
+        origin TEXT NOT NULL DEFAULT 'local'
+    )
+    """,
+    f'CREATE INDEX IF NOT EXISTS {CHANGE_TABLE}_record ON {CHANGE_TABLE} (record_id, seq)',
+    # 差分を処理する側（エクスポート・集計・検索索引など）ごとの読み込み位置
+    f"""
+    CREATE TABLE IF NOT EXISTS {CONSUMER_TABLE} (
+        name TEXT PRIMARY KEY,
+        seq INTEGER NOT NULL,
+        updated_at TEXT NOT NULL
+    )
+    """,
+    f'CREATE INDEX IF NOT EXISTS {RECORD_TABLE}_start_time ON {RECORD_TABLE} (start_time)',
+]
+
+# トリガーは定義を変えたときに置き換えられるよう、毎回作り直す
+TRIGGERS = {
+    f'{RECORD_TABLE}_change_insert': f"""
+    CREATE TRIGGER {RECORD_TABLE}_change_insert
+    AFTER INSERT ON {RECORD_TABLE}
+    BEGIN
+        INSERT INTO {CHANGE_TABLE} (record_id, op) VALUES (NEW.id, 'I');
+    END
+    """,
+    # save() を通らない一括更新でも updated_at を進める
+    # （トリガー内の UPDATE では、再帰トリガーが無効なのでこのトリガーは再度動かない）
+    f'{RECORD_TABLE}_change_update': f"""
+    CREATE TRIGGER {RECORD_TABLE}_change_update
+    AFTER UPDATE ON {RECORD_TABLE}
+    BEGIN
+        UPDATE {RECORD_TABLE}
+        SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')
+        WHERE id = NEW.id AND NEW.updated_at IS OLD.updated_at;
+        INSERT INTO {CHANGE_TABLE} (record_id, op) VALUES (NEW.id, 'U');
+    END
+    """,
+    f'{RECORD_TABLE}_change_delete': f"""
+    CREATE TRIGGER {RECORD_TABLE}_change_delete
+    AFTER DELETE ON {RECORD_TABLE}
+    BEGIN
+        INSERT INTO {CHANGE_TABLE} (record_id, op, start_time, end_time, card_name)
+        VALUES (OLD.id, 'D', OLD.start_time, OLD.end_time, OLD.card_name);
+    END
+    """,
+}
+
+RECORD_COLUMNS = ('id', 'date', 'start_time', 'end_time', 'duration', 'card_name',
+                  'notes', 'created_at', 'updated_at')
+
+def installed(conn: sqlite3.Connection) -> bool:
+    """変更ログのテーブルがあるかどうか"""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (CHANGE_TABLE,)
+    ).fetchone() is not None
+
+def install(conn: sqlite3.Connection):
+    """
+    変更ログのテーブルとトリガーを作成する（作成済みなら何もしない）
+
+    初めて作成する場合は、既存の記録を全て追加として記録する。
+    """
+    exists = installed(conn)
+    for statement in TABLES:
+        conn.execute(statement)
+    for name, statement in TRIGGERS.items():
+        conn.execute(f'DROP TRIGGER IF EXISTS {name}')
+        conn.execute(statement)
+    if not exists:
+        conn.execute(f"INSERT INTO {CHANGE_TABLE} (record_id, op) SELECT id, 'I' FROM {RECORD_TABLE} ORDER BY id")
+
+def latest_seq(conn: sqlite3.Connection) -> int:
+    """現在の最新の変更番号"""
+    row = conn.execute(f'SELECT MAX(seq) FROM {CHANGE_TABLE}').fetchone()
+    return row[0] or 0
+
+def changes_since(conn: sqlite3.Connection, cursor: int, limit: int = 500,
+                  origin: Optional[str] = None) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    カーソル以降の変更を返す
+
+    同じ記録への複数回の変更は最新の状態1件にまとめる。削除は墓標として
+    (start_time, end_time, card_name) を含む。
+
+    Args:
+        conn: データベース接続
+        cursor: 前回受け取った最後の変更番号
+        limit: 返す変更の最大件数
+        origin: 指定した場合、その発生元の変更だけを返す
+
+    Returns:
+        (変更のリスト, 次回に渡すカーソル)
+    """
+    origin_filter = 'AND origin = ?' if origin else ''
+    params: list = [cursor] + ([origin] if origin else []) + [limit]
+    rows = conn.execute(f"""
+        SELECT c.seq, c.record_id, c.op, c.start_time, c.end_time, c.card_name, c.changed_at,
+               {', '.join(f'r.{column}' for column in RECORD_COLUMNS)}
+        FROM (
+            SELECT MAX(seq) AS seq
+            FROM {CHANGE_TABLE}
+            WHERE seq > ? {origin_filter}
+            -- 削除は記録IDが再利用されても失われないよう個別に扱う
+            GROUP BY CASE WHEN op = 'D' THEN -seq ELSE record_id END
+            ORDER BY seq
+            LIMIT ?
+        ) latest
+        JOIN {CHANGE_TABLE} c ON c.seq = latest.seq
+        LEFT JOIN {RECORD_TABLE} r ON r.id = c.record_id AND c.op != 'D'
+        ORDER BY c.seq
+    """, params).fetchall()
+
+    changes = []
+    for row in rows:
+        seq, record_id, op, start_time, end_time, card_name, changed_at = row[:7]
+        record = dict(zip(RECORD_COLUMNS, row[7:]))
+        if op == 'D':
+            # 削除された記録は墓標として返す
+            changes.append({
+                'seq': seq, 'op': 'delete', 'record_id': record_id,
+                'start_time': start_time, 'end_time': end_time, 'card_name': card_name,
+                'deleted_at': changed_at,
+            })
+        elif record['id'] is not None:
+            # 変更後に削除された記録は、削除の変更として別に返る
+            changes.append({'seq': seq, 'op': 'upsert', 'record_id': record_id, 'record': record})
+
+    next_cursor = rows[-1][0] if rows else cursor
+    return changes, next_cursor
+
+def consumer_cursor(conn: sqlite3.Connection, name: str, default: int = 0) -> int:
+    """
+    差分を処理する側の読み込み位置を返す
+
+    Args:
+        conn: データベース接続
+        name: 処理する側の名前（例: 'export.csv'）
+        default: 未登録の場合に返す位置
+    """
+    row = conn.execute(f'SELECT seq FROM {CONSUMER_TABLE} WHERE name = ?', (name,)).fetchone()
+    return row[0] if row else default
+
+def advance_consumer(conn: sqlite3.Connection, name: str, seq: int):
+    """
+    差分を処理し終えた位置を記録する
+
+    Args:
+        conn: データベース接続
+        name: 処理する側の名前
+        seq: 処理し終えた最後の変更番号
+    """
+    conn.execute(f"""
+        INSERT OR REPLACE INTO {CONSUMER_TABLE} (name, seq, updated_at)
+        VALUES (?, ?, strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))
+    """, (name, seq))
+
+def read_consumer(conn: sqlite3.Connection, name: str,
+                  limit: int = 500) -> Iterator[Tuple[List[Dict[str, Any]], int]]:
+    """
+    処理する側の読み込み位置以降の変更をバッチごとに返す
+
+    位置は自動では進めない。各バッチを処理し終えたら advance_consumer で記録する。
+
+    Args:
+        conn: データベース接続
+        name: 処理する側の名前
+        limit: 1バッチの最大件数
+
+    Yields:
+        (変更のリスト, そのバッチの最後の変更番号)
+    """
+    cursor = consumer_cursor(conn, name)
+    while True:
+        changes, next_cursor = changes_since(conn, cursor, limit)
+        if next_cursor == cursor:
+            break
+        yield changes, next_cursor
+        cursor = next_cursor
+
+def compact(conn: sqlite3.Connection) -> int:
+    """
+    変更ログを圧縮する
+
+    同じ記録へのより新しい変更がある追加・更新は changes_since の結果に
+    影響しないので削除する。墓標は、登録済みの全ての処理する側が読み終えた
+    ものだけを削除する（処理する側が未登録なら残す）。
+
+    変更ログを読む側は必ず advance_consumer で位置を登録すること
+    （差分エクスポート・同期の送信と各クライアント・ヒートマップ・ストリーク）。
+    登録していない側が読む前の墓標は消えてしまう。
+
+    Returns:
+        削除した変更の件数
+    """
+    removed = conn.execute(f"""
+        DELETE FROM {CHANGE_TABLE}
+        WHERE op != 'D' AND seq < (
+            SELECT MAX(c.seq) FROM {CHANGE_TABLE} c WHERE c.record_id = {CHANGE_TABLE}.record_id
+        )
+    """).rowcount
+    oldest = conn.execute(f'SELECT MIN(seq) FROM {CONSUMER_TABLE}').fetchone()[0]
+    if oldest is not None:
+        removed += conn.execute(
+            f"DELETE FROM {CHANGE_TABLE} WHERE op = 'D' AND seq <= ?", (oldest,)
+        ).rowcount
+    return removed
@@ -0,0 +1,196 @@
+import importlib.util
+import logging
+import os
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, Tuple
+import numpy as np
+from archive import ArchiveManager
+from database import MeditationRecord
+
+logger = logging.getLogger('columnar_export')
+
+RECORD_TABLE = MeditationRecord._meta.table_name
+# Parquet / Feather の書き出しには pyarrow が必要（なければ .npz で書き出す）
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+FORMATS = ('parquet', 'feather', 'npz')
+# .npz 形式が変わったら上げる
+NPZ_VERSION = 1
+
+# 日時はSQL側で整数に変換し、そのまま datetime64 として扱う
+# （保存されている日時はタイムゾーンなしのローカル時刻なので、変換後もそのまま）
+_EPOCH_JULIAN = 2440587.5
+_SELECT = """
+    SELECT id,
+           CAST(julianday(date) - {epoch} AS INTEGER),
+           CAST(strftime('%s', start_time) AS INTEGER),
+           CAST(strftime('%s', end_time) AS INTEGER),
+           duration,
+           card_name,
+           notes,
+           CAST(ROUND((julianday(created_at) - {epoch}) * 86400000) AS INTEGER),
+           CAST(ROUND((julianday(updated_at) - {epoch}) * 86400000) AS INTEGER)
+    FROM {source}
+    ORDER BY start_time
+"""
+
+def encode_strings(values: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    文字列の列を連結したUTF-8バイト列とオフセットに変換する
+
+    i番目の文字列は data[offsets[i]:offsets[i + 1]] になる。
+
+    Returns:
+        (data: uint8配列, offsets: int64配列)
+    """
+    encoded = [(value or '').encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+def decode_strings(data: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """encode_strings の逆変換"""
+    raw = data.tobytes()
+    bounds = offsets.tolist()
+    return np.array([raw[start:end].decode('utf-8') for start, end in zip(bounds, bounds[1:])], dtype=object)
+
+def read_columns(db_path: Path) -> Dict[str, np.ndarray]:
+    """
+    瞑想記録（アーカイブ済みを含む）を型付きの列として一括で読み込む
+
+    カード名は辞書（card_names）とそのインデックス（card_code）に分ける。
+
+    Args:
+        db_path: データベースファイル
+
+    Returns:
+        {列名: numpy配列}（notes と card_names は文字列のオブジェクト配列）
+    """
+    with sqlite3.connect(str(db_path)) as conn:
+        source = ArchiveManager(db_path).attach(conn)
+        rows = conn.execute(_SELECT.format(epoch=_EPOCH_JULIAN, source=source)).fetchall()
+
+    columns = list(zip(*rows)) if rows else [()] * 9
+    ids, dates, starts, ends, durations, cards, notes, created, updated = columns
+    card_names, card_code = np.unique(np.array(cards, dtype=object), return_inverse=True)
+
+    return {
+        'id': np.array(ids, dtype=np.int64),
+        'date': np.array(dates, dtype=np.int64).astype('datetime64[D]'),
+        'start_time': np.array(starts, dtype=np.int64).astype('datetime64[s]'),
+        'end_time': np.array(ends, dtype=np.int64).astype('datetime64[s]'),
+        'duration': np.array(durations, dtype=np.int32),
+        'card_code': card_code.astype(np.int32),
+        'card_names': card_names,
+        'notes': np.array(notes, dtype=object),
+        'created_at': np.array(created, dtype=np.int64).astype('datetime64[ms]'),
+        'updated_at': np.array(updated, dtype=np.int64).astype('datetime64[ms]'),
+    }
+
+def resolve_format(path: Path, export_format: str = 'auto') -> str:
+    """
+    書き出し形式を決める
+
+    'auto' の場合は拡張子から決め、拡張子で決まらなければ pyarrow が
+    あれば Parquet、なければ .npz にする。
+    """
+    if export_format == 'auto':
+        suffix = Path(path).suffix.lower().lstrip('.')
+        if suffix in FORMATS:
+            export_format = suffix
+        else:
+            export_format = 'parquet' if HAS_PYARROW else 'npz'
+    if export_format not in FORMATS:
+        raise ValueError(f'unknown export format: {export_format}')
+    if export_format in ('parquet', 'feather') and not HAS_PYARROW:
+        raise ImportError(f'pyarrow is required to write {export_format} files')
+    return export_format
+
+def write_npz(columns: Dict[str, np.ndarray], path: Path):
+    """
+    列を .npz に書き出す（pickle を使わないので numpy だけで安全に読める）
+
+    文字列の列は <列名>.data / <列名>.offsets の2つの配列にする。
+    """
+    arrays = {'version': np.array(NPZ_VERSION)}
+    for name, values in columns.items():
+        if values.dtype == object:
+            arrays[f'{name}.data'], arrays[f'{name}.offsets'] = encode_strings(values.tolist())
+        else:
+            arrays[name] = values
+    with open(path, 'wb') as f:
+        np.savez(f, **arrays)
+
+def load_npz(path: Path) -> Dict[str, np.ndarray]:
+    """
+    write_npz で書き出したファイルを読み込む
+
+    Returns:
+        {列名: numpy配列}（card_name は card_names[card_code] で復元した配列）
+    """
+    with np.load(str(path), allow_pickle=False) as npz:
+        if int(npz['version']) != NPZ_VERSION:
+            raise ValueError(f'unsupported npz version: {int(npz["version"])}')
+        columns = {}
+        for key in npz.files:
+            if key == 'version':
+                continue
+            if key.endswith('.data'):
+                name = key[:-len('.data')]
+                columns[name] = decode_strings(npz[key], npz[f'{name}.offsets'])
+            elif not key.endswith('.offsets'):
+                columns[key] = npz[key]
+    columns['card_name'] = columns['card_names'][columns['card_code']]
+    return columns
+
+def to_dataframe(columns: Dict[str, np.ndarray]):
+    """列を pandas.DataFrame にする（カード名はカテゴリ型）"""
+    import pandas as pd
+    return pd.DataFrame({
+        'id': columns['id'],
+        'date': columns['date'].astype('datetime64[s]'),
+        'start_time': columns['start_time'],
+        'end_time': columns['end_time'],
+        'duration': columns['duration'],
+        'card_name': pd.Categorical.from_codes(columns['card_code'], categories=columns['card_names']),
+        'notes': columns['notes'],
+        'created_at': columns['created_at'],
+        'updated_at': columns['updated_at'],
+    })
+
+def export_columnar(db_path: Path, path: Path, export_format: str = 'auto') -> Tuple[int, str]:
+    """
+    瞑想記録を列指向の形式で書き出す
+
+    Args:
+        db_path: データベースファイル
+        path: 書き出し先のファイル
+        export_format: 'auto' / 'parquet' / 'feather' / 'npz'
+
+    Returns:
+        (書き出した件数, 使った形式)
+
+    Raises:
+        ImportError: pyarrow がないのに Parquet / Feather を指定した場合
+    """
+    export_format = resolve_format(path, export_format)
+    columns = read_columns(db_path)
+
+    # 書き終えてから置き換えるので、途中で失敗しても既存のファイルは壊れない
+    temp = Path(f'{path}.tmp')
+    try:
+        if export_format == 'npz':
+            write_npz(columns, temp)
+        else:
+            frame = to_dataframe(columns)
+            if export_format == 'parquet':
+                frame.to_parquet(temp, index=False)
+            else:
+                frame.to_feather(temp)
+        os.replace(temp, path)
+    finally:
+        if temp.exists():
+            temp.unlink()
+
+    logger.debug(f'Exported {len(columns["id"])} records to {path} ({export_format})')
+    return len(columns['id']), export_format
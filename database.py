@@ -2,21 +2,36 @@ from datetime import datetime
 import os
 import shutil
 from peewee import *
+from playhouse.sqlite_ext import AutoIncrementField
 from PySide6.QtWidgets import QMessageBox
+from metrics import metrics
 
 # データベースのパス設定
 DB_PATH = 'meditation.db'
 BACKUP_PATH = 'meditation.db.bak'
+# スキーマの版（PRAGMA user_version に記録する。テーブル構成を変えたら上げる）
+SCHEMA_VERSION = 1
+
+class InstrumentedSqliteDatabase(SqliteDatabase):
+    """計測が有効な場合にSQLの実行時間を記録するデータベース"""
+
+    def execute_sql(self, sql, *args, **kwargs):
+        if not metrics.enabled:
+            return super().execute_sql(sql, *args, **kwargs)
+        verb = sql.lstrip().split(None, 1)[0].lower() if sql else 'unknown'
+        with metrics.timer(f'sql.{verb}'):
+            return super().execute_sql(sql, *args, **kwargs)
 
 # データベース接続
-db = SqliteDatabase(None)
+db = InstrumentedSqliteDatabase(None)
 
 class BaseModel(Model):
     class Meta:
         database = db
 
 class MeditationRecord(BaseModel):
-    id = AutoField()
+    # アーカイブに移した記録のIDを再利用しないよう AUTOINCREMENT にする
+    id = AutoIncrementField()
     date = DateField()
     start_time = DateTimeField()
     end_time = DateTimeField()
@@ -115,6 +130,11 @@ def initialize_database():
     db.init(DB_PATH)
     db.connect()
     db.create_tables([MeditationRecord], safe=True)
+    # 変更ログ（change_log は MeditationRecord を参照するためここで読み込む）
+    import change_log
+    change_log.install(db.connection())
+    if db.execute_sql('PRAGMA user_version').fetchone()[0] < SCHEMA_VERSION:
+        db.execute_sql(f'PRAGMA user_version = {SCHEMA_VERSION}')
     db.close()
 
     # 正常に初期化できた場合はバックアップを作成
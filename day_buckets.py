@@ -0,0 +1,208 @@
+import logging
+from datetime import date
+from typing import Dict, Iterable, Optional, Tuple
+import numpy as np
+import change_log
+from archive import ArchiveManager, archive_manager
+from database import db
+from metrics import metrics
+
+logger = logging.getLogger('day_buckets')
+
+RECORD_TABLE = change_log.RECORD_TABLE
+# 差分がこれより多い場合（インポートなど）は全体を読み直す
+RECOMPUTE_THRESHOLD = 1000
+# 変更ログ上での名前（読み終えていない墓標を圧縮で消されないようにする）
+CONSUMER = 'heatmap'
+# 配列を広げるときの余白（日）
+GROW_DAYS = 366
+# 表示の段階（0 は瞑想なし）
+LEVELS = 5
+_ORDINAL_OFFSET = 1721424.5
+_DAY_SQL = f'CAST(julianday(date(date)) - {_ORDINAL_OFFSET} AS INTEGER)'
+
+class DayBuckets:
+    """
+    日ごとの瞑想時間（分）の配列
+
+    カレンダー表示のために、日（date.toordinal()）を添字にした numpy 配列で
+    瞑想時間を持つ。データベースの変更は変更ログから読んで、変わった記録の
+    日だけを足し引きする。内容が変わるたびに version が増えるので、表示側は
+    それを見て描き直すかどうかを決められる。
+    """
+
+    def __init__(self, database=None, archives: Optional[ArchiveManager] = None):
+        """
+        Args:
+            database: peewee のデータベース（省略時はアプリのデータベース）
+            archives: アーカイブの管理（省略時はアプリのアーカイブ）
+        """
+        self.database = database or db
+        self.archives = archives or archive_manager
+        self.cursor: Optional[int] = None
+        self.version = 0
+        self._clear()
+
+    def _clear(self):
+        self.origin = date.today().toordinal()
+        self.minutes = np.zeros(0, dtype=np.float64)
+        self._records: Dict[int, Tuple[int, float]] = {}
+        self._thresholds: Optional[np.ndarray] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.cursor is not None
+
+    def invalidate(self):
+        """読み込んだ内容を捨てる（次の refresh で全体を読み込み直す）"""
+        self.cursor = None
+
+    def _ensure(self, day: int):
+        """day が配列に入るように広げる（余白を付けて広げ直す回数を減らす）"""
+        if not self.minutes.size:
+            self.origin = day - GROW_DAYS
+            self.minutes = np.zeros(2 * GROW_DAYS, dtype=np.float64)
+            return
+        if day < self.origin:
+            pad = self.origin - day + GROW_DAYS
+            self.minutes = np.concatenate((np.zeros(pad), self.minutes))
+            self.origin -= pad
+        elif day >= self.origin + self.minutes.size:
+            pad = day - self.origin - self.minutes.size + 1 + GROW_DAYS
+            self.minutes = np.concatenate((self.minutes, np.zeros(pad)))
+
+    def _changed(self):
+        self.version += 1
+        self._thresholds = None
+
+    def load(self, days: Iterable[int], minutes: Iterable[float],
+             records: Optional[Dict[int, Tuple[int, float]]] = None):
+        """
+        瞑想ごとの日と時間から配列を作り直す
+
+        Args:
+            days: 瞑想ごとの日（date.toordinal() の値）
+            minutes: 瞑想ごとの時間（分）
+            records: {記録ID: (日, 時間)}（差分で更新できる記録）
+        """
+        self._clear()
+        days = np.asarray(list(days), dtype=np.int64)
+        minutes = np.asarray(list(minutes), dtype=np.float64)
+        if days.size:
+            self._ensure(int(days.min()))
+            self._ensure(int(days.max()))
+            self.minutes = np.bincount(days - self.origin, weights=minutes, minlength=self.minutes.size)
+        self._records = dict(records or {})
+        self._changed()
+
+    @metrics.timed('heatmap.reload')
+    def reload(self):
+        """データベース（アーカイブを含む）から作り直す"""
+        conn = self.database.connection()
+        table = self.archives.attach(conn)
+        # 変更ログのないデータベースでは読み込み位置を持たず、次の refresh でも読み直す
+        cursor = change_log.latest_seq(conn) if change_log.installed(conn) else None
+        rows = conn.execute(f'SELECT id, {_DAY_SQL}, duration FROM main.{RECORD_TABLE}').fetchall()
+        records = {record_id: (day, float(duration or 0)) for record_id, day, duration in rows}
+        days = [day for day, _ in records.values()]
+        minutes = [duration for _, duration in records.values()]
+        if table != RECORD_TABLE:
+            # アーカイブの記録は変更されないので、日と時間だけを足す
+            schemas = [row[1] for row in conn.execute('PRAGMA database_list') if row[1].startswith('archive_')]
+            for schema in schemas:
+                for day, duration in conn.execute(f'SELECT {_DAY_SQL}, duration FROM {schema}.{RECORD_TABLE}'):
+                    days.append(day)
+                    minutes.append(float(duration or 0))
+        self.load(days, minutes, records)
+        if cursor is None:
+            self.cursor = None
+        else:
+            self._set_cursor(conn, cursor)
+
+    def _set_cursor(self, conn, cursor: int):
+        """読み込み位置を進め、変更ログの処理する側として記録する"""
+        if cursor != self.cursor:
+            change_log.advance_consumer(conn, CONSUMER, cursor)
+        self.cursor = cursor
+
+    def refresh(self) -> bool:
+        """
+        前回からの変更を反映する（未読み込みなら全体を読み込む）
+
+        Returns:
+            内容が変わったかどうか
+        """
+        conn = self.database.connection()
+        if not change_log.installed(conn):
+            self.reload()
+            return True
+        latest = change_log.latest_seq(conn)
+        if not self.loaded or latest < self.cursor or latest - self.cursor > RECOMPUTE_THRESHOLD:
+            self.reload()
+            return True
+        version = self.version
+        while self.cursor < latest:
+            changes, cursor = change_log.changes_since(conn, self.cursor)
+            for change in changes:
+                if change['op'] == 'delete':
+                    self.remove_record(change['record_id'])
+                else:
+                    record = change['record']
+                    day = date.fromisoformat(str(record['date'])[:10]).toordinal()
+                    self.update_record(change['record_id'], day, float(record['duration'] or 0))
+            self._set_cursor(conn, cursor)
+            if not changes:
+                break
+        return self.version != version
+
+    def add(self, day: int, minutes: float):
+        self._ensure(day)
+        self.minutes[day - self.origin] += minutes
+        self._changed()
+
+    def update_record(self, record_id: int, day: int, minutes: float):
+        """記録の追加・変更を反映する"""
+        old = self._records.get(record_id)
+        if old == (day, minutes):
+            return
+        if old is not None:
+            self.add(old[0], -old[1])
+        self._records[record_id] = (day, minutes)
+        self.add(day, minutes)
+
+    def remove_record(self, record_id: int):
+        """記録の削除を反映する"""
+        old = self._records.pop(record_id, None)
+        if old is not None:
+            self.add(old[0], -old[1])
+
+    def first_day(self) -> Optional[int]:
+        """瞑想した最初の日（なければNone）"""
+        active = np.flatnonzero(self.minutes > 0)
+        return int(active[0]) + self.origin if active.size else None
+
+    def range(self, first: int, last: int) -> np.ndarray:
+        """first〜last（両端を含む）の日ごとの時間（範囲外の日は0）"""
+        result = np.zeros(max(last - first + 1, 0))
+        lo = max(first, self.origin)
+        hi = min(last + 1, self.origin + self.minutes.size)
+        if lo < hi:
+            result[lo - first:hi - first] = self.minutes[lo - self.origin:hi - self.origin]
+        return result
+
+    def levels(self, values: np.ndarray) -> np.ndarray:
+        """
+        時間を表示の段階（0〜LEVELS-1）に分ける
+
+        瞑想した日の時間の四分位で区切るので、普段の長さに合わせた濃淡になる。
+        """
+        if self._thresholds is None:
+            active = self.minutes[self.minutes > 0]
+            if active.size:
+                self._thresholds = np.quantile(active, np.linspace(0, 1, LEVELS)[1:-1])
+            else:
+                self._thresholds = np.zeros(LEVELS - 2)
+        return np.where(values > 0, np.digitize(values, self._thresholds, right=True) + 1, 0)
+
+# グローバルなDayBucketsインスタンス
+day_buckets = DayBuckets()
@@ -0,0 +1,166 @@
+import hashlib
+import logging
+import sqlite3
+from pathlib import Path
+from archive import ArchiveManager
+from database import MeditationRecord
+from metrics import metrics
+
+logger = logging.getLogger('db_merge')
+
+RECORD_TABLE = MeditationRecord._meta.table_name
+
+class MergeResult:
+    """マージ1回分の結果"""
+
+    __slots__ = ('inserted', 'updated', 'skipped')
+
+    def __init__(self, inserted: int = 0, updated: int = 0, skipped: int = 0):
+        self.inserted = inserted
+        self.updated = updated
+        self.skipped = skipped
+
+    def __repr__(self):
+        return f'<MergeResult inserted={self.inserted} updated={self.updated} skipped={self.skipped}>'
+
+def _session_key_sql() -> str:
+    """
+    セッションを識別するキーを組み立てるSQL式
+
+    端末ごとの小数秒やT区切りの差を吸収するため、日時は秒までに正規化する。
+    """
+    return (
+        "substr(replace(start_time, 'T', ' '), 1, 19) || '|' || "
+        "substr(replace(end_time, 'T', ' '), 1, 19) || '|' || "
+        "COALESCE(card_name, '')"
+    )
+
+def _sha1_hex(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def session_hash(start_time, end_time, card_name) -> str:
+    """
+    セッションを端末に依存せず識別するための内容ハッシュ
+
+    SQL側の _session_key_sql と同じ正規化を行うので、SQLで計算した値と一致する。
+
+    Args:
+        start_time: 開始日時（文字列またはdatetime）
+        end_time: 終了日時（文字列またはdatetime）
+        card_name: カード名
+
+    Returns:
+        SHA-1の16進文字列
+    """
+    def normalize(value):
+        return str(value).replace('T', ' ')[:19] if value is not None else ''
+    return _sha1_hex(f'{normalize(start_time)}|{normalize(end_time)}|{card_name or ""}')
+
+def connect(db_path: Path) -> sqlite3.Connection:
+    """ハッシュ計算用のSQL関数を登録した接続を返す"""
+    conn = sqlite3.connect(str(db_path), isolation_level=None)
+    conn.create_function('sha1_hex', 1, _sha1_hex, deterministic=True)
+    return conn
+
+@metrics.timed('db.merge')
+def merge_database(source_path: Path, target_path: Path) -> MergeResult:
+    """
+    別のデータベース（またはバックアップ）の瞑想記録を取り込む
+
+    (開始日時, 終了日時, カード名) の内容ハッシュで同一セッションを判定し、
+    存在しないセッションだけを一括で追加する。同一セッションのメモが異なる
+    場合は updated_at が新しい方を採用する。取り込み先のアーカイブにある
+    セッションも既存として扱う（アーカイブは読み取り専用なので、メモは
+    更新せずにスキップする）。処理は全て集合演算のSQLで行い、1つの
+    トランザクションで完了する。
+
+    Args:
+        source_path: 取り込むデータベースファイル
+        target_path: 取り込み先のデータベースファイル
+
+    Returns:
+        追加・更新・スキップした件数
+
+    Raises:
+        FileNotFoundError: source_path が存在しない場合
+        sqlite3.DatabaseError: 瞑想記録のテーブルがない場合など
+    """
+    source_path = Path(source_path)
+    if not source_path.exists():
+        raise FileNotFoundError(str(source_path))
+    if source_path.resolve() == Path(target_path).resolve():
+        return MergeResult()
+
+    conn = connect(target_path)
+    try:
+        conn.execute('ATTACH DATABASE ? AS src', (str(source_path),))
+        tables = {row[0] for row in conn.execute("SELECT name FROM src.sqlite_master WHERE type = 'table'")}
+        if RECORD_TABLE not in tables:
+            raise sqlite3.DatabaseError(f'{source_path} has no {RECORD_TABLE} table')
+        # アーカイブに移した記録を重複して追加しないよう、全期間と照合する
+        target_table = ArchiveManager(target_path).attach(conn)
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = _merge(conn, target_table)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            for table in ('merge_target', 'merge_source', 'merge_updates'):
+                conn.execute(f'DROP TABLE IF EXISTS temp.{table}')
+    finally:
+        conn.close()
+
+    logger.info(f'Merged {source_path}: {result}')
+    return result
+
+def _merge(conn: sqlite3.Connection, target_table: str) -> MergeResult:
+    conn.execute(f"""
+        CREATE TEMP TABLE merge_target AS
+        SELECT sha1_hex({_session_key_sql()}) AS h, id, notes, updated_at
+        FROM {target_table}
+    """)
+    conn.execute('CREATE INDEX temp.merge_target_h ON merge_target(h)')
+
+    # 取り込み元の中での重複は updated_at が最新の行にまとめる
+    # （SQLiteでは MAX() と同時に選んだ列は最大値の行の値になる）
+    conn.execute(f"""
+        CREATE TEMP TABLE merge_source AS
+        SELECT sha1_hex({_session_key_sql()}) AS h,
+               date, start_time, end_time, duration, card_name, notes, created_at,
+               MAX(updated_at) AS updated_at, COUNT(*) AS copies
+        FROM src.{RECORD_TABLE}
+        GROUP BY h
+    """)
+    conn.execute('CREATE UNIQUE INDEX temp.merge_source_h ON merge_source(h)')
+    source_rows = conn.execute('SELECT COALESCE(SUM(copies), 0) FROM merge_source').fetchone()[0]
+
+    inserted = conn.execute(f"""
+        INSERT INTO main.{RECORD_TABLE}
+            (date, start_time, end_time, duration, card_name, notes, created_at, updated_at)
+        SELECT date, start_time, end_time, duration, card_name, notes, created_at, updated_at
+        FROM merge_source s
+        WHERE NOT EXISTS (SELECT 1 FROM merge_target t WHERE t.h = s.h)
+        ORDER BY start_time
+    """).rowcount
+
+    conn.execute("""
+        CREATE TEMP TABLE merge_updates (id INTEGER PRIMARY KEY, notes TEXT, updated_at TEXT)
+    """)
+    conn.execute("""
+        INSERT OR REPLACE INTO merge_updates (id, notes, updated_at)
+        SELECT t.id, s.notes, s.updated_at
+        FROM merge_source s JOIN merge_target t ON t.h = s.h
+        WHERE s.updated_at > t.updated_at AND s.notes IS NOT t.notes
+    """)
+    # アーカイブの記録は main にないので更新されない
+    updated = conn.execute(f"""
+        UPDATE main.{RECORD_TABLE}
+        SET notes = (SELECT u.notes FROM merge_updates u WHERE u.id = {RECORD_TABLE}.id),
+            updated_at = (SELECT u.updated_at FROM merge_updates u WHERE u.id = {RECORD_TABLE}.id)
+        WHERE id IN (SELECT id FROM merge_updates)
+    """).rowcount
+
+    return MergeResult(inserted=inserted, updated=updated, skipped=source_rows - inserted - updated)
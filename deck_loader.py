@@ -0,0 +1,253 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from card_catalog import Card, CardCatalog, NO_INTERPRETATION, load_catalog
+from settings import settings
+
+logger = logging.getLogger('deck_loader')
+
+# 標準デッキの名前
+DEFAULT_DECK = 'default'
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+# 生成するサムネイルの長辺ピクセル数
+THUMBNAIL_SIZES = (64, 150, 300)
+
+class Deck:
+    """カード画像のディレクトリ1つ分のデッキ"""
+
+    def __init__(self, name: str, path: Path):
+        self.name = name
+        self.path = Path(path)
+
+    @property
+    def images(self) -> List[Path]:
+        """デッキ内の画像ファイル（ファイル名順）"""
+        return sorted(
+            p for p in self.path.iterdir()
+            if p.is_file() and p.suffix.lower() in IMAGE_EXTENSIONS and not p.name.startswith('.')
+        )
+
+    @property
+    def metadata_file(self) -> Optional[Path]:
+        """カードの解釈などを記述したCSV（tattva.csv と同じ形式）"""
+        path = self.path / 'tattva.csv'
+        return path if path.exists() else None
+
+    def __repr__(self):
+        return f'<Deck {self.name} {self.path}>'
+
+def discover_decks(decks_dir: Optional[Path] = None, default_dir: Optional[Path] = None) -> Dict[str, Deck]:
+    """
+    デッキを検出する
+
+    標準デッキ（images/）に加えて、decks/ 以下の画像を含むサブディレクトリを
+    それぞれ1つのデッキとして扱う。
+
+    Args:
+        decks_dir: ユーザーデッキのディレクトリ（省略時は decks/）
+        default_dir: 標準デッキのディレクトリ（省略時は images/）
+
+    Returns:
+        {デッキ名: Deck}
+    """
+    decks_dir = Path(decks_dir) if decks_dir else settings.app_dir / 'decks'
+    default_dir = Path(default_dir) if default_dir else settings.app_dir / 'images'
+
+    decks: Dict[str, Deck] = {}
+    if default_dir.is_dir():
+        decks[DEFAULT_DECK] = Deck(DEFAULT_DECK, default_dir)
+    if decks_dir.is_dir():
+        for path in sorted(decks_dir.iterdir()):
+            if path.is_dir() and not path.name.startswith('.') and path.name != DEFAULT_DECK:
+                deck = Deck(path.name, path)
+                if deck.images:
+                    decks[deck.name] = deck
+    return decks
+
+def load_deck_catalog(deck: Deck, cache_dir: Optional[Path] = None) -> CardCatalog:
+    """
+    デッキのカードカタログを読み込む
+
+    tattva.csv のあるデッキはそれを使い、ないデッキは画像ファイル名を
+    カード名にする（解釈はなし）。
+
+    Args:
+        deck: デッキ
+        cache_dir: コンパイル済みカタログを置くディレクトリ（省略時は .cache/decks/）
+    """
+    if deck.metadata_file is not None:
+        cache_dir = Path(cache_dir) if cache_dir else settings.app_dir / '.cache' / 'decks'
+        return load_catalog(deck.metadata_file, deck.path, cache_file=cache_dir / f'{deck.name}.catalog')
+    return CardCatalog([
+        Card(element='', name=image.stem, first_element='', second_element='', image_file=image.name,
+             image_path=str(image), positive=NO_INTERPRETATION, negative=NO_INTERPRETATION)
+        for image in deck.images
+    ])
+
+def _render_thumbnails(source: str, targets: Sequence[Tuple[int, str]]) -> Optional[str]:
+    """
+    元画像を1回だけデコードして各サイズのサムネイルを書き出す（ワーカースレッドで実行）
+
+    Returns:
+        エラーメッセージ（成功時はNone）
+    """
+    from PIL import Image
+    try:
+        with Image.open(source) as image:
+            image.load()
+            image = image.convert('RGBA')
+            # 大きいサイズから順に縮小して、デコード済み画像を使い回す
+            for size, target in sorted(targets, reverse=True):
+                image.thumbnail((size, size), Image.LANCZOS)
+                temp = f'{target}.{os.getpid()}.{threading.get_ident()}.tmp'
+                image.save(temp, 'PNG', optimize=False)
+                os.replace(temp, target)
+    except Exception as e:
+        return f'{source}: {e}'
+    return None
+
+class ThumbnailCache:
+    """
+    内容のハッシュをキーにしたサムネイルのディスクキャッシュ
+
+    同じ画像は別のデッキやファイル名でもキャッシュを共有する。
+    パス・サイズ・更新日時からハッシュへの対応を索引に保存するので、
+    変更のないファイルは再読み込みしない。
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None, sizes: Sequence[int] = THUMBNAIL_SIZES,
+                 max_workers: Optional[int] = None):
+        self.cache_dir = Path(cache_dir) if cache_dir else settings.app_dir / '.cache' / 'thumbnails'
+        self.sizes = tuple(sizes)
+        self.max_workers = max_workers
+        self._index_file = self.cache_dir / 'index.json'
+        self._index: Optional[Dict[str, list]] = None
+        self._lock = threading.Lock()
+
+    def _load_index(self) -> Dict[str, list]:
+        if self._index is None:
+            try:
+                with open(self._index_file, 'r', encoding='utf-8') as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+        return self._index
+
+    def _save_index(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        temp = self._index_file.with_suffix('.tmp')
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f)
+        os.replace(temp, self._index_file)
+
+    def cached_hash(self, image: Path) -> Optional[str]:
+        """
+        索引にある内容ハッシュ（ファイルは読まない）
+
+        パス・サイズ・更新日時が索引と同じ場合だけ返し、索引にないか
+        変更されている場合はNoneを返す。
+        """
+        key = str(Path(image).resolve())
+        stat = os.stat(key)
+        with self._lock:
+            entry = self._load_index().get(key)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+        return None
+
+    def content_hash(self, image: Path) -> str:
+        """画像ファイルの内容ハッシュ（変更がなければ索引から返す）"""
+        cached = self.cached_hash(image)
+        if cached is not None:
+            return cached
+        key = str(Path(image).resolve())
+        stat = os.stat(key)
+
+        digest = hashlib.sha256()
+        with open(key, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        content_hash = digest.hexdigest()
+        with self._lock:
+            self._index[key] = [stat.st_size, stat.st_mtime_ns, content_hash]
+        return content_hash
+
+    def _target(self, content_hash: str, size: int) -> Path:
+        return self.cache_dir / content_hash[:2] / f'{content_hash}_{size}.png'
+
+    def lookup(self, image: Path, size: int) -> Optional[Path]:
+        """
+        生成済みのサムネイルを返す（UIスレッドから呼べるよう元画像は読まない）
+
+        索引はパス・サイズ・更新日時で引くので、新しい画像や変更された画像は
+        generate で内容ハッシュを計算し直すまでは未生成として扱う。
+
+        Args:
+            image: 元画像のパス
+            size: サムネイルの長辺ピクセル数
+
+        Returns:
+            サムネイルのパス。未生成の場合はNone
+        """
+        try:
+            content_hash = self.cached_hash(image)
+        except OSError:
+            return None
+        if content_hash is None:
+            return None
+        target = self._target(content_hash, size)
+        return target if target.exists() else None
+
+    def generate(self, images: Sequence[Path]) -> Dict[str, str]:
+        """
+        不足しているサムネイルをスレッドプールで生成する
+
+        Pillow はデコードと縮小の間 GIL を解放するので、スレッドでも並列に進む。
+        プロセスプールと違い、起動元のスクリプト（Qt を含む）を子プロセスで
+        読み込み直すことがない。
+
+        Args:
+            images: 元画像のパス
+
+        Returns:
+            生成に失敗した画像とエラーメッセージ
+        """
+        jobs = []
+        queued = set()
+        for image in images:
+            content_hash = self.content_hash(image)
+            targets = [(size, str(self._target(content_hash, size))) for size in self.sizes]
+            missing = [(size, target) for size, target in targets if not os.path.exists(target)]
+            # 内容が同じ画像は1回だけ生成する
+            missing = [(size, target) for size, target in missing if target not in queued]
+            if missing:
+                Path(missing[0][1]).parent.mkdir(parents=True, exist_ok=True)
+                queued.update(target for _, target in missing)
+                jobs.append((str(image), missing))
+
+        errors: Dict[str, str] = {}
+        if jobs:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [executor.submit(_render_thumbnails, source, targets) for source, targets in jobs]
+                for (source, _), future in zip(jobs, futures):
+                    error = future.result()
+                    if error:
+                        errors[source] = error
+                        logger.warning(f'Thumbnail generation failed: {error}')
+
+        with self._lock:
+            if self._index is not None:
+                self._save_index()
+        return errors
+
+    def generate_deck(self, deck: Deck) -> Dict[str, str]:
+        """デッキ内の全画像のサムネイルを生成する"""
+        return self.generate(deck.images)
+
+# グローバルなThumbnailCacheインスタンス
+thumbnail_cache = ThumbnailCache()
@@ -1,54 +1,151 @@
 import json
+import logging
+import marshal
 import os
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Callable, Optional
 from settings import settings
 
+logger = logging.getLogger('i18n')
+
+# コンパイル済みカタログの形式が変わったら上げる
+CATALOG_VERSION = 1
+
+class Catalog(dict):
+    """フラット化された翻訳カタログ。未登録のキーはキー自身を返す"""
+
+    def __missing__(self, key: str) -> str:
+        return key
+
+def flatten_translations(data: Dict[str, Any], prefix: str = '') -> Dict[str, str]:
+    """
+    入れ子の翻訳データをドット区切りキーの一階層の辞書に変換する
+
+    Args:
+        data: 言語ファイルの内容
+        prefix: 親キーのプレフィックス
+
+    Returns:
+        {"app.title": "..."} 形式の辞書。文字列以外の値は含めない
+    """
+    flat: Dict[str, str] = {}
+    for key, value in data.items():
+        full_key = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(flatten_translations(value, f'{full_key}.'))
+        elif isinstance(value, str):
+            flat[full_key] = value
+    return flat
+
 class I18n:
-    def __init__(self):
-        self._translations: Dict[str, Dict[str, Any]] = {}
-        self._load_translations()
+    def __init__(self, locales_dir: Optional[Path] = None, cache_dir: Optional[Path] = None):
+        self.locales_dir = Path(locales_dir) if locales_dir else settings.locales_dir
+        self.cache_dir = Path(cache_dir) if cache_dir else settings.app_dir / '.cache' / 'locales'
+        self._catalogs: Dict[str, Catalog] = {}
+        self._language: Optional[str] = None
+        self._lookup: Callable[[str], str] = Catalog().__getitem__
+        self.set_language(settings.language)
+        # 設定の言語が変わったら（設定ファイルの外部編集の読み込み直しを含む）切り替える
+        settings.add_listener('language', self._follow_settings)
+
+    def _source_path(self, lang: str) -> Path:
+        return self.locales_dir / f'{lang}.json'
+
+    def _cache_path(self, lang: str) -> Path:
+        return self.cache_dir / f'{lang}.catalog'
+
+    def compile_catalog(self, lang: str) -> Catalog:
+        """
+        言語ファイルをフラットなカタログにコンパイルし、ディスクにキャッシュする
+
+        Args:
+            lang: 言語コード
+
+        Returns:
+            コンパイル済みカタログ（言語ファイルがない場合は空）
+        """
+        source = self._source_path(lang)
+        try:
+            stat = source.stat()
+        except OSError:
+            return Catalog()
+
+        cache = self._cache_path(lang)
+        try:
+            with open(cache, 'rb') as f:
+                version, mtime_ns, size, flat = marshal.load(f)
+            if (version, mtime_ns, size) == (CATALOG_VERSION, stat.st_mtime_ns, stat.st_size):
+                return Catalog(flat)
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
 
-    def _load_translations(self):
-        """利用可能な全ての言語ファイルを読み込む"""
-        locales_dir = settings.locales_dir
-        if not locales_dir.exists():
-            return
+        with open(source, 'r', encoding='utf-8') as f:
+            flat = flatten_translations(json.load(f))
 
-        for file in locales_dir.glob('*.json'):
-            lang = file.stem
-            with open(file, 'r', encoding='utf-8') as f:
-                self._translations[lang] = json.load(f)
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            temp = cache.with_suffix('.tmp')
+            with open(temp, 'wb') as f:
+                marshal.dump((CATALOG_VERSION, stat.st_mtime_ns, stat.st_size, flat), f)
+            os.replace(temp, cache)
+        except OSError as e:
+            # キャッシュが書けなくても翻訳自体は使える
+            logger.warning(f'Failed to write translation cache for {lang}: {str(e)}')
+
+        return Catalog(flat)
+
+    def catalog(self, lang: str) -> Catalog:
+        """指定言語のカタログを返す（初回アクセス時に読み込む）"""
+        catalog = self._catalogs.get(lang)
+        if catalog is None:
+            catalog = self._catalogs[lang] = self.compile_catalog(lang)
+        return catalog
+
+    def bind(self, lang: str) -> Callable[[str], str]:
+        """
+        指定言語に束縛された翻訳関数を返す
+
+        Args:
+            lang: 言語コード
+
+        Returns:
+            キーを受け取り翻訳を返す関数。辞書の参照1回で完了する
+        """
+        return self.catalog(lang).__getitem__
+
+    def set_language(self, lang: str):
+        """現在の言語を切り替える"""
+        self._language = lang
+        self._lookup = self.bind(lang)
+
+    def _follow_settings(self, lang: Optional[str]):
+        if lang and lang != self._language:
+            self.set_language(lang)
+
+    @property
+    def language(self) -> Optional[str]:
+        return self._language
 
     def get(self, key: str, lang: Optional[str] = None) -> str:
         """
         指定されたキーの翻訳を取得する
-        
+
         Args:
             key: ドット区切りの翻訳キー (例: "app.title")
             lang: 言語コード (指定がない場合は現在の設定言語を使用)
-        
+
         Returns:
             翻訳されたテキスト。翻訳が見つからない場合はキーをそのまま返す
         """
         if lang is None:
-            lang = settings.language
-
-        if lang not in self._translations:
-            return key
-
-        current = self._translations[lang]
-        for part in key.split('.'):
-            if isinstance(current, dict) and part in current:
-                current = current[part]
-            else:
-                return key
-
-        return current if isinstance(current, str) else key
+            return self._lookup(key)
+        return self.catalog(lang)[key]
 
     def available_languages(self) -> list[str]:
         """利用可能な言語のリストを返す"""
-        return list(self._translations.keys())
+        if not self.locales_dir.exists():
+            return []
+        return sorted(file.stem for file in self.locales_dir.glob('*.json'))
 
 # グローバルなI18nインスタンス
 i18n = I18n()
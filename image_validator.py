@@ -0,0 +1,205 @@
+import json
+import logging
+import os
+import struct
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from settings import settings
+
+logger = logging.getLogger('image_validator')
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# カード画像の規定サイズ（幅, 高さ）
+CARD_SIZE = (201, 257)
+# カード画像の命名規則 [element1]_[element2].png
+CARD_PATTERN = '*_*.png'
+# キャッシュ形式が変わったら上げる
+CACHE_VERSION = 1
+
+class ImageValidationResult:
+    """画像1枚分の検証結果"""
+
+    __slots__ = ('path', 'valid', 'width', 'height', 'error')
+
+    def __init__(self, path: str, valid: bool, width: int = 0, height: int = 0, error: str = ''):
+        self.path = path
+        self.valid = valid
+        self.width = width
+        self.height = height
+        self.error = error
+
+    def to_list(self) -> list:
+        return [self.valid, self.width, self.height, self.error]
+
+    def __repr__(self):
+        status = 'valid' if self.valid else f'invalid: {self.error}'
+        return f'<ImageValidationResult {self.path} {self.width}x{self.height} {status}>'
+
+def read_png_size(path: str) -> Tuple[int, int]:
+    """
+    画像をデコードせずにIHDRチャンクから幅と高さを読み取る
+
+    Args:
+        path: PNGファイルのパス
+
+    Returns:
+        (幅, 高さ)
+
+    Raises:
+        ValueError: PNGファイルではない場合
+    """
+    with open(path, 'rb') as f:
+        header = f.read(24)
+    if len(header) < 24 or header[:8] != PNG_SIGNATURE or header[12:16] != b'IHDR':
+        raise ValueError('not a PNG file')
+    return struct.unpack('>II', header[16:24])
+
+def validate_png(path: str, expected_size: Optional[Tuple[int, int]] = CARD_SIZE) -> ImageValidationResult:
+    """
+    PNGファイルの構造とサイズを検証する
+
+    全チャンクのCRCを確認し、IHDRで始まりIENDで終わることを確かめる。
+    画素データのデコードは行わない。
+
+    Args:
+        path: PNGファイルのパス
+        expected_size: 期待するサイズ（Noneの場合はサイズを確認しない）
+
+    Returns:
+        検証結果
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        return ImageValidationResult(path, False, error=f'cannot read file: {e.strerror}')
+
+    if data[:8] != PNG_SIGNATURE:
+        return ImageValidationResult(path, False, error='invalid PNG signature')
+
+    width = height = 0
+    offset = 8
+    first = True
+    while True:
+        if offset + 8 > len(data):
+            return ImageValidationResult(path, False, width, height, 'truncated file (missing IEND)')
+        length, chunk_type = struct.unpack('>I4s', data[offset:offset + 8])
+        end = offset + 12 + length
+        if end > len(data):
+            return ImageValidationResult(path, False, width, height, f'truncated {chunk_type!r} chunk')
+        body = data[offset + 8:offset + 8 + length]
+        (crc,) = struct.unpack('>I', data[offset + 8 + length:end])
+        if zlib.crc32(chunk_type + body) != crc:
+            return ImageValidationResult(path, False, width, height, f'CRC mismatch in {chunk_type!r} chunk')
+
+        if first:
+            if chunk_type != b'IHDR' or length != 13:
+                return ImageValidationResult(path, False, error='IHDR chunk missing')
+            width, height = struct.unpack('>II', body[:8])
+            first = False
+        if chunk_type == b'IEND':
+            break
+        offset = end
+
+    if expected_size is not None and (width, height) != tuple(expected_size):
+        return ImageValidationResult(
+            path, False, width, height,
+            f'unexpected size {width}x{height} (expected {expected_size[0]}x{expected_size[1]})'
+        )
+    return ImageValidationResult(path, True, width, height)
+
+class ImageValidator:
+    def __init__(self, cache_file: Optional[Path] = None,
+                 expected_size: Optional[Tuple[int, int]] = CARD_SIZE, max_workers: Optional[int] = None):
+        self.cache_file = Path(cache_file) if cache_file else settings.app_dir / '.cache' / 'image_validation.json'
+        self.expected_size = expected_size
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._cache: Optional[Dict[str, list]] = None
+        self._dirty = False
+
+    def _load_cache(self) -> Dict[str, list]:
+        if self._cache is None:
+            self._cache = {}
+            try:
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == CACHE_VERSION and data.get('expected_size') == list(self.expected_size or []):
+                    self._cache = data['entries']
+            except (OSError, ValueError, KeyError, TypeError):
+                pass
+        return self._cache
+
+    def save_cache(self):
+        """検証結果のキャッシュをファイルに書き込む"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {
+                'version': CACHE_VERSION,
+                'expected_size': list(self.expected_size or []),
+                'entries': self._cache,
+            }
+            self._dirty = False
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            temp = self.cache_file.with_suffix('.tmp')
+            with open(temp, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp, self.cache_file)
+        except OSError as e:
+            logger.warning(f'Failed to write image validation cache: {str(e)}')
+
+    def validate(self, path: str) -> ImageValidationResult:
+        """
+        画像を検証する（パス・サイズ・更新日時が同じなら前回の結果を使う）
+
+        Args:
+            path: PNGファイルのパス
+
+        Returns:
+            検証結果
+        """
+        key = os.path.abspath(path)
+        try:
+            stat = os.stat(key)
+        except OSError:
+            return ImageValidationResult(path, False, error='file not found')
+
+        with self._lock:
+            cached = self._load_cache().get(key)
+        if cached is not None and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return ImageValidationResult(path, *cached[2:])
+
+        result = validate_png(path, self.expected_size)
+        with self._lock:
+            self._cache[key] = [stat.st_size, stat.st_mtime_ns] + result.to_list()
+            self._dirty = True
+        return result
+
+    def validate_all(self, directory: Path = Path('images'), pattern: str = CARD_PATTERN) -> Dict[str, ImageValidationResult]:
+        """
+        ディレクトリ内の画像をスレッドプールで並列に検証する
+
+        Args:
+            directory: 画像ディレクトリ
+            pattern: 対象ファイルのglobパターン
+
+        Returns:
+            {パス: 検証結果}
+        """
+        paths = sorted(str(path) for path in Path(directory).glob(pattern))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = dict(zip(paths, executor.map(self.validate, paths)))
+        self.save_cache()
+
+        for result in results.values():
+            if not result.valid:
+                logger.warning(f'Invalid card image {result.path}: {result.error}')
+        return results
+
+# グローバルなImageValidatorインスタンス
+image_validator = ImageValidator()
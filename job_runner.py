@@ -0,0 +1,172 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Optional
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Qt, Signal
+from PySide6.QtWidgets import QProgressDialog, QWidget
+from i18n import i18n
+
+logger = logging.getLogger('job_runner')
+
+# 進捗の通知の最短間隔（秒）。行ごとに呼ばれても画面の更新は増やさない
+PROGRESS_INTERVAL = 0.05
+# これより早く終わる処理では進捗ダイアログを出さない（ミリ秒）
+PROGRESS_DELAY_MS = 300
+
+class JobCancelled(Exception):
+    """ジョブが取り消された"""
+
+class JobSignals(QObject):
+    """
+    ジョブからメインスレッドへの通知（QRunnable はシグナルを持てないので分ける）
+
+    progress: (済んだ量, 全体の量)。全体が0なら量は不明
+    finished: 処理の戻り値
+    failed: 例外のメッセージ
+    cancelled: 取り消しで中断した
+    """
+    progress = Signal(int, int)
+    finished = Signal(object)
+    failed = Signal(str)
+    cancelled = Signal()
+
+class Job(QRunnable):
+    """
+    補助スレッドで実行する処理1件
+
+    cancellable な処理には progress 引数として report を渡す。処理は途中で
+    report(済んだ量, 全体の量) を呼び、取り消されていれば JobCancelled で
+    中断する。
+    """
+
+    def __init__(self, func: Callable[..., Any], args: tuple, kwargs: dict, cancellable: bool = False):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.cancellable = cancellable
+        self.signals = JobSignals()
+        self._cancel_event = threading.Event()
+        self._last_report = 0.0
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        """取り消しを要求する（処理が次に report を呼んだときに中断する）"""
+        self._cancel_event.set()
+
+    def report(self, done: int, total: int = 0):
+        """
+        進捗を知らせる（補助スレッドから呼ぶ）
+
+        Raises:
+            JobCancelled: 取り消しが要求されている場合
+        """
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+        now = time.monotonic()
+        if now - self._last_report >= PROGRESS_INTERVAL or (total and done >= total):
+            self._last_report = now
+            self.signals.progress.emit(done, total)
+
+    def run(self):
+        try:
+            if self._cancel_event.is_set():
+                raise JobCancelled()
+            kwargs = dict(self.kwargs, progress=self.report) if self.cancellable else self.kwargs
+            result = self.func(*self.args, **kwargs)
+        except JobCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            logger.error(f'Job {getattr(self.func, "__name__", self.func)} failed: {str(e)}')
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(result)
+
+class JobRunner(QObject):
+    """
+    時間のかかる処理を補助スレッドで実行し、進捗ダイアログを表示する
+
+    データベースへの書き込みが重ならないよう、既定では1件ずつ順に実行する。
+    結果はメインスレッドで on_result / on_error に渡される。
+    """
+
+    def __init__(self, max_threads: int = 1, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        # 実行中のジョブを保持しておく（Python側の参照がなくなると破棄されるため）
+        self._jobs = set()
+
+    def run(self, parent: Optional[QWidget], title: str, func: Callable[..., Any], *args,
+            cancellable: bool = False, on_result: Optional[Callable[[Any], None]] = None,
+            on_error: Optional[Callable[[str], None]] = None,
+            on_cancel: Optional[Callable[[], None]] = None, **kwargs) -> Job:
+        """
+        処理を補助スレッドで開始する
+
+        Args:
+            parent: 進捗ダイアログの親（Noneならダイアログを出さない）
+            title: 進捗ダイアログに表示する文
+            func: 実行する処理
+            cancellable: True の場合は func に progress 引数を渡し、取り消しボタンを出す
+            on_result: 処理の戻り値を受け取る関数
+            on_error: 例外のメッセージを受け取る関数
+            on_cancel: 取り消されたときに呼ぶ関数
+
+        Returns:
+            開始したジョブ
+        """
+        job = Job(func, args, kwargs, cancellable)
+        dialog = None
+        if parent is not None:
+            dialog = QProgressDialog(title, i18n.get('job.cancel'), 0, 0, parent)
+            if not cancellable:
+                dialog.setCancelButton(None)
+            dialog.setWindowTitle(parent.windowTitle())
+            dialog.setWindowModality(Qt.WindowModal)
+            dialog.setMinimumDuration(PROGRESS_DELAY_MS)
+            dialog.setAutoClose(False)
+            dialog.setAutoReset(False)
+            dialog.canceled.connect(job.cancel)
+            job.signals.progress.connect(lambda done, total: self._show_progress(dialog, done, total))
+
+        def done(callback, *values):
+            self._jobs.discard(job)
+            if dialog is not None:
+                # close() でも canceled が送られるので先に切り離す
+                dialog.canceled.disconnect(job.cancel)
+                dialog.close()
+                dialog.deleteLater()
+            if callback is not None:
+                callback(*values)
+
+        job.signals.finished.connect(lambda result: done(on_result, result))
+        job.signals.failed.connect(lambda message: done(on_error, message))
+        job.signals.cancelled.connect(lambda: done(on_cancel))
+        self._jobs.add(job)
+        self.pool.start(job)
+        return job
+
+    @staticmethod
+    def _show_progress(dialog: QProgressDialog, done: int, total: int):
+        if total > 0:
+            dialog.setMaximum(total)
+            dialog.setValue(min(done, total))
+        else:
+            # 全体の量が不明な間は動き続ける表示にする
+            dialog.setMaximum(0)
+
+    @property
+    def busy(self) -> bool:
+        return bool(self._jobs)
+
+    def wait(self, msecs: int = -1) -> bool:
+        """実行中のジョブが終わるまで待つ（終了時・テスト用）"""
+        return self.pool.waitForDone(msecs)
+
+# グローバルなJobRunnerインスタンス
+job_runner = JobRunner()
@@ -0,0 +1,295 @@
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import change_log
+from metrics import metrics
+
+logger = logging.getLogger('maintenance')
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+# 実行する順番と間隔（秒）
+JOB_INTERVALS: Dict[str, int] = {
+    'incremental_vacuum': HOUR,
+    'compact_change_log': DAY,
+    'optimize': DAY,
+    'analyze': 7 * DAY,
+    'integrity_check': 7 * DAY,
+    'vacuum': 30 * DAY,
+}
+# 1回の incremental_vacuum で解放するページ数（この単位で中断できる）
+VACUUM_STEP_PAGES = 256
+# 空きページの割合がこれを超えたら間隔を待たずに VACUUM する
+VACUUM_FREE_RATIO = 0.25
+# 実行履歴を残す件数（ジョブごと）
+HISTORY_PER_JOB = 50
+RUN_TABLE = 'maintenance_run'
+# auto_vacuum = INCREMENTAL
+AUTO_VACUUM_INCREMENTAL = 2
+
+class MaintenanceInterrupted(Exception):
+    """瞑想の開始などでメンテナンスが中断された"""
+
+class MaintenanceScheduler:
+    """
+    アイドル時にデータベースのメンテナンスを行うスケジューラー
+
+    瞑想中でない状態が idle_delay 秒続いたら、期限の来たジョブを補助スレッドで
+    1つずつ実行する。pause() が呼ばれると実行中のSQLを中断し、resume() されて
+    再びアイドルになるまで待つ。各ジョブの所要時間と結果は maintenance_run
+    テーブルとメトリクスに記録する。
+    """
+
+    def __init__(self, db_path: Optional[Path] = None, idle_delay: float = 60.0,
+                 check_interval: float = 60.0):
+        """
+        Args:
+            db_path: データベースファイル
+            idle_delay: アイドルになってからジョブを始めるまでの時間（秒）
+            check_interval: 期限を確認する間隔（秒）
+        """
+        self.db_path = Path(db_path) if db_path else Path('meditation.db')
+        self.idle_delay = idle_delay
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._paused = False
+        self._idle_since = time.monotonic()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._progress: Optional[Tuple[str, float]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._jobs: Dict[str, Callable[[sqlite3.Connection], str]] = {
+            'incremental_vacuum': self._incremental_vacuum,
+            'compact_change_log': self._compact_change_log,
+            'optimize': self._optimize,
+            'analyze': self._analyze,
+            'integrity_check': self._integrity_check,
+            'vacuum': self._vacuum,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    @property
+    def progress(self) -> Optional[Tuple[str, float]]:
+        """実行中のジョブ名と進捗（0.0〜1.0、不明な場合は0.0）"""
+        return self._progress
+
+    def start(self):
+        """補助スレッドでスケジューラーを開始する"""
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._idle_since = time.monotonic()
+        self._thread = threading.Thread(target=self._loop, name='MaintenanceScheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """スケジューラーを停止する（実行中のジョブは中断する）"""
+        if not self.running:
+            return
+        self._stop_event.set()
+        self._interrupt()
+        self._thread.join()
+        self._thread = None
+
+    def pause(self):
+        """メンテナンスを止める（瞑想の開始時に呼ぶ）"""
+        with self._lock:
+            self._paused = True
+        self._interrupt()
+
+    def resume(self):
+        """メンテナンスを再開できる状態に戻す（瞑想の終了時に呼ぶ）"""
+        with self._lock:
+            self._paused = False
+            self._idle_since = time.monotonic()
+
+    def _interrupt(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.interrupt()
+
+    def _is_idle(self) -> bool:
+        with self._lock:
+            return not self._paused and time.monotonic() - self._idle_since >= self.idle_delay
+
+    def _check_paused(self):
+        with self._lock:
+            if self._paused or self._stop_event.is_set():
+                raise MaintenanceInterrupted()
+
+    def _loop(self):
+        while not self._stop_event.wait(self.check_interval):
+            if self._is_idle():
+                try:
+                    self.run_due()
+                except Exception as e:
+                    logger.error(f'Maintenance failed: {str(e)}')
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path), isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA busy_timeout = 5000')
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {RUN_TABLE} (
+                id INTEGER PRIMARY KEY,
+                job TEXT NOT NULL,
+                started_at TEXT NOT NULL,
+                duration REAL NOT NULL,
+                status TEXT NOT NULL,
+                detail TEXT
+            )
+        """)
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {RUN_TABLE}_job ON {RUN_TABLE} (job, started_at)')
+        return conn
+
+    def last_runs(self) -> Dict[str, dict]:
+        """ジョブごとの最後の実行結果"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(f"""
+                SELECT job, started_at, duration, status, detail FROM {RUN_TABLE}
+                WHERE id IN (SELECT MAX(id) FROM {RUN_TABLE} GROUP BY job)
+            """).fetchall()
+        finally:
+            conn.close()
+        return {job: {'started_at': started_at, 'duration': duration, 'status': status, 'detail': detail}
+                for job, started_at, duration, status, detail in rows}
+
+    def due_jobs(self, conn: sqlite3.Connection) -> List[str]:
+        """期限の来たジョブ（実行順）"""
+        last_ok = dict(conn.execute(f"""
+            SELECT job, MAX(started_at) FROM {RUN_TABLE} WHERE status = 'ok' GROUP BY job
+        """).fetchall())
+        now = datetime.now()
+        due = []
+        for job, interval in JOB_INTERVALS.items():
+            last = last_ok.get(job)
+            if last is None or (now - datetime.fromisoformat(last)).total_seconds() >= interval:
+                due.append(job)
+            elif job == 'vacuum' and self._needs_vacuum(conn):
+                due.append(job)
+        return due
+
+    def run_due(self, force: bool = False) -> Dict[str, str]:
+        """
+        期限の来たジョブを順に実行する
+
+        Args:
+            force: True の場合は期限に関係なく全ジョブを実行する
+
+        Returns:
+            {ジョブ名: 結果の状態}（中断した場合はそれ以降のジョブは含まない）
+        """
+        conn = self._connect()
+        with self._lock:
+            self._conn = conn
+        results = {}
+        try:
+            for job in (list(JOB_INTERVALS) if force else self.due_jobs(conn)):
+                status = self._run_job(conn, job)
+                results[job] = status
+                if status == 'interrupted':
+                    break
+        finally:
+            with self._lock:
+                self._conn = None
+            conn.close()
+        return results
+
+    def _run_job(self, conn: sqlite3.Connection, job: str) -> str:
+        self._progress = (job, 0.0)
+        started_at = datetime.now()
+        start = time.perf_counter()
+        try:
+            self._check_paused()
+            detail = self._jobs[job](conn)
+            status = 'ok'
+        except (MaintenanceInterrupted, sqlite3.OperationalError) as e:
+            interrupted = isinstance(e, MaintenanceInterrupted) or 'interrupted' in str(e)
+            status = 'interrupted' if interrupted else 'failed'
+            detail = '' if interrupted else str(e)
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+        except sqlite3.DatabaseError as e:
+            status, detail = 'failed', str(e)
+        finally:
+            self._progress = None
+        duration = time.perf_counter() - start
+
+        metrics.record(f'maintenance.{job}', duration)
+        log = logger.error if status == 'failed' else logger.info
+        log(f'Maintenance {job}: {status} in {duration:.3f}s {detail}'.rstrip())
+        conn.execute(
+            f'INSERT INTO {RUN_TABLE} (job, started_at, duration, status, detail) VALUES (?, ?, ?, ?, ?)',
+            (job, started_at.isoformat(sep=' '), duration, status, detail)
+        )
+        conn.execute(f"""
+            DELETE FROM {RUN_TABLE} WHERE job = ? AND id NOT IN (
+                SELECT id FROM {RUN_TABLE} WHERE job = ? ORDER BY id DESC LIMIT {HISTORY_PER_JOB}
+            )
+        """, (job, job))
+        return status
+
+    def _page_stats(self, conn: sqlite3.Connection) -> Tuple[int, int]:
+        page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+        freelist = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        return page_count, freelist
+
+    def _needs_vacuum(self, conn: sqlite3.Connection) -> bool:
+        # 未変換のデータベースは、一度 VACUUM して auto_vacuum を有効にする
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+            return True
+        page_count, freelist = self._page_stats(conn)
+        return page_count > 0 and freelist / page_count > VACUUM_FREE_RATIO
+
+    def _incremental_vacuum(self, conn: sqlite3.Connection) -> str:
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+            return 'skipped (auto_vacuum is not incremental)'
+        _, total = self._page_stats(conn)
+        freed = 0
+        # 少しずつ解放して、各ステップの間で中断できるようにする
+        while freed < total:
+            self._check_paused()
+            conn.execute(f'PRAGMA incremental_vacuum({VACUUM_STEP_PAGES})').fetchall()
+            _, remaining = self._page_stats(conn)
+            if total - remaining <= freed:
+                break
+            freed = total - remaining
+            self._progress = ('incremental_vacuum', freed / total)
+        return f'freed {freed} pages'
+
+    def _compact_change_log(self, conn: sqlite3.Connection) -> str:
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                        (change_log.CHANGE_TABLE,)).fetchone() is None:
+            return 'skipped (no change log)'
+        return f'removed {change_log.compact(conn)} entries'
+
+    def _optimize(self, conn: sqlite3.Connection) -> str:
+        conn.execute('PRAGMA optimize')
+        return ''
+
+    def _analyze(self, conn: sqlite3.Connection) -> str:
+        conn.execute('ANALYZE')
+        return ''
+
+    def _integrity_check(self, conn: sqlite3.Connection) -> str:
+        problems = [row[0] for row in conn.execute('PRAGMA integrity_check')]
+        if problems != ['ok']:
+            raise sqlite3.DatabaseError('integrity check failed: ' + '; '.join(problems[:10]))
+        return 'ok'
+
+    def _vacuum(self, conn: sqlite3.Connection) -> str:
+        before = self.db_path.stat().st_size
+        conn.execute(f'PRAGMA auto_vacuum = {AUTO_VACUUM_INCREMENTAL}')
+        conn.execute('VACUUM')
+        return f'{before} -> {self.db_path.stat().st_size} bytes'
+
+# グローバルなMaintenanceSchedulerインスタンス
+maintenance_scheduler = MaintenanceScheduler()
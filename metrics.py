@@ -0,0 +1,171 @@
+import atexit
+import bisect
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Callable, Optional
+
+# ヒストグラムのバケット上限（ミリ秒）
+BUCKET_BOUNDS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+class Histogram:
+    """処理時間の分布を固定バケットで集計する"""
+
+    __slots__ = ('count', 'total', 'min', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        # 最後のバケットは上限なし
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+
+    def add(self, ms: float):
+        self.count += 1
+        self.total += ms
+        if ms < self.min:
+            self.min = ms
+        if ms > self.max:
+            self.max = ms
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS_MS, ms)] += 1
+
+    def percentile(self, p: float) -> float:
+        """バケット上限から近似したパーセンタイル値（ミリ秒）"""
+        if not self.count:
+            return 0.0
+        target = self.count * p / 100
+        seen = 0
+        for bound, n in zip(BUCKET_BOUNDS_MS, self.buckets):
+            seen += n
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'total_ms': round(self.total, 3),
+            'mean_ms': round(self.total / self.count, 3) if self.count else 0.0,
+            'min_ms': round(self.min, 3) if self.count else 0.0,
+            'max_ms': round(self.max, 3),
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'buckets': {
+                **{f'le_{bound}': n for bound, n in zip(BUCKET_BOUNDS_MS, self.buckets)},
+                'le_inf': self.buckets[-1],
+            },
+        }
+
+class _NullTimer:
+    """計測無効時に使う何もしないコンテキストマネージャ"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class MetricsRegistry:
+    def __init__(self):
+        self.enabled = False
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+        self._dump_path: Optional[Path] = None
+
+    def enable(self, dump_path: Optional[Path] = None):
+        """
+        計測を有効にする
+
+        Args:
+            dump_path: 指定した場合、終了時にこのファイルへJSONを書き出す
+        """
+        self.enabled = True
+        if dump_path is not None:
+            if self._dump_path is None:
+                atexit.register(self._dump_at_exit)
+            self._dump_path = Path(dump_path)
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def record(self, name: str, seconds: float):
+        """計測値を登録する"""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.add(seconds * 1000)
+
+    @contextmanager
+    def _timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def timer(self, name: str):
+        """
+        処理時間を計測するコンテキストマネージャを返す
+
+        Args:
+            name: 計測項目名 (例: "backup.create")
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return self._timer(name)
+
+    def timed(self, name: str) -> Callable:
+        """関数の実行時間を計測するデコレータ"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """現在の集計結果を返す"""
+        with self._lock:
+            return {name: h.to_dict() for name, h in sorted(self._histograms.items())}
+
+    def dump(self, path: Optional[Path] = None) -> Path:
+        """
+        集計結果をJSONファイルに書き出す
+
+        Args:
+            path: 出力先（省略時は enable で指定したパス）
+
+        Returns:
+            書き出したファイルのパス
+        """
+        path = Path(path or self._dump_path or 'metrics.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        return path
+
+    def _dump_at_exit(self):
+        if self._dump_path is not None:
+            self.dump(self._dump_path)
+
+# グローバルなMetricsRegistryインスタンス
+metrics = MetricsRegistry()
@@ -0,0 +1,235 @@
+import csv
+import io
+import logging
+import os
+import sqlite3
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from itertools import zip_longest
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger('parallel_import')
+
+# 1チャンクの目安の大きさ（バイト）。行の途中では切らないので少し大きくなる
+CHUNK_BYTES = 8 * 1024 * 1024
+# これより大きいCSVは並列に読み込む（バイト）
+PARALLEL_MIN_BYTES = 32 * 1024 * 1024
+# インポートに必要な列
+REQUIRED_COLUMNS = ['Date', 'Start Time', 'End Time', 'Duration', 'Card Name']
+
+# 1チャンクの読み込み結果（列値の行, [(行番号, 理由)], 読んだ行数）。
+# 行番号はチャンクの先頭を1とした番号
+ChunkResult = Tuple[List[tuple], List[Tuple[int, str]], int]
+
+def parse_csv_row(row: Dict[str, str], date_format_py: str) -> tuple:
+    """
+    エクスポート形式のCSV行をデータベースの列値に変換する
+
+    Args:
+        row: csv.DictReaderの1行
+        date_format_py: 日付列のstrptime形式
+
+    Returns:
+        (date, start_time, end_time, duration, card_name, notes)
+    """
+    date_obj = datetime.strptime(row['Date'], date_format_py)
+    start_time = datetime.combine(date_obj.date(), datetime.strptime(row['Start Time'], '%H:%M:%S').time())
+    end_time = datetime.combine(date_obj.date(), datetime.strptime(row['End Time'], '%H:%M:%S').time())
+    if end_time < start_time:
+        # 日付をまたいだ瞑想
+        end_time += timedelta(days=1)
+    return (
+        start_time.strftime('%Y-%m-%d %H:%M:%S'),
+        start_time.strftime('%Y-%m-%d %H:%M:%S'),
+        end_time.strftime('%Y-%m-%d %H:%M:%S'),
+        int(row['Duration']),
+        row['Card Name'],
+        row.get('Notes') or ''
+    )
+
+class ImportReport:
+    """並列インポート1回分の結果"""
+
+    __slots__ = ('inserted', 'rejected', 'lines')
+
+    def __init__(self, inserted: int = 0, rejected: Optional[List[Tuple[int, str]]] = None, lines: int = 0):
+        self.inserted = inserted
+        # [(ファイル上の行番号, 理由)]（ヘッダーが1行目）
+        self.rejected = rejected or []
+        self.lines = lines
+
+    def __repr__(self):
+        return f'<ImportReport inserted={self.inserted} rejected={len(self.rejected)} lines={self.lines}>'
+
+def read_header(path: Path) -> Tuple[List[str], int]:
+    """
+    CSVのヘッダー行を読む
+
+    Returns:
+        (列名, データの始まる位置（バイト）)
+    """
+    with open(path, 'rb') as f:
+        line = f.readline()
+    fieldnames = next(csv.reader([line.decode('utf-8-sig')]), [])
+    missing = [column for column in REQUIRED_COLUMNS if column not in fieldnames]
+    if missing:
+        raise ValueError(f'Missing columns: {", ".join(missing)}')
+    return fieldnames, len(line)
+
+def split_chunks(path: Path, start: int, chunk_bytes: int = CHUNK_BYTES) -> List[Tuple[int, int]]:
+    """
+    ファイルを行の境目でバイト範囲に分ける
+
+    メモ欄には改行が入ることがあるので、引用符の数からチャンクの終わりが
+    引用符の中でないことを確かめる。csv モジュールが書いたファイルでは、
+    引用符を含む値は必ず引用符で囲まれるので数が合う。
+
+    Args:
+        path: CSVファイル
+        start: データの始まる位置（ヘッダーの次）
+        chunk_bytes: 1チャンクの目安の大きさ
+
+    Returns:
+        [(開始位置, 終了位置)]
+    """
+    size = path.stat().st_size
+    chunks = []
+    with open(path, 'rb') as f:
+        while start < size:
+            f.seek(start)
+            data = f.read(chunk_bytes)
+            end = start + len(data)
+            in_quotes = data.count(b'"') % 2 == 1
+            if not data.endswith(b'\n') or in_quotes:
+                # 行の終わり（引用符の外）まで広げる
+                for line in iter(f.readline, b''):
+                    end += len(line)
+                    in_quotes ^= line.count(b'"') % 2 == 1
+                    if not in_quotes:
+                        break
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+def parse_chunk(path: str, start: int, end: int, fieldnames: List[str],
+                date_format_py: str, timestamp: str) -> ChunkResult:
+    """
+    1チャンクを読んで列値に変換する（プロセスプールで実行する）
+
+    変換できない行は飛ばして、行番号と理由を返す。
+
+    Args:
+        path: CSVファイル
+        start: チャンクの開始位置
+        end: チャンクの終了位置
+        fieldnames: ヘッダーの列名
+        date_format_py: 日付列のstrptime形式
+        timestamp: created_at / updated_at に入れる日時
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode('utf-8')
+    reader = csv.reader(io.StringIO(text, newline=''))
+    rows, rejected = [], []
+    line = 0
+    for values in reader:
+        first_line, line = line + 1, reader.line_num
+        if not values:
+            continue
+        # 足りない列は csv.DictReader と同じく None にする
+        row = dict(zip_longest(fieldnames, values))
+        try:
+            rows.append(parse_csv_row(row, date_format_py) + (timestamp, timestamp))
+        except (ValueError, TypeError, KeyError) as e:
+            rejected.append((first_line, f'{type(e).__name__}: {e}'))
+    return rows, rejected, reader.line_num
+
+def default_workers() -> int:
+    """既定のプロセス数（書き込みと画面のために1つ空ける）"""
+    return max(1, (os.cpu_count() or 2) - 1)
+
+def import_csv_parallel(db_path: Path, import_path: Path, table: str, date_format_py: str,
+                        workers: Optional[int] = None, chunk_bytes: int = CHUNK_BYTES,
+                        progress: Optional[Callable[[int, int], None]] = None) -> ImportReport:
+    """
+    CSVをチャンクに分けて複数のプロセスで変換し、1つの接続でまとめて書き込む
+
+    書き込みは1つのトランザクションで行うので、失敗や中断の場合は何も残らない。
+    変換できない行は書き込まずに ImportReport.rejected に行番号と理由を残す。
+
+    Args:
+        db_path: 書き込むデータベース
+        import_path: 読み込むCSVファイル
+        table: 瞑想記録のテーブル名
+        date_format_py: 日付列のstrptime形式
+        workers: 変換に使うプロセス数（1ならこのプロセスで変換する）
+        chunk_bytes: 1チャンクの目安の大きさ
+        progress: 進捗の通知（読み終えたバイト数, ファイルの大きさ）。
+            例外を投げると中断する
+
+    Returns:
+        インポートの結果
+    """
+    fieldnames, data_start = read_header(import_path)
+    chunks = split_chunks(import_path, data_start, chunk_bytes)
+    total = import_path.stat().st_size
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
+    workers = workers or default_workers()
+    report = ImportReport(lines=1)
+    args = (str(import_path),)
+    tail = (fieldnames, date_format_py, timestamp)
+
+    conn = sqlite3.connect(db_path)
+    executor = None
+    try:
+        def write(chunk: Tuple[int, int], result: ChunkResult):
+            rows, rejected, lines = result
+            conn.executemany(f"""
+                INSERT INTO {table}
+                    (date, start_time, end_time, duration, card_name, notes, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+            report.inserted += len(rows)
+            report.rejected.extend((report.lines + line, reason) for line, reason in rejected)
+            report.lines += lines
+            if progress is not None:
+                progress(chunk[1], total)
+
+        if workers <= 1 or len(chunks) <= 1:
+            for chunk in chunks:
+                write(chunk, parse_chunk(*args, *chunk, *tail))
+        else:
+            # spawn なら Qt のスレッドを抱えたままの fork にならない。子プロセスは
+            # このモジュール（標準ライブラリだけを使う）の parse_chunk を実行する。
+            # 配布用の実行ファイルでは tattva_app.py の freeze_support() が子プロセスの
+            # 起動を受け持つ
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'))
+            # 先読みはプロセス数の2倍までにして、変換済みの行でメモリを使いすぎない
+            pending = deque()
+            remaining = iter(chunks)
+            for chunk in remaining:
+                pending.append((chunk, executor.submit(parse_chunk, *args, *chunk, *tail)))
+                if len(pending) >= workers * 2:
+                    break
+            while pending:
+                chunk, future = pending.popleft()
+                result = future.result()
+                for next_chunk in remaining:
+                    pending.append((next_chunk, executor.submit(parse_chunk, *args, *next_chunk, *tail)))
+                    break
+                write(chunk, result)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        conn.close()
+
+    logger.info(f'Imported {report.inserted} rows from {import_path} in {len(chunks)} chunks '
+                f'({len(report.rejected)} rejected)')
+    return report
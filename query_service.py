@@ -0,0 +1,227 @@
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from archive import ArchiveManager, archive_manager
+from card_catalog import CardCatalog
+from database import db
+from metrics import metrics
+
+logger = logging.getLogger('query_service')
+
+# 期間ごとの集計で使う strftime の形式
+PERIOD_FORMATS = {
+    'day': '%Y-%m-%d',
+    'week': '%Y-W%W',
+    'month': '%Y-%m',
+    'year': '%Y',
+}
+# 結果を保持するクエリの数
+CACHE_SIZE = 128
+
+class QueryService:
+    """
+    瞑想記録の集計クエリ
+
+    統計画面やレポートから使う集計をまとめたもの。アーカイブも含めた全期間を
+    対象にする。結果はLRUキャッシュに保持し、データベースが変更されるまでは
+    SQLiteに問い合わせない。
+
+    変更の検出には、他の接続からのコミットで進む PRAGMA data_version と、
+    この接続での変更件数（total_changes）を組み合わせて使う。
+    """
+
+    def __init__(self, database=None, archives: Optional[ArchiveManager] = None,
+                 catalog: Optional[CardCatalog] = None, cache_size: int = CACHE_SIZE):
+        """
+        Args:
+            database: peewee のデータベース（省略時はアプリのデータベース）
+            archives: アーカイブの管理（省略時はアプリのアーカイブ）
+            catalog: カード名から元素を引くカタログ（省略時はカード名から判断）
+            cache_size: 結果を保持するクエリの数
+        """
+        self.database = database or db
+        self.archives = archives or archive_manager
+        self.catalog = catalog
+        self.cache_size = cache_size
+        self._cache: OrderedDict = OrderedDict()
+        self._version: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def data_version(self, conn: sqlite3.Connection) -> Tuple[int, int]:
+        """データベースの内容が変わると変わる値"""
+        return conn.execute('PRAGMA data_version').fetchone()[0], conn.total_changes
+
+    def invalidate(self):
+        """キャッシュを捨てる"""
+        with self._lock:
+            self._cache.clear()
+            self._version = None
+
+    def _cached(self, key: tuple, compute: Callable[[sqlite3.Connection, str], Any]) -> Any:
+        conn = self.database.connection()
+        version = self.data_version(conn)
+        with self._lock:
+            if version != self._version:
+                self._cache.clear()
+                self._version = version
+            elif key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+
+        with metrics.timer(f'query.{key[0]}'):
+            result = compute(conn, self.archives.attach(conn))
+        with self._lock:
+            # 計算中に変更された場合は古い結果を保持しない
+            if self._version == version and self.data_version(conn) == version:
+                self._cache[key] = result
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return result
+
+    @staticmethod
+    def _range(start: Optional[date], end: Optional[date]) -> Tuple[str, list]:
+        """開始日時の範囲の条件（end の日を含む）"""
+        clauses, params = [], []
+        if start is not None:
+            clauses.append('start_time >= ?')
+            params.append(start.strftime('%Y-%m-%d'))
+        if end is not None:
+            clauses.append('start_time < ?')
+            params.append((end + timedelta(days=1)).strftime('%Y-%m-%d'))
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def totals(self, period: str = 'day', start: Optional[date] = None,
+               end: Optional[date] = None) -> List[Dict[str, Any]]:
+        """
+        期間ごとの瞑想回数と合計時間
+
+        Args:
+            period: 'day' / 'week' / 'month' / 'year'
+            start: 集計を始める日（含む）
+            end: 集計を終える日（含む）
+
+        Returns:
+            [{'period', 'sessions', 'minutes'}]（期間の古い順）
+        """
+        if period not in PERIOD_FORMATS:
+            raise ValueError(f'Unknown period: {period}')
+
+        def compute(conn, table):
+            where, params = self._range(start, end)
+            rows = conn.execute(f"""
+                SELECT strftime(?, start_time) AS period, COUNT(*), COALESCE(SUM(duration), 0)
+                FROM {table}{where}
+                GROUP BY period ORDER BY period
+            """, [PERIOD_FORMATS[period]] + params).fetchall()
+            return [{'period': p, 'sessions': sessions, 'minutes': minutes} for p, sessions, minutes in rows]
+
+        return self._cached(('totals', period, start, end), compute)
+
+    def card_stats(self, start: Optional[date] = None, end: Optional[date] = None) -> List[Dict[str, Any]]:
+        """
+        カードごとの瞑想回数・合計時間・平均時間・最後の瞑想日時
+
+        Returns:
+            [{'card_name', 'sessions', 'minutes', 'average', 'last_session'}]（回数の多い順）
+        """
+        def compute(conn, table):
+            where, params = self._range(start, end)
+            rows = conn.execute(f"""
+                SELECT card_name, COUNT(*), COALESCE(SUM(duration), 0), AVG(duration), MAX(start_time)
+                FROM {table}{where}
+                GROUP BY card_name ORDER BY COUNT(*) DESC, card_name
+            """, params).fetchall()
+            return [{'card_name': name, 'sessions': sessions, 'minutes': minutes,
+                     'average': average, 'last_session': last}
+                    for name, sessions, minutes, average, last in rows]
+
+        return self._cached(('card_stats', start, end), compute)
+
+    def element(self, card_name: str) -> str:
+        """カードの（第一）元素"""
+        card = self.catalog.get(card_name) if self.catalog else None
+        if card is not None:
+            return card.element
+        # 「地の水」のような名前は最初の元素で分ける
+        return card_name.split('の', 1)[0]
+
+    def element_stats(self, start: Optional[date] = None, end: Optional[date] = None) -> List[Dict[str, Any]]:
+        """
+        元素ごとの瞑想回数・合計時間・平均時間
+
+        カードごとの集計（キャッシュ済みならそれ）をまとめるので、元素のために
+        もう一度テーブルを読むことはない。
+
+        Returns:
+            [{'element', 'sessions', 'minutes', 'average'}]（回数の多い順）
+        """
+        elements: Dict[str, Dict[str, Any]] = {}
+        for stats in self.card_stats(start, end):
+            entry = elements.setdefault(self.element(stats['card_name']),
+                                        {'sessions': 0, 'minutes': 0})
+            entry['sessions'] += stats['sessions']
+            entry['minutes'] += stats['minutes']
+        result = [{'element': name, 'sessions': entry['sessions'], 'minutes': entry['minutes'],
+                   'average': entry['minutes'] / entry['sessions']}
+                  for name, entry in elements.items()]
+        result.sort(key=lambda entry: (-entry['sessions'], entry['element']))
+        return result
+
+    def streaks(self, today: Optional[date] = None) -> Dict[str, Any]:
+        """
+        連続して瞑想した日数
+
+        Args:
+            today: 今日の日付（省略時は現在の日付）
+
+        Returns:
+            {'current', 'longest', 'longest_start', 'longest_end'}。current は
+            今日か昨日まで続いている連続日数（途切れていれば0）
+        """
+        def compute(conn, table):
+            # 連続した日は「日付 - 順位」が同じになる
+            return conn.execute(f"""
+                WITH days AS (SELECT DISTINCT date(start_time) AS day FROM {table}),
+                numbered AS (
+                    SELECT day, julianday(day) - ROW_NUMBER() OVER (ORDER BY day) AS grp FROM days
+                )
+                SELECT MIN(day), MAX(day), COUNT(*) FROM numbered GROUP BY grp ORDER BY MIN(day)
+            """).fetchall()
+
+        runs = self._cached(('streaks',), compute)
+        today = today or date.today()
+        current = 0
+        if runs:
+            last_day = datetime.strptime(runs[-1][1], '%Y-%m-%d').date()
+            if (today - last_day).days <= 1:
+                current = runs[-1][2]
+        longest = max(runs, key=lambda run: run[2], default=(None, None, 0))
+        return {'current': current, 'longest': longest[2],
+                'longest_start': longest[0], 'longest_end': longest[1]}
+
+    def recent_sessions(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        最近の瞑想
+
+        Returns:
+            [{'id', 'start_time', 'end_time', 'duration', 'card_name', 'notes'}]（新しい順）
+        """
+        def compute(conn, table):
+            rows = conn.execute(f"""
+                SELECT id, start_time, end_time, duration, card_name, notes
+                FROM {table} ORDER BY start_time DESC LIMIT ?
+            """, (limit,)).fetchall()
+            return [dict(zip(('id', 'start_time', 'end_time', 'duration', 'card_name', 'notes'), row))
+                    for row in rows]
+
+        return self._cached(('recent_sessions', limit), compute)
+
+# グローバルなQueryServiceインスタンス
+query_service = QueryService()
@@ -1,13 +1,16 @@
 from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                                QPushButton, QTableWidget, QTableWidgetItem, QLabel,
-                               QLineEdit, QDialog, QTextEdit, QMessageBox, QFileDialog)
+                               QLineEdit, QDialog, QTextEdit, QMessageBox, QFileDialog, QScrollArea)
 from PySide6.QtCore import Qt
 from PySide6.QtGui import QColor
 from database import MeditationRecord, db
+from archive import archive_manager
 from datetime import datetime
 from settings import settings
 from i18n import i18n
 from settings_window import SettingsWindow
+from calendar_heatmap import CalendarHeatmap
+from metrics import metrics
 import csv
 import codecs
 
@@ -133,6 +136,14 @@ class RecordWindow(QMainWindow):
         search_layout.addWidget(self.search_input)
         layout.addLayout(search_layout)
         
+        # 日ごとの瞑想時間のカレンダー
+        self.heatmap = CalendarHeatmap()
+        self.heatmap_scroll = QScrollArea()
+        self.heatmap_scroll.setWidget(self.heatmap)
+        self.heatmap_scroll.setFixedHeight(self.heatmap.sizeHint().height() + 24)
+        self.heatmap_scroll.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
+        layout.addWidget(self.heatmap_scroll)
+        
         # テーブル
         self.table = QTableWidget()
         self.table.setColumnCount(6)
@@ -188,7 +199,7 @@ class RecordWindow(QMainWindow):
             )
             
             if file_name:
-                with codecs.open(file_name, 'w', 'utf-8-sig') as f:
+                with metrics.timer('export.records'), codecs.open(file_name, 'w', 'utf-8-sig') as f:
                     writer = csv.writer(f)
                     # ヘッダー（日本語と英語）
                     writer.writerow([
@@ -196,7 +207,9 @@ class RecordWindow(QMainWindow):
                         i18n.get('export_header.duration'), i18n.get('export_header.card'), i18n.get('export_header.notes')
                     ])
                     
-                    records = MeditationRecord.select().order_by(MeditationRecord.date.desc())
+                    # アーカイブ済みの記録も含める
+                    Record = archive_manager.model()
+                    records = Record.select().order_by(Record.date.desc())
                     for record in records:
                         writer.writerow([
                             record.date.strftime('%Y-%m-%d %H:%M:%S'),
@@ -225,13 +238,14 @@ class RecordWindow(QMainWindow):
     def load_records(self):
         search_text = self.search_input.text().strip()
         
-        # 検索クエリの構築
-        query = MeditationRecord.select()
+        # 検索クエリの構築（アーカイブ済みの記録も含める）
+        Record = archive_manager.model()
+        query = Record.select()
         if search_text:
-            query = query.where(MeditationRecord.notes.contains(search_text))
+            query = query.where(Record.notes.contains(search_text))
         
         # レコードの取得と表示
-        records = list(query.order_by(MeditationRecord.date.desc()))
+        records = list(query.order_by(Record.date.desc()))
         self.table.setRowCount(len(records))
         
         for i, record in enumerate(records):
@@ -246,10 +260,21 @@ class RecordWindow(QMainWindow):
             self.table.item(i, 0).setData(Qt.UserRole, record.id)
         
         self.table.resizeColumnsToContents()
+        self.refresh_heatmap()
+
+    def refresh_heatmap(self):
+        """カレンダーに前回からの変更を反映し、変わっていれば最新の週が見えるようにする"""
+        if self.heatmap.refresh():
+            scroll_bar = self.heatmap_scroll.horizontalScrollBar()
+            scroll_bar.setValue(scroll_bar.maximum())
 
     def edit_record(self, item):
         record_id = self.table.item(item.row(), 0).data(Qt.UserRole)
-        record = MeditationRecord.get_by_id(record_id)
+        record = MeditationRecord.get_or_none(MeditationRecord.id == record_id)
+        if record is None:
+            # アーカイブ済みの記録は編集できない
+            QMessageBox.information(self, i18n.get('edit_dialog.title'), i18n.get('archive.read_only'))
+            return
         
         dialog = EditDialog(record, self)
         if dialog.exec_() == QDialog.Accepted:
@@ -1,21 +1,43 @@
+import atexit
 import json
 import os
+import tempfile
+import threading
+import time
+import weakref
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Any, Callable, Dict, List, Optional
+
+# 終了時に未保存の変更を書き込む対象（テストで作るインスタンスを残さないよう弱参照で持つ）
+_instances: 'weakref.WeakSet[Settings]' = weakref.WeakSet()
+
+@atexit.register
+def _flush_all():
+    for instance in list(_instances):
+        instance.flush()
 
 class Settings:
-    def __init__(self):
+    # 変更をまとめて書き込むまでの待機時間（秒）
+    SAVE_DELAY = 1.0
+    # 外部からの変更を確認する最短間隔（秒）
+    RELOAD_INTERVAL = 2.0
+
+    def __init__(self, settings_file: Optional[Path] = None):
         self.app_dir = Path(os.path.dirname(os.path.abspath(__file__)))
-        self.settings_file = self.app_dir / 'settings.json'
+        self.settings_file = Path(settings_file) if settings_file else self.app_dir / 'settings.json'
         self.locales_dir = self.app_dir / 'locales'
         self.backups_dir = self.app_dir / 'backups'
+        self._lock = threading.RLock()
+        self._dirty_keys: set[str] = set()
+        self._save_timer: Optional[threading.Timer] = None
+        self._mtime: Optional[float] = None
+        self._last_reload_check = time.monotonic()
+        # {キー: [値が変わったときに呼ぶ関数]}
+        self._listeners: Dict[str, List[Callable[[Any], None]]] = {}
         self._settings = self._load_settings()
+        _instances.add(self)
 
-    def _load_settings(self) -> Dict[str, Any]:
-        """設定ファイルを読み込む"""
-        if self.settings_file.exists():
-            with open(self.settings_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+    def _default_settings(self) -> Dict[str, Any]:
         return {
             'language': 'ja',
             'date_format': 'yyyy-mm-dd',
@@ -23,46 +45,180 @@ class Settings:
             'last_backup': None
         }
 
+    def _file_mtime(self) -> Optional[float]:
+        try:
+            return self.settings_file.stat().st_mtime
+        except OSError:
+            return None
+
+    def _load_settings(self) -> Dict[str, Any]:
+        """設定ファイルを読み込む"""
+        self._mtime = self._file_mtime()
+        if self._mtime is not None:
+            try:
+                with open(self.settings_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                # 書き込み途中のファイルなどは無視して既定値を使う
+                pass
+        return self._default_settings()
+
+    def _reload_if_changed(self):
+        """他のプロセスが設定ファイルを更新していれば読み込み直す"""
+        now = time.monotonic()
+        if now - self._last_reload_check < self.RELOAD_INTERVAL:
+            return
+        self._last_reload_check = now
+
+        mtime = self._file_mtime()
+        if mtime is None or mtime == self._mtime:
+            return
+
+        with self._lock:
+            previous = self._settings
+            pending = {key: self._settings.get(key) for key in self._dirty_keys}
+            self._settings = self._load_settings()
+            # 未保存の変更はファイルの内容より優先する
+            self._settings.update(pending)
+            changed = [key for key in self._listeners if self._settings.get(key) != previous.get(key)]
+        for key in changed:
+            self._notify(key)
+
+    def add_listener(self, key: str, callback: Callable[[Any], None]):
+        """
+        設定値が変わったときに呼ぶ関数を登録する
+
+        このプロセスでの変更のほか、他のプロセスによる変更を読み込み直した
+        場合にも呼ばれる。
+
+        Args:
+            key: 設定のキー
+            callback: 新しい値を受け取る関数
+        """
+        self._listeners.setdefault(key, []).append(callback)
+
+    def _notify(self, key: str):
+        value = self._settings.get(key)
+        for callback in self._listeners.get(key, ()):
+            callback(value)
+
+    def _get(self, key: str, default: Any = None) -> Any:
+        self._reload_if_changed()
+        return self._settings.get(key, default)
+
+    def _set(self, key: str, value: Any):
+        """値を更新し、最後の変更から一定時間後にまとめて保存するよう予約する"""
+        with self._lock:
+            if key in self._settings and self._settings[key] == value:
+                return
+            self._settings[key] = value
+            self._dirty_keys.add(key)
+            # 変更が続く間は保存を先送りする
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+            self._save_timer = threading.Timer(self.SAVE_DELAY, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+        self._notify(key)
+
+    @property
+    def dirty(self) -> bool:
+        """未保存の変更があるかどうか"""
+        return bool(self._dirty_keys)
+
+    def flush(self):
+        """未保存の変更があればファイルに書き込む"""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if not self._dirty_keys:
+                return
+            self.save_settings()
+
     def save_settings(self):
-        """設定をファイルに保存"""
-        with open(self.settings_file, 'w', encoding='utf-8') as f:
-            json.dump(self._settings, f, ensure_ascii=False, indent=2)
+        """設定をファイルに保存（一時ファイルに書き込んでから置き換える）"""
+        with self._lock:
+            self.settings_file.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(
+                prefix=f'.{self.settings_file.name}.',
+                suffix='.tmp',
+                dir=self.settings_file.parent
+            )
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(self._settings, f, ensure_ascii=False, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_path, self.settings_file)
+            except BaseException:
+                try:
+                    os.unlink(temp_path)
+                except OSError:
+                    pass
+                raise
+            self._dirty_keys.clear()
+            self._mtime = self._file_mtime()
 
     @property
     def language(self) -> str:
-        return self._settings.get('language', 'ja')
+        return self._get('language', 'ja')
 
     @language.setter
     def language(self, value: str):
-        self._settings['language'] = value
-        self.save_settings()
+        self._set('language', value)
 
     @property
     def date_format(self) -> str:
-        return self._settings.get('date_format', 'yyyy-mm-dd')
+        return self._get('date_format', 'yyyy-mm-dd')
 
     @date_format.setter
     def date_format(self, value: str):
-        self._settings['date_format'] = value
-        self.save_settings()
+        self._set('date_format', value)
 
     @property
     def backup_dir(self) -> Path:
-        return Path(self._settings.get('backup_dir', str(self.backups_dir)))
+        return Path(self._get('backup_dir', str(self.backups_dir)))
 
     @backup_dir.setter
     def backup_dir(self, value: str):
-        self._settings['backup_dir'] = str(value)
-        self.save_settings()
+        self._set('backup_dir', str(value))
 
     @property
     def last_backup(self) -> Optional[str]:
-        return self._settings.get('last_backup')
+        return self._get('last_backup')
 
     @last_backup.setter
     def last_backup(self, value: Optional[str]):
-        self._settings['last_backup'] = value
-        self.save_settings()
+        self._set('last_backup', value)
+
+    @property
+    def export_mark(self) -> int:
+        """
+        以前の版が保存した差分エクスポートの基準（読み取り専用）
+
+        基準は変更ログの処理する側 'export.csv' に移したので、まだ登録されて
+        いない場合の初期値としてだけ使う。
+        """
+        return self._get('export_mark', 0)
+
+    @property
+    def deck(self) -> str:
+        """使用するカードのデッキ（'default' は標準の images/）"""
+        return self._get('deck', 'default')
+
+    @deck.setter
+    def deck(self, value: str):
+        self._set('deck', value)
+
+    @property
+    def archive_after_days(self) -> Optional[int]:
+        """この日数より古い記録を年ごとのアーカイブに移す（Noneの場合は移さない）"""
+        return self._get('archive_after_days')
+
+    @archive_after_days.setter
+    def archive_after_days(self, value: Optional[int]):
+        self._set('archive_after_days', value)
 
 # グローバルなSettings インスタンス
 settings = Settings()
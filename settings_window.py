@@ -1,10 +1,81 @@
 from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton,
-                              QLabel, QComboBox, QFileDialog, QMessageBox, QGroupBox)
+                              QLabel, QComboBox, QFileDialog, QMessageBox, QGroupBox,
+                              QTableWidget, QTableWidgetItem, QAbstractItemView)
 from PySide6.QtCore import Qt
 from pathlib import Path
+from datetime import datetime
 from settings import settings
 from i18n import i18n
 from backup_manager import backup_manager
+from job_runner import job_runner
+from parallel_import import PARALLEL_MIN_BYTES
+from columnar_export import HAS_PYARROW
+
+class BackupListDialog(QDialog):
+    """バックアップの索引から復元するバックアップを選ぶダイアログ"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(i18n.get('backup.restore'))
+        self.setModal(True)
+        self.selected_path = None
+        self.entries = backup_manager.list_backups()
+        self.setup_ui()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+
+        self.table = QTableWidget(len(self.entries), 5)
+        self.table.setHorizontalHeaderLabels([
+            i18n.get('backup.catalog_created'), i18n.get('backup.catalog_records'),
+            i18n.get('backup.catalog_range'), i18n.get('backup.catalog_size'), i18n.get('backup.catalog_file')
+        ])
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        for i, entry in enumerate(self.entries):
+            first = (entry.first_session or '')[:10]
+            last = (entry.last_session or '')[:10]
+            self.table.setItem(i, 0, QTableWidgetItem(entry.created_at))
+            self.table.setItem(i, 1, QTableWidgetItem(str(entry.record_count)))
+            self.table.setItem(i, 2, QTableWidgetItem(f"{first} - {last}" if first else ""))
+            self.table.setItem(i, 3, QTableWidgetItem(f"{entry.size / 1024:.0f} KB"))
+            self.table.setItem(i, 4, QTableWidgetItem(Path(entry.path).name))
+        self.table.resizeColumnsToContents()
+        self.table.itemDoubleClicked.connect(self.accept_selection)
+        layout.addWidget(self.table)
+
+        button_layout = QHBoxLayout()
+        browse_button = QPushButton(i18n.get('backup.select_file'))
+        browse_button.clicked.connect(self.browse)
+        restore_button = QPushButton(i18n.get('backup.restore'))
+        restore_button.clicked.connect(self.accept_selection)
+        cancel_button = QPushButton(i18n.get('delete_confirmation.cancel'))
+        cancel_button.clicked.connect(self.reject)
+        button_layout.addWidget(browse_button)
+        button_layout.addStretch()
+        button_layout.addWidget(cancel_button)
+        button_layout.addWidget(restore_button)
+        layout.addLayout(button_layout)
+        self.resize(700, 400)
+
+    def accept_selection(self, *args):
+        row = self.table.currentRow()
+        if 0 <= row < len(self.entries):
+            self.selected_path = Path(self.entries[row].path)
+            self.accept()
+
+    def browse(self):
+        """索引にない場所のバックアップをファイルから選ぶ"""
+        file_name, _ = QFileDialog.getOpenFileName(
+            self,
+            i18n.get('backup.select_file'),
+            str(settings.backup_dir),
+            "Database Files (*.db)"
+        )
+        if file_name:
+            self.selected_path = Path(file_name)
+            self.accept()
 
 class SettingsWindow(QDialog):
     def __init__(self, parent=None):
@@ -57,14 +128,31 @@ class SettingsWindow(QDialog):
         dir_layout.addWidget(dir_button)
         backup_layout.addLayout(dir_layout)
 
+        # 古い記録のアーカイブ
+        archive_layout = QHBoxLayout()
+        archive_layout.addWidget(QLabel(i18n.get('archive.label')))
+        self.archive_combo = QComboBox()
+        self.archive_combo.addItem(i18n.get('archive.never'), None)
+        for years in (1, 2, 5):
+            self.archive_combo.addItem(i18n.get('archive.years').format(years=years), years * 365)
+        current_index = self.archive_combo.findData(settings.archive_after_days)
+        if current_index >= 0:
+            self.archive_combo.setCurrentIndex(current_index)
+        self.archive_combo.currentIndexChanged.connect(self.change_archive_age)
+        archive_layout.addWidget(self.archive_combo)
+        backup_layout.addLayout(archive_layout)
+
         # バックアップ操作ボタン
         backup_buttons = QHBoxLayout()
         create_backup = QPushButton(i18n.get('backup.create'))
         create_backup.clicked.connect(self.create_backup)
         restore_backup = QPushButton(i18n.get('backup.restore'))
         restore_backup.clicked.connect(self.restore_backup)
+        merge_database = QPushButton(i18n.get('backup.merge'))
+        merge_database.clicked.connect(self.merge_database)
         backup_buttons.addWidget(create_backup)
         backup_buttons.addWidget(restore_backup)
+        backup_buttons.addWidget(merge_database)
         backup_layout.addLayout(backup_buttons)
 
         backup_group.setLayout(backup_layout)
@@ -77,10 +165,16 @@ class SettingsWindow(QDialog):
         
         export_csv = QPushButton(i18n.get('csv.export'))
         export_csv.clicked.connect(self.export_csv)
+        export_incremental = QPushButton(i18n.get('csv.export_incremental'))
+        export_incremental.clicked.connect(self.export_csv_incremental)
+        export_columnar = QPushButton(i18n.get('columnar.export'))
+        export_columnar.clicked.connect(self.export_columnar)
         import_csv = QPushButton(i18n.get('csv.import'))
         import_csv.clicked.connect(self.import_csv)
         
         csv_buttons.addWidget(export_csv)
+        csv_buttons.addWidget(export_incremental)
+        csv_buttons.addWidget(export_columnar)
         csv_buttons.addWidget(import_csv)
         csv_layout.addLayout(csv_buttons)
         
@@ -92,10 +186,41 @@ class SettingsWindow(QDialog):
         close_button.clicked.connect(self.accept)
         layout.addWidget(close_button)
 
+    def run_job(self, title: str, text: str, func, *args, cancellable: bool = False):
+        """
+        backup_manager の処理を補助スレッドで実行し、終わったら結果を表示する
+        
+        Args:
+            title: 結果のメッセージのタイトル
+            text: 進捗ダイアログに表示する文
+            func: (成功したかどうか, メッセージ) を返す処理
+            cancellable: 途中で取り消せる処理かどうか
+        """
+        job_runner.run(
+            self, text, func, *args,
+            cancellable=cancellable,
+            on_result=lambda result: self.show_result(title, *result),
+            on_error=lambda message: QMessageBox.warning(self, title, message),
+            on_cancel=lambda: QMessageBox.information(self, title, i18n.get('job.cancelled'))
+        )
+
+    def show_result(self, title: str, success: bool, message: str):
+        if success:
+            QMessageBox.information(self, title, message)
+        else:
+            QMessageBox.warning(self, title, message)
+
+    def done(self, result):
+        # 処理中は閉じない（結果の表示先がなくなるため）
+        if job_runner.busy:
+            return
+        super().done(result)
+
     def change_language(self, index):
         lang = self.lang_combo.itemData(index)
         if lang != settings.language:
             settings.language = lang
+            i18n.set_language(lang)
             QMessageBox.information(
                 self,
                 i18n.get('app.settings'),
@@ -107,6 +232,11 @@ class SettingsWindow(QDialog):
         if date_format != settings.date_format:
             settings.date_format = date_format
 
+    def change_archive_age(self, index):
+        archive_after_days = self.archive_combo.itemData(index)
+        if archive_after_days != settings.archive_after_days:
+            settings.archive_after_days = archive_after_days
+
     def select_backup_dir(self):
         dir_path = QFileDialog.getExistingDirectory(
             self,
@@ -126,15 +256,34 @@ class SettingsWindow(QDialog):
                 "Database Files (*.db)"
             )
             if file_name:
-                success, message = backup_manager.create_backup(Path(file_name))
-                if success:
-                    QMessageBox.information(self, i18n.get('app.backup'), message)
-                else:
-                    QMessageBox.warning(self, i18n.get('app.backup'), message)
+                self.run_job(
+                    i18n.get('app.backup'), i18n.get('job.backup'),
+                    backup_manager.create_backup, Path(file_name), cancellable=True
+                )
         except Exception as e:
             QMessageBox.warning(self, i18n.get('app.backup'), str(e))
 
     def restore_backup(self):
+        try:
+            dialog = BackupListDialog(self)
+            file_name = dialog.selected_path if dialog.exec_() == QDialog.Accepted else None
+            if file_name:
+                reply = QMessageBox.question(
+                    self,
+                    i18n.get('app.backup'),
+                    "現在のデータベースは上書きされます。続行しますか？\nCurrent database will be overwritten. Continue?",
+                    QMessageBox.Yes | QMessageBox.No,
+                    QMessageBox.No
+                )
+                if reply == QMessageBox.Yes:
+                    self.run_job(
+                        i18n.get('app.backup'), i18n.get('job.restore'),
+                        backup_manager.restore_backup, Path(file_name), cancellable=True
+                    )
+        except Exception as e:
+            QMessageBox.warning(self, i18n.get('app.backup'), str(e))
+
+    def merge_database(self):
         try:
             file_name, _ = QFileDialog.getOpenFileName(
                 self,
@@ -146,16 +295,15 @@ class SettingsWindow(QDialog):
                 reply = QMessageBox.question(
                     self,
                     i18n.get('app.backup'),
-                    "現在のデータベースは上書きされます。続行しますか？\nCurrent database will be overwritten. Continue?",
+                    i18n.get('backup.merge_confirm'),
                     QMessageBox.Yes | QMessageBox.No,
                     QMessageBox.No
                 )
                 if reply == QMessageBox.Yes:
-                    success, message = backup_manager.restore_backup(Path(file_name))
-                    if success:
-                        QMessageBox.information(self, i18n.get('app.backup'), message)
-                    else:
-                        QMessageBox.warning(self, i18n.get('app.backup'), message)
+                    self.run_job(
+                        i18n.get('app.backup'), i18n.get('job.merge'),
+                        backup_manager.merge_database, Path(file_name)
+                    )
         except Exception as e:
             QMessageBox.warning(self, i18n.get('app.backup'), str(e))
 
@@ -168,17 +316,49 @@ class SettingsWindow(QDialog):
                 "CSV Files (*.csv)"
             )
             if file_name:
-                success, message = backup_manager.export_csv(
-                    Path(file_name),
-                    settings.date_format
+                self.run_job(
+                    "CSV", i18n.get('job.export'),
+                    backup_manager.export_csv, Path(file_name), settings.date_format, cancellable=True
                 )
-                if success:
-                    QMessageBox.information(self, "CSV", message)
-                else:
-                    QMessageBox.warning(self, "CSV", message)
         except Exception as e:
             QMessageBox.warning(self, "CSV", str(e))
 
+    def export_csv_incremental(self):
+        try:
+            dir_path = QFileDialog.getExistingDirectory(
+                self,
+                i18n.get('csv.select_export_dir'),
+                str(Path.home())
+            )
+            if dir_path:
+                self.run_job(
+                    "CSV", i18n.get('job.export'),
+                    backup_manager.export_csv_incremental, Path(dir_path), settings.date_format
+                )
+        except Exception as e:
+            QMessageBox.warning(self, "CSV", str(e))
+
+    def export_columnar(self):
+        try:
+            # pyarrow がない環境では .npz だけを選べるようにする
+            filters = "NumPy (*.npz)"
+            if HAS_PYARROW:
+                filters = "Parquet (*.parquet);;Feather (*.feather);;" + filters
+            file_name, _ = QFileDialog.getSaveFileName(
+                self,
+                i18n.get('columnar.export'),
+                str(Path.home() / f"meditation_records_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+                                  f".{'parquet' if HAS_PYARROW else 'npz'}"),
+                filters
+            )
+            if file_name:
+                self.run_job(
+                    i18n.get('columnar.title'), i18n.get('job.export'),
+                    backup_manager.export_columnar, Path(file_name)
+                )
+        except Exception as e:
+            QMessageBox.warning(self, i18n.get('columnar.title'), str(e))
+
     def import_csv(self):
         try:
             file_name, _ = QFileDialog.getOpenFileName(
@@ -196,13 +376,14 @@ class SettingsWindow(QDialog):
                     QMessageBox.No
                 )
                 if reply == QMessageBox.Yes:
-                    success, message = backup_manager.import_csv(
-                        Path(file_name),
-                        settings.date_format
+                    # 変換できない行は大きさによらず飛ばして報告する。
+                    # 移行などの大きなファイルだけ複数のプロセスで読み込む
+                    import_path = Path(file_name)
+                    workers = None if import_path.stat().st_size >= PARALLEL_MIN_BYTES else 1
+                    self.run_job(
+                        "CSV", i18n.get('job.import'),
+                        backup_manager.import_csv_parallel, import_path, settings.date_format, workers,
+                        cancellable=True
                     )
-                    if success:
-                        QMessageBox.information(self, "CSV", message)
-                    else:
-                        QMessageBox.warning(self, "CSV", message)
         except Exception as e:
             QMessageBox.warning(self, "CSV", str(e))
@@ -1,6 +1,7 @@
 import os
 from pydub import AudioSegment
 from pydub.playback import play
+from metrics import metrics
 
 class SoundManager:
     def __init__(self):
@@ -9,6 +10,7 @@ class SoundManager:
         self.end_sound_path = os.path.join("sounds", "end.mp3")
         self._volume_db = 0  # 0 dB = 最大音量
 
+    @metrics.timed('sound.play')
     def play_start_sound(self):
         """開始音を再生する"""
         try:
@@ -20,6 +22,7 @@ class SoundManager:
         except Exception as e:
             raise Exception(f"音声再生エラー: {str(e)}")
 
+    @metrics.timed('sound.play')
     def play_end_sound(self):
         """終了音を再生する"""
         try:
@@ -0,0 +1,129 @@
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Optional, List
+from PySide6.QtCore import QTimer
+from metrics import metrics
+
+logger = logging.getLogger('stall_watchdog')
+
+class StallRecord:
+    """メインスレッドが停止した1回分の記録"""
+
+    __slots__ = ('started_at', 'duration', 'stack', 'finished')
+
+    def __init__(self, started_at: datetime, duration: float, stack: str):
+        self.started_at = started_at
+        self.duration = duration
+        self.stack = stack
+        self.finished = False
+
+    def to_dict(self):
+        return {
+            'started_at': self.started_at.isoformat(timespec='milliseconds'),
+            'duration_ms': round(self.duration * 1000, 1),
+            'stack': self.stack,
+        }
+
+class StallWatchdog:
+    """
+    Qtのメインスレッドの応答を監視する
+
+    メインスレッドのQTimerが一定間隔でハートビートを更新し、補助スレッドが
+    その遅れを確認する。しきい値を超えて更新が止まった場合は、停止中の
+    メインスレッドのPythonスタックを取得して記録する。
+    """
+
+    def __init__(self, threshold: float = 0.2, interval: float = 0.05, max_stalls: int = 50):
+        """
+        Args:
+            threshold: 停止とみなす時間（秒）
+            interval: ハートビートの間隔（秒）
+            max_stalls: 保持する停止記録の最大件数
+        """
+        self.threshold = threshold
+        self.interval = interval
+        self._stalls: deque[StallRecord] = deque(maxlen=max_stalls)
+        self._lock = threading.Lock()
+        self._last_beat = time.monotonic()
+        self._current: Optional[StallRecord] = None
+        self._main_thread_id: Optional[int] = None
+        self._timer: Optional[QTimer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        """監視を開始する（メインスレッドから呼び出すこと）"""
+        if self.running:
+            return
+        self._main_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop_event.clear()
+
+        self._timer = QTimer()
+        self._timer.setInterval(int(self.interval * 1000))
+        self._timer.timeout.connect(self._beat)
+        self._timer.start()
+
+        self._thread = threading.Thread(target=self._watch, name='StallWatchdog', daemon=True)
+        self._thread.start()
+        logger.debug(f'Stall watchdog started (threshold={self.threshold}s)')
+
+    def stop(self):
+        """監視を停止する"""
+        if not self.running:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        self._timer.stop()
+        self._timer = None
+
+    def stalls(self) -> List[StallRecord]:
+        """記録済みの停止の一覧を返す"""
+        with self._lock:
+            return list(self._stalls)
+
+    def _beat(self):
+        now = time.monotonic()
+        with self._lock:
+            elapsed = now - self._last_beat
+            self._last_beat = now
+            stall, self._current = self._current, None
+        metrics.record('ui.heartbeat_latency', max(0.0, elapsed - self.interval))
+
+        if stall is not None:
+            stall.duration = elapsed
+            stall.finished = True
+            metrics.record('ui.stall', elapsed)
+            logger.warning(
+                f'Main thread stalled for {elapsed * 1000:.0f} ms\n{stall.stack}'
+            )
+
+    def _watch(self):
+        check_interval = min(self.interval, self.threshold / 2)
+        while not self._stop_event.wait(check_interval):
+            with self._lock:
+                blocked = time.monotonic() - self._last_beat
+                if blocked < self.threshold or self._current is not None:
+                    continue
+                stall = StallRecord(datetime.now(), blocked, self._capture_stack())
+                self._current = stall
+                self._stalls.append(stall)
+
+    def _capture_stack(self) -> str:
+        frame = sys._current_frames().get(self._main_thread_id)
+        if frame is None:
+            return ''
+        return ''.join(traceback.format_stack(frame))
+
+# グローバルなStallWatchdogインスタンス
+stall_watchdog = StallWatchdog()
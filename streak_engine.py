@@ -0,0 +1,291 @@
+import logging
+import sqlite3
+from bisect import bisect_right
+from collections import Counter
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import change_log
+from archive import ArchiveManager, archive_manager
+from database import db
+from metrics import metrics
+
+logger = logging.getLogger('streak_engine')
+
+RECORD_TABLE = change_log.RECORD_TABLE
+# 差分がこれより多い場合（インポートなど）は全体を計算し直す
+RECOMPUTE_THRESHOLD = 1000
+# 変更ログ上での名前（読み終えていない墓標を圧縮で消されないようにする）
+CONSUMER = 'streaks'
+# julianday から date.toordinal() への変換
+_ORDINAL_OFFSET = 1721424.5
+_DAY_SQL = f'CAST(julianday(date(date)) - {_ORDINAL_OFFSET} AS INTEGER)'
+
+def _weekday_count(first: int, last: int, weekday: int) -> int:
+    """first〜last（序数、両端を含む）に含まれる weekday（月曜=0）の日数"""
+    if last < first:
+        return 0
+    offset = (weekday - (first - 1) % 7) % 7
+    return max(0, (last - first - offset) // 7 + 1)
+
+class StreakEngine:
+    """
+    瞑想した日の連続（ストリーク）と習慣の統計
+
+    瞑想した日を連続した区間の並びとして持ち、1日の追加・削除では前後の
+    区間だけを更新する。区間の長さと区間の間の空白の長さを数えておくので、
+    最長記録や空白の統計はすぐに返せる。
+
+    データベースの変更は変更ログから読んで反映する。インポートなどで変更が
+    多い場合は、numpy で全体をまとめて計算し直す。
+    """
+
+    def __init__(self, database=None, archives: Optional[ArchiveManager] = None):
+        """
+        Args:
+            database: peewee のデータベース（省略時はアプリのデータベース）
+            archives: アーカイブの管理（省略時はアプリのアーカイブ）
+        """
+        self.database = database or db
+        self.archives = archives or archive_manager
+        self.cursor: Optional[int] = None
+        self._clear()
+
+    def _clear(self):
+        self._sessions: Counter = Counter()
+        self._record_days: Dict[int, int] = {}
+        self._starts: List[int] = []
+        self._ends: Dict[int, int] = {}
+        self._run_lengths: Counter = Counter()
+        self._gap_lengths: Counter = Counter()
+        self._weekday_days = [0] * 7
+
+    @property
+    def loaded(self) -> bool:
+        return self.cursor is not None
+
+    def invalidate(self):
+        """読み込んだ内容を捨てる（次の refresh で全体を読み込み直す）"""
+        self.cursor = None
+
+    # --- 全体の計算 ---
+
+    def load_days(self, days: Iterable[int], record_days: Optional[Dict[int, int]] = None):
+        """
+        瞑想した日から全体を計算し直す
+
+        Args:
+            days: 瞑想ごとの日（date.toordinal() の値、重複あり）
+            record_days: {記録ID: 日}（差分で更新できる記録）
+        """
+        self._clear()
+        days = np.asarray(days if isinstance(days, np.ndarray) else list(days), dtype=np.int64)
+        if days.size:
+            unique, counts = np.unique(days, return_counts=True)
+            breaks = np.flatnonzero(np.diff(unique) > 1)
+            starts = np.concatenate((unique[:1], unique[breaks + 1]))
+            ends = np.concatenate((unique[breaks], unique[-1:]))
+            self._sessions = Counter(dict(zip(unique.tolist(), counts.tolist())))
+            self._starts = starts.tolist()
+            self._ends = dict(zip(self._starts, ends.tolist()))
+            self._run_lengths = Counter((ends - starts + 1).tolist())
+            self._gap_lengths = Counter((starts[1:] - ends[:-1] - 1).tolist())
+            self._weekday_days = np.bincount((unique - 1) % 7, minlength=7).tolist()
+        self._record_days = dict(record_days or {})
+
+    @metrics.timed('streak.reload')
+    def reload(self):
+        """データベース（アーカイブを含む）から全体を計算し直す"""
+        conn = self.database.connection()
+        table = self.archives.attach(conn)
+        # 変更ログのないデータベースでは読み込み位置を持たず、次の refresh でも読み直す
+        cursor = change_log.latest_seq(conn) if change_log.installed(conn) else None
+        rows = conn.execute(f'SELECT id, {_DAY_SQL} FROM main.{RECORD_TABLE}').fetchall()
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        days = np.array([row[1] for row in rows], dtype=np.int64)
+        # アーカイブの記録は変更されないので、日だけを数える
+        all_days = np.concatenate((days, self._archived_days(conn))) if table != RECORD_TABLE else days
+        self.load_days(all_days, dict(zip(ids.tolist(), days.tolist())))
+        if cursor is None:
+            self.cursor = None
+        else:
+            self._set_cursor(conn, cursor)
+
+    def _archived_days(self, conn: sqlite3.Connection) -> np.ndarray:
+        """接続済みのアーカイブにある瞑想の日"""
+        schemas = [row[1] for row in conn.execute('PRAGMA database_list') if row[1].startswith('archive_')]
+        days: List[int] = []
+        for schema in schemas:
+            days.extend(row[0] for row in conn.execute(f'SELECT {_DAY_SQL} FROM {schema}.{RECORD_TABLE}'))
+        return np.array(days, dtype=np.int64)
+
+    # --- 差分の反映 ---
+
+    def _set_cursor(self, conn, cursor: int):
+        """読み込み位置を進め、変更ログの処理する側として記録する"""
+        if cursor != self.cursor:
+            change_log.advance_consumer(conn, CONSUMER, cursor)
+        self.cursor = cursor
+
+    def refresh(self) -> int:
+        """
+        前回からの変更を反映する（未読み込みなら全体を読み込む）
+
+        Returns:
+            反映した変更の件数（全体を計算し直した場合は -1）
+        """
+        conn = self.database.connection()
+        if not change_log.installed(conn):
+            self.reload()
+            return -1
+        latest = change_log.latest_seq(conn)
+        if not self.loaded or latest < self.cursor or latest - self.cursor > RECOMPUTE_THRESHOLD:
+            self.reload()
+            return -1
+        applied = 0
+        while self.cursor < latest:
+            changes, cursor = change_log.changes_since(conn, self.cursor)
+            for change in changes:
+                if change['op'] == 'delete':
+                    self.remove_record(change['record_id'])
+                else:
+                    self.update_record(change['record_id'], change['record']['date'])
+            applied += len(changes)
+            self._set_cursor(conn, cursor)
+            if not changes:
+                break
+        return applied
+
+    def update_record(self, record_id: int, day):
+        """記録の追加・日付の変更を反映する"""
+        if isinstance(day, str):
+            day = date.fromisoformat(day[:10])
+        ordinal = day.toordinal()
+        old = self._record_days.get(record_id)
+        if old == ordinal:
+            return
+        if old is not None:
+            self.remove_session(old)
+        self._record_days[record_id] = ordinal
+        self.add_session(ordinal)
+
+    def remove_record(self, record_id: int):
+        """記録の削除を反映する"""
+        old = self._record_days.pop(record_id, None)
+        if old is not None:
+            self.remove_session(old)
+
+    def add_session(self, day: int):
+        """瞑想を1回追加する（day は date.toordinal() の値）"""
+        self._sessions[day] += 1
+        if self._sessions[day] == 1:
+            self._update_runs(day, add=True)
+            self._weekday_days[(day - 1) % 7] += 1
+
+    def remove_session(self, day: int):
+        """瞑想を1回取り除く"""
+        if self._sessions[day] <= 0:
+            return
+        self._sessions[day] -= 1
+        if self._sessions[day] == 0:
+            del self._sessions[day]
+            self._update_runs(day, add=False)
+            self._weekday_days[(day - 1) % 7] -= 1
+
+    def _update_runs(self, day: int, add: bool):
+        # 影響するのは day を含む（または前後の）区間とその隣だけ。
+        # その範囲の外側との空白は変わらない
+        i = bisect_right(self._starts, day)
+        lo, hi = max(i - 2, 0), min(i + 1, len(self._starts))
+        runs = [(start, self._ends[start]) for start in self._starts[lo:hi]]
+        self._count_runs(runs, -1)
+
+        if add:
+            runs = sorted(runs + [(day, day)])
+            merged: List[Tuple[int, int]] = []
+            for start, end in runs:
+                if merged and start <= merged[-1][1] + 1:
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+                else:
+                    merged.append((start, end))
+            runs = merged
+        else:
+            split = []
+            for start, end in runs:
+                if start <= day <= end:
+                    split.extend(run for run in ((start, day - 1), (day + 1, end)) if run[0] <= run[1])
+                else:
+                    split.append((start, end))
+            runs = split
+
+        for start in self._starts[lo:hi]:
+            del self._ends[start]
+        self._starts[lo:hi] = [start for start, _ in runs]
+        self._ends.update(runs)
+        self._count_runs(runs, 1)
+
+    def _count_runs(self, runs: List[Tuple[int, int]], sign: int):
+        for start, end in runs:
+            self._run_lengths[end - start + 1] += sign
+        for (_, end), (start, _) in zip(runs, runs[1:]):
+            self._gap_lengths[start - end - 1] += sign
+        # 0件になった長さは最長の計算に残さない
+        for counter in (self._run_lengths, self._gap_lengths):
+            for length in [length for length, count in counter.items() if count <= 0]:
+                del counter[length]
+
+    # --- 統計 ---
+
+    def current_streak(self, today: Optional[date] = None) -> int:
+        """今日か昨日まで続いている連続日数（途切れていれば0）"""
+        if not self._starts:
+            return 0
+        today = (today or date.today()).toordinal()
+        last_start = self._starts[-1]
+        last_end = self._ends[last_start]
+        return last_end - last_start + 1 if today - last_end <= 1 else 0
+
+    def longest_streak(self) -> int:
+        return max(self._run_lengths, default=0)
+
+    def weekday_consistency(self, today: Optional[date] = None) -> List[float]:
+        """
+        曜日ごとの継続率（月曜始まり）
+
+        最初に瞑想した日から今日までの各曜日のうち、瞑想した日の割合。
+        """
+        if not self._starts:
+            return [0.0] * 7
+        first = self._starts[0]
+        last = max((today or date.today()).toordinal(), self._ends[self._starts[-1]])
+        result = []
+        for weekday in range(7):
+            total = _weekday_count(first, last, weekday)
+            result.append(self._weekday_days[weekday] / total if total else 0.0)
+        return result
+
+    def gap_stats(self) -> Dict[str, Any]:
+        """瞑想しなかった期間の統計（{'count', 'longest', 'average'}）"""
+        count = sum(self._gap_lengths.values())
+        total = sum(length * n for length, n in self._gap_lengths.items())
+        return {'count': count, 'longest': max(self._gap_lengths, default=0),
+                'average': total / count if count else 0.0}
+
+    def stats(self, today: Optional[date] = None) -> Dict[str, Any]:
+        """
+        まとめた統計
+
+        Returns:
+            {'current', 'longest', 'active_days', 'sessions', 'weekday_consistency', 'gaps'}
+        """
+        return {
+            'current': self.current_streak(today),
+            'longest': self.longest_streak(),
+            'active_days': len(self._sessions),
+            'sessions': sum(self._sessions.values()),
+            'weekday_consistency': self.weekday_consistency(today),
+            'gaps': self.gap_stats(),
+        }
+
+# グローバルなStreakEngineインスタンス
+streak_engine = StreakEngine()
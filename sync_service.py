@@ -0,0 +1,519 @@
+import argparse
+import asyncio
+import gzip
+import hmac
+import http.client
+import ipaddress
+import json
+import logging
+import secrets
+import sqlite3
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+from peewee import SqliteDatabase
+import change_log
+from database import MeditationRecord
+from db_merge import session_hash
+from metrics import metrics
+
+logger = logging.getLogger('sync_service')
+
+RECORD_TABLE = change_log.RECORD_TABLE
+# 1回の応答・送信に含める変更の最大件数
+BATCH_SIZE = 500
+DEFAULT_PORT = 8765
+# 既定ではこの端末からの接続だけを受け付ける
+DEFAULT_HOST = '127.0.0.1'
+# 受け付ける要求本文の最大バイト数（これを超える要求には 413 を返す）
+MAX_BODY_BYTES = 16 * 1024 * 1024
+# 圧縮された本文を展開した後の最大バイト数（これを超える要求には 413 を返す）
+MAX_PAYLOAD_BYTES = 64 * 1024 * 1024
+# 同期カーソルを保存するテーブル
+STATE_TABLE = 'sync_state'
+# 変更ログ上での名前の接頭辞（読み終えていない墓標を圧縮で消されないようにする）
+PUSH_CONSUMER = 'sync.push'
+CLIENT_CONSUMER = 'sync.client'
+
+# 更新時に書き換える列（id は端末ごとに異なるので同期しない）
+SYNC_COLUMNS = ('date', 'start_time', 'end_time', 'duration', 'card_name',
+                'notes', 'created_at', 'updated_at')
+
+def is_loopback(host: str) -> bool:
+    """この端末の中からしか接続できないアドレスかどうか"""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def encode_payload(data: Any) -> bytes:
+    """JSONをgzip圧縮したバイト列にする"""
+    return gzip.compress(json.dumps(data, ensure_ascii=False, default=str).encode('utf-8'), compresslevel=6)
+
+class PayloadTooLarge(ValueError):
+    """展開した本文が MAX_PAYLOAD_BYTES を超える"""
+
+def decode_payload(body: bytes, max_size: int = MAX_PAYLOAD_BYTES) -> Any:
+    """
+    encode_payload の逆変換
+
+    展開は max_size で打ち切るので、小さく圧縮された巨大な本文でもメモリを使い切らない。
+
+    Raises:
+        PayloadTooLarge: 展開した大きさが max_size を超える場合
+        ValueError: gzip や JSON として読めない場合
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        data = decompressor.decompress(body, max_size)
+    except zlib.error as e:
+        raise ValueError(f'invalid gzip payload: {e}')
+    if decompressor.unconsumed_tail:
+        raise PayloadTooLarge(f'payload exceeds {max_size} bytes')
+    if not decompressor.eof:
+        raise ValueError('truncated gzip payload')
+    return json.loads(data.decode('utf-8'))
+
+def open_database(db_path: Path) -> sqlite3.Connection:
+    """
+    同期用の接続を開く（瞑想記録のテーブルと変更ログがなければ作成する）
+
+    Args:
+        db_path: データベースファイル
+
+    Returns:
+        自動コミットモードの接続
+    """
+    database = SqliteDatabase(str(db_path))
+    with database.bind_ctx([MeditationRecord]):
+        database.create_tables([MeditationRecord], safe=True)
+    database.close()
+
+    conn = sqlite3.connect(str(db_path), isolation_level=None, check_same_thread=False)
+    conn.execute('PRAGMA busy_timeout = 5000')
+    change_log.install(conn)
+    conn.execute(f'CREATE TABLE IF NOT EXISTS {STATE_TABLE} (key TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+    return conn
+
+def _normalize_time(value) -> str:
+    return str(value).replace('T', ' ') if value is not None else ''
+
+def _find_session(conn: sqlite3.Connection, start_time, end_time, card_name) -> Optional[Tuple[int, str]]:
+    """同一セッションの記録を (id, updated_at) で返す"""
+    day = _normalize_time(start_time)[:10]
+    target = session_hash(start_time, end_time, card_name)
+    # 開始日で候補を絞り込み（start_time の索引を使う）、内容ハッシュで照合する
+    candidates = conn.execute(f"""
+        SELECT id, start_time, end_time, card_name, updated_at
+        FROM {RECORD_TABLE}
+        WHERE start_time >= ? AND start_time < ?
+    """, (day, day + '~'))
+    for record_id, start, end, card, updated_at in candidates:
+        if session_hash(start, end, card) == target:
+            return record_id, _normalize_time(updated_at)
+    return None
+
+def apply_changes(conn: sqlite3.Connection, changes: List[Dict[str, Any]]) -> int:
+    """
+    受け取った変更を1つのトランザクションで反映する
+
+    記録は内容ハッシュで照合し、updated_at が新しい場合だけ上書きする。
+    削除は、墓標の削除日時がこちらの記録の更新日時以降の場合だけ行う。
+    反映によって生じた変更ログは発生元を 'remote' にして、送り返さないようにする。
+
+    Args:
+        conn: 自動コミットモードの接続
+        changes: change_log.changes_since が返す形式の変更
+
+    Returns:
+        実際に反映した件数
+    """
+    applied = 0
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        before = change_log.latest_seq(conn)
+        for change in changes:
+            if change['op'] == 'delete':
+                found = _find_session(conn, change['start_time'], change['end_time'], change['card_name'])
+                if found and _normalize_time(change['deleted_at']) >= found[1]:
+                    conn.execute(f'DELETE FROM {RECORD_TABLE} WHERE id = ?', (found[0],))
+                    applied += 1
+                continue
+
+            record = change['record']
+            values = [record[column] for column in SYNC_COLUMNS]
+            found = _find_session(conn, record['start_time'], record['end_time'], record['card_name'])
+            if found is None:
+                conn.execute(
+                    f"INSERT INTO {RECORD_TABLE} ({', '.join(SYNC_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(SYNC_COLUMNS))})", values
+                )
+                applied += 1
+            elif _normalize_time(record['updated_at']) > found[1]:
+                conn.execute(
+                    f"UPDATE {RECORD_TABLE} SET {', '.join(f'{column} = ?' for column in SYNC_COLUMNS)} "
+                    f"WHERE id = ?", values + [found[0]]
+                )
+                applied += 1
+        conn.execute(f"UPDATE {change_log.CHANGE_TABLE} SET origin = 'remote' WHERE seq > ?", (before,))
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    return applied
+
+class SyncServer:
+    """
+    LAN内の端末に変更ログを配信する同期サーバー
+
+    標準ライブラリの asyncio だけで HTTP/1.1（keep-alive）を処理する。
+    データベースへのアクセスは専用スレッド1本で直列に行う。
+
+    エンドポイント:
+        GET  /changes?since=N&limit=M  カーソル以降の変更（gzip JSON）
+        POST /changes                  変更を反映する（gzip JSON）
+        GET  /status                   現在のカーソル
+    """
+
+    def __init__(self, db_path: Path, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 token: Optional[str] = None):
+        """
+        Args:
+            db_path: 配信するデータベース
+            host: 待ち受けるアドレス（既定はこの端末のみ）
+            port: 待ち受けるポート（0なら空いているポート）
+            token: X-Sync-Token で要求する共有の秘密
+
+        Raises:
+            ValueError: トークンなしでこの端末以外から接続できるアドレスを指定した場合
+        """
+        if not token and not is_loopback(host):
+            raise ValueError(f'A sync token is required to listen on {host}')
+        self.db_path = Path(db_path)
+        self.host = host
+        self.port = port
+        self.token = token
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sync-db')
+        self._conn: Optional[sqlite3.Connection] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = open_database(self.db_path)
+        return self._conn
+
+    def _get_changes(self, since: int, limit: int, client: Optional[int] = None) -> Dict[str, Any]:
+        if client is not None:
+            # クライアントは since までを受け取り済みなので、それより後の墓標は残す
+            change_log.advance_consumer(self._db(), f'{CLIENT_CONSUMER}/{client}', since)
+        with metrics.timer('sync.serve_changes'):
+            changes, cursor = change_log.changes_since(self._db(), since, limit)
+        return {'changes': changes, 'cursor': cursor}
+
+    def _post_changes(self, changes: List[Dict[str, Any]]) -> Dict[str, Any]:
+        with metrics.timer('sync.apply'):
+            applied = apply_changes(self._db(), changes)
+        return {'applied': applied, 'cursor': change_log.latest_seq(self._db())}
+
+    def _status(self) -> Dict[str, Any]:
+        return {'cursor': change_log.latest_seq(self._db())}
+
+    async def _run_db(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def _handle_request(self, method: str, target: str, headers: Dict[str, str],
+                              body: bytes) -> Tuple[int, Any]:
+        if self.token and not hmac.compare_digest(headers.get('x-sync-token', ''), self.token):
+            return 401, {'error': 'unauthorized'}
+
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        if url.path == '/changes' and method == 'GET':
+            try:
+                since = int(query.get('since', ['0'])[0])
+                limit = int(query.get('limit', [str(BATCH_SIZE)])[0])
+                client = int(query['client'][0]) if 'client' in query else None
+            except ValueError:
+                return 400, {'error': 'invalid cursor'}
+            # SQLite の LIMIT は負の値で無制限になるので受け付けない
+            if limit < 1:
+                return 400, {'error': 'invalid limit'}
+            limit = max(1, min(limit, BATCH_SIZE * 10))
+            return 200, await self._run_db(self._get_changes, since, limit, client)
+        if url.path == '/changes' and method == 'POST':
+            try:
+                payload = decode_payload(body) if headers.get('content-encoding') == 'gzip' else json.loads(body)
+                changes = payload['changes']
+            except PayloadTooLarge:
+                return 413, {'error': 'payload too large'}
+            except (OSError, ValueError, KeyError, TypeError):
+                return 400, {'error': 'invalid payload'}
+            return 200, await self._run_db(self._post_changes, changes)
+        if url.path == '/status' and method == 'GET':
+            return 200, await self._run_db(self._status)
+        return 404, {'error': 'not found'}
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = writer.get_extra_info('peername')
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    length = -1
+                if not 0 <= length <= MAX_BODY_BYTES:
+                    # 本文を読まずに断るので、この接続は続けられない
+                    status = 413 if length > MAX_BODY_BYTES else 400
+                    await self._respond(writer, status, {'error': http.client.responses[status].lower()}, False)
+                    break
+                body = await reader.readexactly(length)
+
+                try:
+                    status, data = await self._handle_request(method, target, headers, body)
+                except Exception as e:
+                    logger.error(f'Sync request failed: {method} {target}: {str(e)}')
+                    status, data = 500, {'error': str(e)}
+
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                await self._respond(writer, status, data, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            logger.error(f'Sync connection error from {peer}: {str(e)}')
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, data: Any, keep_alive: bool):
+        payload = encode_payload(data)
+        writer.write(
+            f'HTTP/1.1 {status} {http.client.responses.get(status, "")}\r\n'
+            f'Content-Type: application/json\r\n'
+            f'Content-Encoding: gzip\r\n'
+            f'Content-Length: {len(payload)}\r\n'
+            f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode('latin-1')
+            + payload
+        )
+        await writer.drain()
+
+    async def serve(self):
+        """サーバーを起動して停止されるまで待つ"""
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f'Sync server listening on {self.host}:{self.port} ({self.db_path})')
+        self._ready.set()
+        async with self._server:
+            try:
+                await self._server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+    def start(self):
+        """バックグラウンドスレッドでサーバーを起動する（待ち受けを開始するまで待つ）"""
+        self._ready.clear()
+        self._thread = threading.Thread(target=asyncio.run, args=(self.serve(),),
+                                        name='sync-server', daemon=True)
+        self._thread.start()
+        self._ready.wait(timeout=10)
+
+    def stop(self):
+        """サーバーを停止する"""
+        if self._loop and self._server:
+            self._loop.call_soon_threadsafe(self._server.close)
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._executor.submit(self._close_db).result()
+
+    def _close_db(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+class SyncClient:
+    """
+    同期サーバーとの間で変更をやり取りするクライアント
+
+    接続は使い回し、変更はバッチ単位でgzip圧縮して送受信する。
+    送信・受信のカーソルはデータベース内の sync_state テーブルに保存する。
+    """
+
+    def __init__(self, base_url: str, db_path: Path, token: Optional[str] = None,
+                 batch_size: int = BATCH_SIZE, timeout: float = 30.0):
+        url = urlsplit(base_url)
+        self.host = url.hostname or 'localhost'
+        self.port = url.port or DEFAULT_PORT
+        self.db_path = Path(db_path)
+        self.token = token
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self._http: Optional[http.client.HTTPConnection] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        # 接続ごとにサーバーを区別してカーソルを持つ
+        self._state_prefix = f'{self.host}:{self.port}'
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = open_database(self.db_path)
+        return self._conn
+
+    def close(self):
+        if self._http is not None:
+            self._http.close()
+            self._http = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _request(self, method: str, path: str, data: Any = None) -> Any:
+        body = encode_payload(data) if data is not None else None
+        headers = {'Accept-Encoding': 'gzip', 'Connection': 'keep-alive'}
+        if body is not None:
+            headers.update({'Content-Type': 'application/json', 'Content-Encoding': 'gzip'})
+        if self.token:
+            headers['X-Sync-Token'] = self.token
+
+        # 切断された接続を使い回した場合に備えて1回だけ再接続する
+        for attempt in range(2):
+            if self._http is None:
+                self._http = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._http.request(method, path, body=body, headers=headers)
+                response = self._http.getresponse()
+                payload = response.read()
+                break
+            except (ConnectionError, http.client.HTTPException):
+                self._http.close()
+                self._http = None
+                if attempt:
+                    raise
+
+        if response.getheader('Content-Encoding') == 'gzip':
+            result = decode_payload(payload)
+        else:
+            result = json.loads(payload or b'{}')
+        if response.status != 200:
+            raise ConnectionError(f'sync server returned {response.status}: {result.get("error", "")}')
+        return result
+
+    def _get_cursor(self, name: str) -> int:
+        row = self.conn.execute(f'SELECT value FROM {STATE_TABLE} WHERE key = ?',
+                                (f'{self._state_prefix}/{name}',)).fetchone()
+        return row[0] if row else 0
+
+    def _set_cursor(self, name: str, value: int):
+        self.conn.execute(f'INSERT OR REPLACE INTO {STATE_TABLE} (key, value) VALUES (?, ?)',
+                          (f'{self._state_prefix}/{name}', value))
+        if name == 'push':
+            # 送信のカーソルはこの端末の変更ログの位置なので、処理する側として登録する
+            change_log.advance_consumer(self.conn, f'{PUSH_CONSUMER}/{self._state_prefix}', value)
+
+    @property
+    def client_id(self) -> int:
+        """サーバーに知らせるこの端末の識別子（初回に作って sync_state に保存する）"""
+        self.conn.execute(f'INSERT OR IGNORE INTO {STATE_TABLE} (key, value) VALUES (?, ?)',
+                          ('client_id', secrets.randbits(62)))
+        return self.conn.execute(f'SELECT value FROM {STATE_TABLE} WHERE key = ?', ('client_id',)).fetchone()[0]
+
+    @metrics.timed('sync.push')
+    def push(self) -> int:
+        """
+        この端末での変更をサーバーへ送る
+
+        Returns:
+            サーバー側で反映された件数
+        """
+        applied = 0
+        cursor = self._get_cursor('push')
+        # 一度も送っていなくても、これ以降の削除の墓標を残すよう登録しておく
+        self._set_cursor('push', cursor)
+        while True:
+            changes, next_cursor = change_log.changes_since(self.conn, cursor, self.batch_size, origin='local')
+            if next_cursor == cursor:
+                break
+            if changes:
+                applied += self._request('POST', '/changes', {'changes': changes})['applied']
+            cursor = next_cursor
+            self._set_cursor('push', cursor)
+        return applied
+
+    @metrics.timed('sync.pull')
+    def pull(self) -> int:
+        """
+        前回のカーソル以降にサーバーで発生した変更を取り込む
+
+        Returns:
+            この端末で反映された件数
+        """
+        applied = 0
+        cursor = self._get_cursor('pull')
+        client = self.client_id
+        while True:
+            result = self._request('GET', f'/changes?since={cursor}&limit={self.batch_size}&client={client}')
+            if result['changes']:
+                applied += apply_changes(self.conn, result['changes'])
+            if result['cursor'] == cursor:
+                break
+            cursor = result['cursor']
+            self._set_cursor('pull', cursor)
+        return applied
+
+    def sync(self) -> Tuple[int, int]:
+        """
+        送信してから受信する
+
+        Returns:
+            (送信して反映された件数, 受信して反映した件数)
+        """
+        pushed = self.push()
+        pulled = self.pull()
+        logger.info(f'Synced with {self.host}:{self.port}: pushed {pushed}, pulled {pulled}')
+        return pushed, pulled
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the local meditation record sync server')
+    parser.add_argument('--db', default='meditation.db', help='database file to serve')
+    parser.add_argument('--host', default=DEFAULT_HOST,
+                        help='address to listen on (other than loopback requires --token)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--token', default=None, help='shared secret required in X-Sync-Token')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        server = SyncServer(args.db, args.host, args.port, args.token)
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
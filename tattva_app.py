@@ -1,21 +1,32 @@
 import sys
 import os
-import pandas as pd
 from datetime import datetime, timedelta
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QPushButton, QLabel, QTextEdit, QComboBox,
                             QSpinBox, QMessageBox, QFrame, QSizePolicy, QDialog)
 from PySide6.QtGui import QPixmap, QFont, QPalette, QColor, QIcon
-from PySide6.QtCore import Qt, QTimer, QSize
+from PySide6.QtCore import Qt, QTimer, QSize, QEvent
 from PySide6.QtMultimedia import QMediaPlayer, QAudioOutput
 from PySide6.QtCore import QUrl
-from database import initialize_database, MeditationRecord, db, backup_database
+from database import initialize_database, MeditationRecord, db
 from record_window import RecordWindow
 from settings import settings
 from i18n import i18n
 from settings_window import SettingsWindow
+from metrics import metrics
+from stall_watchdog import stall_watchdog
+from app_logging import setup_logging
+from image_validator import image_validator
+from card_catalog import load_catalog, CardCatalog
+from deck_loader import DEFAULT_DECK, discover_decks, load_deck_catalog, thumbnail_cache
+from job_runner import JobRunner, job_runner
+from archive import archive_manager
+from maintenance import maintenance_scheduler
+from auto_backup import auto_backup_scheduler
+from streak_engine import streak_engine
 import logging
 import argparse
+import multiprocessing
 
 class StyleSheet:
     MAIN_STYLE = """
@@ -89,7 +100,18 @@ class TattvaApp(QMainWindow):
         # Initialize UI components
         self.setup_timers()
         self.setup_sound_player()
+        # サムネイルの生成はデータベースのジョブと別のスレッドで行う
+        self.thumbnail_jobs = JobRunner(parent=self)
+        self.thumbnail_decks = set()
         self.load_tattva_data()
+        # 古い記録のアーカイブ（初回はテーブルの作り直しを含む）とカード画像の検証
+        # （2回目以降はキャッシュを使う）は、起動を待たせないよう補助スレッドで行う
+        self.archive_old_sessions()
+        self.thumbnail_jobs.run(None, '', self.validate_images)
+        # アイドル時にデータベースのメンテナンスを行う
+        maintenance_scheduler.start()
+        # 瞑想していない間に速度を抑えて自動バックアップする
+        auto_backup_scheduler.start()
         logging.debug("UIコンポーネントの初期化完了")
         
         # Create main layout
@@ -118,6 +140,7 @@ class TattvaApp(QMainWindow):
         
         self.setMinimumSize(1000, 600)
         self.update_card_display()
+        self.update_streak_display()
 
     def setup_timers(self):
         self.meditation_timer = QTimer()
@@ -135,11 +158,19 @@ class TattvaApp(QMainWindow):
         layout.setSpacing(16)
         layout.setContentsMargins(10, 10, 10, 10)
         
+        # Deck selection（ユーザーデッキがある場合だけ表示）
+        if len(self.decks) > 1:
+            layout.addWidget(QLabel(i18n.get('card_selection.deck')))
+            self.deck_combo = QComboBox()
+            self.deck_combo.addItems(list(self.decks))
+            self.deck_combo.setCurrentText(self.deck_name)
+            self.deck_combo.currentTextChanged.connect(self.change_deck)
+            layout.addWidget(self.deck_combo)
+        
         # Card selection
         layout.addWidget(QLabel(i18n.get('card_selection.title')))
         self.card_combo = QComboBox()
-        self.card_combo.addItems([row['組み合わせ'] 
-                                for _, row in self.tattva_data.iterrows() if pd.notna(row['組み合わせ'])])
+        self.card_combo.addItems(self.card_catalog.names())
         self.card_combo.currentIndexChanged.connect(self.update_card_display)
         layout.addWidget(self.card_combo)
         
@@ -184,6 +215,11 @@ class TattvaApp(QMainWindow):
         button_layout.addWidget(self.stop_button)
         layout.addLayout(button_layout)
         
+        # 連続記録
+        self.streak_label = QLabel()
+        self.streak_label.setStyleSheet(StyleSheet.TIME_INFO_STYLE)
+        layout.addWidget(self.streak_label)
+        
         layout.addStretch()
         return panel
 
@@ -248,14 +284,66 @@ class TattvaApp(QMainWindow):
         
         return panel
 
+    def archive_old_sessions(self):
+        """設定された日数より古い記録を年ごとのアーカイブに補助スレッドで移す"""
+        if not settings.archive_after_days:
+            return
+        
+        def done(moved):
+            if moved:
+                logging.info("古い記録をアーカイブしました: %s", moved)
+        job_runner.run(
+            None, '', archive_manager.archive_old_sessions, settings.archive_after_days,
+            on_result=done,
+            on_error=lambda message: logging.error(f"記録のアーカイブに失敗: {message}")
+        )
+
+    @staticmethod
+    def validate_images():
+        """カード画像を並列に検証する（補助スレッドで実行）"""
+        with metrics.timer('image.validate_all'):
+            image_validator.validate_all()
+
     def load_tattva_data(self):
-        """タットワデータの読み込み"""
+        """タットワデータの読み込み（コンパイル済みキャッシュを使用）"""
+        self.decks = discover_decks()
+        self.deck_name = settings.deck if settings.deck in self.decks else DEFAULT_DECK
         try:
-            self.tattva_data = pd.read_csv('tattva.csv', encoding='utf-8')
-            logging.debug(f"タットワデータを読み込みました: {len(self.tattva_data)}行")
+            if self.deck_name == DEFAULT_DECK:
+                self.card_catalog = load_catalog()
+            else:
+                self.card_catalog = load_deck_catalog(self.decks[self.deck_name])
+            logging.debug("タットワデータを読み込みました: %d行", len(self.card_catalog))
         except Exception as e:
             logging.error(f"タットワデータの読み込みに失敗: {str(e)}")
-            self.tattva_data = pd.DataFrame()
+            self.card_catalog = CardCatalog([])
+        self.generate_thumbnails()
+
+    def generate_thumbnails(self):
+        """選択中のデッキのサムネイルを補助スレッドで生成する（デッキごとに1回だけ）"""
+        deck = self.decks.get(self.deck_name)
+        if deck is None or self.deck_name in self.thumbnail_decks:
+            return
+        self.thumbnail_decks.add(self.deck_name)
+        
+        def done(name):
+            if name == self.deck_name:
+                self.update_card_display()
+        self.thumbnail_jobs.run(
+            None, '', thumbnail_cache.generate_deck, deck,
+            on_result=lambda _, name=self.deck_name: done(name),
+            on_error=lambda _, name=self.deck_name: done(name)
+        )
+
+    def change_deck(self, name: str):
+        """デッキを切り替えてカードの一覧を読み込み直す"""
+        settings.deck = name
+        self.load_tattva_data()
+        self.card_combo.blockSignals(True)
+        self.card_combo.clear()
+        self.card_combo.addItems(self.card_catalog.names())
+        self.card_combo.blockSignals(False)
+        self.update_card_display()
 
     def setup_sound_player(self):
         self.audio_output = QAudioOutput()
@@ -267,45 +355,58 @@ class TattvaApp(QMainWindow):
         self.audio_output.setVolume(1.0)
 
     def play_sound(self):
-        self.player.setPosition(0)  # Reset to start
-        self.player.play()
+        with metrics.timer('sound.play'):
+            self.player.setPosition(0)  # Reset to start
+            self.player.play()
 
     def update_card_display(self):
         """カード表示を更新"""
         try:
             selected_card = self.card_combo.currentText()
-            logging.debug(f"選択されたカード: {selected_card}")
+            logging.debug("選択されたカード: %s", selected_card)
             
-            if selected_card and selected_card in self.tattva_data['組み合わせ'].values:
-                card_data = self.tattva_data[self.tattva_data['組み合わせ'] == selected_card].iloc[0]
-                
+            card_data = self.card_catalog.get(selected_card) if selected_card else None
+            if card_data is not None:
                 # カード画像の表示
-                image_path = os.path.join('images', card_data['画像ファイル名'])
-                if os.path.exists(image_path):
-                    pixmap = QPixmap(image_path)
-                    if not pixmap.isNull():
-                        # サイズチェック（201x257であることを確認）
-                        if pixmap.width() == 201 and pixmap.height() == 257:
+                image_path = card_data.image_path
+                if not os.path.exists(image_path):
+                    logging.warning("カード画像が見つかりません: %s", image_path)
+                    self.card_image.clear()
+                else:
+                    # 標準デッキの画像は、サムネイルを使う場合も形式・破損・サイズ（201x257）を確かめる。
+                    # チェックはヘッダーのみで行い、結果はキャッシュされる
+                    validation = image_validator.validate(image_path) if self.deck_name == DEFAULT_DECK else None
+                    # 生成済みのサムネイルがあればそれを表示する（元画像はデコードしない）
+                    thumbnail = thumbnail_cache.lookup(image_path, 300)
+                    if validation is not None and not validation.valid:
+                        logging.warning("カード画像が不正です: %s (%s)", image_path, validation.error)
+                        self.card_image.clear()
+                    elif thumbnail is not None:
+                        with metrics.timer('image.load'):
+                            pixmap = QPixmap(str(thumbnail))
+                        self.card_image.setPixmap(pixmap)
+                    elif self.deck_name != DEFAULT_DECK:
+                        # ユーザーデッキの大きな画像は生成を待つ（生成後に表示し直す）
+                        self.card_image.clear()
+                        self.generate_thumbnails()
+                    else:
+                        with metrics.timer('image.load'):
+                            pixmap = QPixmap(image_path)
+                        if not pixmap.isNull():
                             # 表示サイズに合わせてスケーリング（アスペクト比を保持）
                             self.card_image.setPixmap(pixmap.scaled(300, 300, Qt.AspectRatioMode.KeepAspectRatio))
-                            logging.debug(f"カード画像を読み込みました: {image_path}")
-                else:
-                    logging.warning(f"カード画像が見つかりません: {image_path}")
-                    self.card_image.clear()
+                            logging.debug("カード画像を読み込みました: %s", image_path)
                 
                 # 解釈の表示
-                pos_text = card_data['ポジティブ解釈'] if pd.notna(card_data['ポジティブ解釈']) else "解釈なし"
-                neg_text = card_data['ネガティブ解釈'] if pd.notna(card_data['ネガティブ解釈']) else "解釈なし"
-                
-                self.pos_interpret.setText(f"{i18n.get('interpretation.positive')}: {pos_text}")
-                self.neg_interpret.setText(f"{i18n.get('interpretation.negative')}: {neg_text}")
+                self.pos_interpret.setText(f"{i18n.get('interpretation.positive')}: {card_data.positive}")
+                self.neg_interpret.setText(f"{i18n.get('interpretation.negative')}: {card_data.negative}")
             else:
-                logging.warning(f"選択されたカード {selected_card} のデータが見つかりません")
+                logging.warning("選択されたカード %s のデータが見つかりません", selected_card)
                 self.card_image.clear()
                 self.pos_interpret.clear()
                 self.neg_interpret.clear()
         except Exception as e:
-            logging.error(f"カード表示の更新中にエラーが発生: {str(e)}")
+            logging.error("カード表示の更新中にエラーが発生: %s", e)
 
     def start_meditation(self):
         """瞑想を開始"""
@@ -317,6 +418,10 @@ class TattvaApp(QMainWindow):
             self.remaining_seconds = self.timer_spinbox.value() * 60
             self.countdown_seconds = 5
             
+            # 瞑想中はメンテナンスとバックアップを止める
+            maintenance_scheduler.pause()
+            auto_backup_scheduler.pause()
+            
             # Disable start button and enable stop button
             self.start_button.setEnabled(False)
             self.stop_button.setEnabled(True)
@@ -366,6 +471,9 @@ class TattvaApp(QMainWindow):
         duration = (self.meditation_end_time - self.meditation_start_time).total_seconds() / 60
         self.duration_label.setText(f"{i18n.get('timer.duration')}: {duration:.1f}{i18n.get('timer.minutes')}")
         
+        maintenance_scheduler.resume()
+        auto_backup_scheduler.resume()
+        
         # Reset UI
         self.start_button.setEnabled(True)
         self.stop_button.setEnabled(False)
@@ -393,6 +501,8 @@ class TattvaApp(QMainWindow):
                     card_name=self.card_combo.currentText(),
                     notes=self.notes.toPlainText()
                 )
+            auto_backup_scheduler.session_saved()
+            self.update_streak_display()
             
             # Reset after successful save
             self.notes.clear()
@@ -435,40 +545,69 @@ class TattvaApp(QMainWindow):
         self.stop_button.setText(i18n.get('control.stop'))
         self.notes.setPlaceholderText(i18n.get('notes.placeholder'))
         self.update_card_display()
+        self.update_streak_display()
+
+    def update_streak_display(self):
+        """連続記録の表示を更新（前回からの変更だけを反映する）"""
+        try:
+            streak_engine.refresh()
+            stats = streak_engine.stats()
+        except Exception as e:
+            logging.error(f"連続記録の更新に失敗: {str(e)}")
+            return
+        self.streak_label.setText(i18n.get('streak.summary').format(
+            current=stats['current'], longest=stats['longest']))
+        weekdays = i18n.get('streak.weekdays').split(',')
+        consistency = ' '.join(f"{day} {rate:.0%}" for day, rate in zip(weekdays, stats['weekday_consistency']))
+        self.streak_label.setToolTip(i18n.get('streak.details').format(
+            consistency=consistency, gaps=stats['gaps']['count'], longest_gap=stats['gaps']['longest']))
+
+    def changeEvent(self, event):
+        # 記録一覧や設定で変更された分を、ウィンドウに戻ったときに反映する
+        if event.type() == QEvent.ActivationChange and self.isActiveWindow():
+            self.update_streak_display()
+        super().changeEvent(event)
 
     def closeEvent(self, event):
         """アプリケーション終了時の処理"""
-        # データベースのバックアップを作成
-        backup_database()
+        maintenance_scheduler.stop()
+        auto_backup_scheduler.stop()
+        # 前回の自動バックアップ以降の変更だけをバックアップに反映
+        with metrics.timer('backup.shutdown'):
+            try:
+                auto_backup_scheduler.flush()
+            except Exception as e:
+                logging.error(f"終了時のバックアップに失敗: {str(e)}")
         db.close()
+        # 未保存の設定を書き出す
+        settings.flush()
         event.accept()
 
-def setup_logging(debug_mode=False):
-    """ロギングの設定"""
-    log_level = logging.DEBUG if debug_mode else logging.ERROR
-    log_format = '%(asctime)s - %(levelname)s - %(message)s' if debug_mode else '%(message)s'
-    
-    logging.basicConfig(
-        level=log_level,
-        format=log_format,
-        handlers=[logging.StreamHandler()]
-    )
-
 def parse_arguments():
     """コマンドライン引数の解析"""
     parser = argparse.ArgumentParser(description='TattvaVision - タットワ瞑想支援アプリケーション')
     parser.add_argument('--debug', action='store_true', help='デバッグモードで起動（詳細なログを表示）')
+    parser.add_argument('--metrics', nargs='?', const='metrics.json', default=None, metavar='PATH',
+                        help='処理時間を計測し、終了時にJSONへ書き出す（既定: metrics.json）')
     return parser.parse_args()
 
 if __name__ == '__main__':
+    # 配布用の実行ファイルでは、プロセスプールの子プロセスとして起動された場合にここで処理して終わる
+    multiprocessing.freeze_support()
     args = parse_arguments()
     setup_logging(args.debug)
+    if args.metrics:
+        metrics.enable(args.metrics)
     
     try:
         app = QApplication(sys.argv)
+        # メインスレッドの停止を監視する
+        stall_watchdog.start()
         window = TattvaApp()
         window.show()
-        sys.exit(app.exec())
+        exit_code = app.exec()
+        stall_watchdog.stop()
+        sys.exit(exit_code)
     except Exception as e:
         logging.error(f"アプリケーションの起動に失敗しました: {str(e)}")
         sys.exit(1)
\ No newline at end of file
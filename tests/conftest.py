@@ -11,8 +11,8 @@ from database import db, initialize_database
 # テスト用のアプリケーションインスタンス
 @pytest.fixture(scope="session")
 def app(request):
-    # ヘッドレスモードを確実に設定
-    os.environ["QT_QPA_PLATFORM"] = "minimal"
+    # ヘッドレスモードを確実に設定（QT_QPA_PLATFORM=offscreen などの指定は尊重する）
+    os.environ.setdefault("QT_QPA_PLATFORM", "minimal")
     
     # 既存のアプリケーションインスタンスがあれば使用
     app = QApplication.instance()
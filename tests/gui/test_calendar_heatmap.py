@@ -0,0 +1,29 @@
+from datetime import date, timedelta
+from PySide6.QtGui import QImage
+from calendar_heatmap import CalendarHeatmap
+from day_buckets import DayBuckets
+
+class StaticBuckets(DayBuckets):
+    """データベースを読まないDayBuckets"""
+
+    def refresh(self):
+        return False
+
+def test_heatmap_paints_sessions(app):
+    """瞑想した日のセルが瞑想なしの色と違う色で描かれることを確認"""
+    buckets = StaticBuckets()
+    today = date.today()
+    buckets.load([today.toordinal(), (today - timedelta(days=800)).toordinal()], [30, 10])
+    heatmap = CalendarHeatmap(buckets)
+    heatmap.refresh()
+    assert heatmap.weeks > 110
+    heatmap.resize(heatmap.sizeHint())
+
+    image = QImage(heatmap.size(), QImage.Format_ARGB32)
+    heatmap.render(image)
+    week = heatmap.weeks - 1
+    cell = heatmap._cell_rect(week, today.weekday()).center()
+    assert image.pixelColor(cell) == CalendarHeatmap.COLORS[4]
+    assert heatmap.day_at(cell.x(), cell.y()) == today
+    empty = heatmap._cell_rect(0, 0).center()
+    assert image.pixelColor(empty) == CalendarHeatmap.COLORS[0]
@@ -0,0 +1,141 @@
+import os
+import time
+import pytest
+from PySide6.QtCore import QEvent, QObject, QElapsedTimer, QTimer
+from PySide6.QtWidgets import QApplication
+import change_log
+from database import MeditationRecord, db
+from tests.performance.data_generator import generate_batches
+
+pytestmark = pytest.mark.gui_benchmark
+
+# 許容時間（秒）。これを超えたらCIを失敗させる
+FIRST_PAINT_BUDGET = 3.0
+CARD_SWITCH_BUDGET = 0.05
+RECORD_WINDOW_OPEN_BUDGET = {0: 0.5, 1_000: 1.0, 10_000: 5.0}
+SEARCH_KEYSTROKE_BUDGET = {0: 0.05, 1_000: 0.3, 10_000: 2.0}
+EVENT_LOOP_STALL_BUDGET = {0: 0.1, 1_000: 0.5, 10_000: 3.0}
+
+class PaintWatcher(QObject):
+    """最初の描画イベントまでの時間を記録するイベントフィルタ"""
+
+    def __init__(self, start: float):
+        super().__init__()
+        self.start = start
+        self.first_paint = None
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and self.first_paint is None:
+            self.first_paint = time.perf_counter() - self.start
+        return False
+
+class StallMonitor:
+    """短い間隔のタイマーでイベントループの停止時間を計測する"""
+
+    def __init__(self, interval_ms: int = 5):
+        self.interval_ms = interval_ms
+        self.max_gap = 0.0
+        self._clock = QElapsedTimer()
+        self._timer = QTimer()
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self._tick)
+
+    def _tick(self):
+        gap = self._clock.restart() / 1000
+        self.max_gap = max(self.max_gap, gap)
+
+    def __enter__(self):
+        self._clock.start()
+        self._timer.start()
+        return self
+
+    def __exit__(self, *exc):
+        QApplication.processEvents()
+        self._tick()
+        self._timer.stop()
+
+@pytest.fixture(params=sorted(RECORD_WINDOW_OPEN_BUDGET))
+def seeded_db(request, temp_dir):
+    """指定件数の瞑想記録を持つデータベースを用意する"""
+    size = request.param
+    db.init(os.path.join(temp_dir, f'gui_bench_{size}.db'))
+    db.connect(reuse_if_open=True)
+    db.create_tables([MeditationRecord], safe=True)
+    change_log.install(db.connection())
+    with db.atomic():
+        for batch in generate_batches(size, batch_size=500):
+            MeditationRecord.insert_many(batch).execute()
+    yield size
+    db.close()
+
+def test_main_window_first_paint(app, test_db_path, qtbot):
+    """メインウィンドウが最初に描画されるまでの時間"""
+    from tattva_app import TattvaApp
+
+    watcher = PaintWatcher(time.perf_counter())
+    window = TattvaApp()
+    window.installEventFilter(watcher)
+    window.show()
+    qtbot.waitUntil(lambda: watcher.first_paint is not None, timeout=int(FIRST_PAINT_BUDGET * 1000))
+    window.close()
+
+    assert watcher.first_paint < FIRST_PAINT_BUDGET, f'First paint took {watcher.first_paint:.3f}s'
+
+def test_card_switch_latency(app, test_db_path):
+    """update_card_display によるカード切り替えの時間"""
+    from tattva_app import TattvaApp
+
+    window = TattvaApp()
+    count = window.card_combo.count()
+    assert count > 1
+
+    worst = 0.0
+    for index in range(count):
+        start = time.perf_counter()
+        window.card_combo.setCurrentIndex(index)
+        QApplication.processEvents()
+        worst = max(worst, time.perf_counter() - start)
+    window.close()
+
+    assert worst < CARD_SWITCH_BUDGET, f'Card switch took {worst:.3f}s'
+
+def test_record_window_open_time(app, seeded_db):
+    """RecordWindow を開いて表示するまでの時間"""
+    from record_window import RecordWindow
+
+    start = time.perf_counter()
+    window = RecordWindow()
+    window.show()
+    QApplication.processEvents()
+    elapsed = time.perf_counter() - start
+
+    assert window.table.rowCount() == seeded_db
+    window.hide()
+    window.deleteLater()
+
+    budget = RECORD_WINDOW_OPEN_BUDGET[seeded_db]
+    assert elapsed < budget, f'RecordWindow with {seeded_db} rows opened in {elapsed:.3f}s'
+
+def test_search_keystroke_latency(app, seeded_db, qtbot):
+    """検索欄への1文字入力から一覧更新までの時間とイベントループの停止時間"""
+    from record_window import RecordWindow
+
+    window = RecordWindow()
+    window.show()
+    QApplication.processEvents()
+
+    worst = 0.0
+    with StallMonitor() as monitor:
+        # QTestのキー入力はASCIIのみ対応のため英語のメモで検索する
+        for char in 'peace':
+            start = time.perf_counter()
+            qtbot.keyClick(window.search_input, char)
+            QApplication.processEvents()
+            worst = max(worst, time.perf_counter() - start)
+    window.hide()
+    window.deleteLater()
+
+    budget = SEARCH_KEYSTROKE_BUDGET[seeded_db]
+    assert worst < budget, f'Search keystroke with {seeded_db} rows took {worst:.3f}s'
+    stall_budget = EVENT_LOOP_STALL_BUDGET[seeded_db]
+    assert monitor.max_gap < stall_budget, f'Event loop stalled for {monitor.max_gap:.3f}s'
@@ -0,0 +1,222 @@
+"""
+大規模な瞑想履歴に対するベンチマーク
+
+使い方:
+    python -m tests.performance.benchmark --sizes 10000 100000 1000000 --output bench.json
+    python -m tests.performance.benchmark --sizes 10000 --compare baseline.json
+"""
+import argparse
+import json
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Callable, List, Optional
+
+import backup_manager
+from database import MeditationRecord, db
+from backup_manager import BackupManager
+from settings import Settings
+from .data_generator import generate_batches, DEFAULT_SEED
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+OPERATIONS = ['insert', 'search', 'sort', 'paging', 'export', 'import', 'backup', 'restore']
+# この割合を超えて遅くなったら劣化とみなす
+DEFAULT_THRESHOLD = 0.2
+# 計測誤差として無視する差（秒）
+MIN_DELTA = 0.005
+
+@contextmanager
+def isolated_settings(work_dir: Path):
+    """ベンチマーク中の設定変更がアプリの設定ファイルに書き込まれないようにする"""
+    original = backup_manager.settings
+    bench_settings = Settings(work_dir / 'settings.json')
+    backup_manager.settings = bench_settings
+    try:
+        yield bench_settings
+    finally:
+        backup_manager.settings = original
+        bench_settings.flush()
+
+def _timed(func: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+def _open_database(path: Path):
+    db.init(str(path))
+    db.connect(reuse_if_open=True)
+    db.create_tables([MeditationRecord], safe=True)
+
+def run_size(size: int, work_dir: Path, seed: int = DEFAULT_SEED) -> Dict[str, float]:
+    """
+    指定件数のデータで全ての操作を計測する
+
+    Args:
+        size: セッション数
+        work_dir: 一時ファイルを置くディレクトリ
+        seed: データ生成の乱数シード
+
+    Returns:
+        {操作名: 秒数}
+    """
+    results: Dict[str, float] = {}
+    db_path = work_dir / f'bench_{size}.db'
+    # 計測のあとはアプリのデータベースの接続先に戻す
+    original_database, original_params = db.database, dict(db.connect_params)
+    try:
+        _open_database(db_path)
+
+        def insert():
+            with db.atomic():
+                for batch in generate_batches(size, batch_size=500, seed=seed):
+                    MeditationRecord.insert_many(batch).execute()
+        results['insert'] = _timed(insert)
+
+        def search():
+            for text in ('集中', 'peace', '気づき'):
+                list(MeditationRecord.select()
+                     .where(MeditationRecord.notes.contains(text))
+                     .order_by(MeditationRecord.date.desc())
+                     .tuples())
+        results['search'] = _timed(search)
+
+        def sort():
+            list(MeditationRecord.select(MeditationRecord.id)
+                 .order_by(MeditationRecord.card_name, MeditationRecord.start_time.desc())
+                 .tuples())
+        results['sort'] = _timed(sort)
+
+        def paging():
+            pages = max(1, size // 100)
+            for page in range(1, pages + 1, max(1, pages // 20)):
+                list(MeditationRecord.select()
+                     .order_by(MeditationRecord.date.desc())
+                     .paginate(page, 100)
+                     .tuples())
+        results['paging'] = _timed(paging)
+        db.close()
+
+        manager = BackupManager(db_path, work_dir / 'backups')
+
+        csv_path = work_dir / f'bench_{size}.csv'
+        results['export'] = _timed(lambda: _check(manager.export_csv(csv_path)))
+
+        import_db = work_dir / f'bench_{size}_import.db'
+        _open_database(import_db)
+        db.close()
+        manager.db_path = import_db
+        results['import'] = _timed(lambda: _check(manager.import_csv(csv_path)))
+
+        manager.db_path = db_path
+        backup_path = work_dir / f'bench_{size}_backup.db'
+        results['backup'] = _timed(lambda: _check(manager.create_backup(backup_path)))
+        results['restore'] = _timed(lambda: _check(manager.restore_backup(backup_path)))
+
+        with sqlite3.connect(db_path) as conn:
+            restored = conn.execute(f'SELECT COUNT(*) FROM {MeditationRecord._meta.table_name}').fetchone()[0]
+        if restored != size:
+            raise RuntimeError(f'restore produced {restored} rows, expected {size}')
+    finally:
+        if not db.is_closed():
+            db.close()
+        db.init(original_database, **original_params)
+
+    return results
+
+def _check(result: tuple[bool, str]):
+    success, message = result
+    if not success:
+        raise RuntimeError(message)
+
+def run_benchmarks(sizes: List[int], seed: int = DEFAULT_SEED,
+                   work_dir: Optional[Path] = None) -> Dict[str, Any]:
+    """全サイズのベンチマークを実行し、結果をJSON化できる形で返す"""
+    report: Dict[str, Any] = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sqlite': sqlite3.sqlite_version,
+            'seed': seed,
+        },
+        'results': {},
+    }
+    with tempfile.TemporaryDirectory(dir=work_dir) as temp:
+        temp_dir = Path(temp)
+        with isolated_settings(temp_dir):
+            for size in sizes:
+                size_dir = temp_dir / str(size)
+                size_dir.mkdir()
+                report['results'][str(size)] = run_size(size, size_dir, seed)
+    return report
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any],
+            threshold: float = DEFAULT_THRESHOLD) -> List[Dict[str, Any]]:
+    """
+    ベースラインと比較して劣化した計測値を返す
+
+    Args:
+        current: run_benchmarks の結果
+        baseline: 保存済みのベースライン
+        threshold: 許容する速度低下の割合
+
+    Returns:
+        劣化した項目のリスト（size, operation, baseline, current, ratio）
+    """
+    regressions = []
+    for size, operations in current['results'].items():
+        base_operations = baseline.get('results', {}).get(size, {})
+        for operation, seconds in operations.items():
+            base = base_operations.get(operation)
+            if base is None:
+                continue
+            if seconds - base > MIN_DELTA and seconds > base * (1 + threshold):
+                regressions.append({
+                    'size': int(size),
+                    'operation': operation,
+                    'baseline': base,
+                    'current': seconds,
+                    'ratio': seconds / base if base else float('inf'),
+                })
+    return regressions
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [f"{'size':>10} " + ' '.join(f'{op:>9}' for op in OPERATIONS)]
+    for size, operations in report['results'].items():
+        lines.append(f'{size:>10} ' + ' '.join(f'{operations.get(op, 0):>9.3f}' for op in OPERATIONS))
+    return '\n'.join(lines)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='TattvaVision ベンチマーク')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='セッション数')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='データ生成の乱数シード')
+    parser.add_argument('--output', type=Path, help='結果を書き出すJSONファイル')
+    parser.add_argument('--compare', type=Path, help='比較するベースラインJSON')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='劣化とみなす割合')
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.sizes, args.seed)
+    print(format_report(report))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for item in regressions:
+            print(f"REGRESSION size={item['size']} {item['operation']}: "
+                  f"{item['baseline']:.3f}s -> {item['current']:.3f}s (x{item['ratio']:.2f})")
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+import json
+import pytest
+from pathlib import Path
+import backup_manager
+from database import db
+from settings import settings
+from .data_generator import generate_sessions, generate_batches, CARD_NAMES
+from .benchmark import run_benchmarks, compare, main, OPERATIONS
+
+def test_generator_is_deterministic():
+    """同じシードで同じデータが生成されることのテスト"""
+    first = list(generate_sessions(200, seed=1))
+    second = list(generate_sessions(200, seed=1))
+    other = list(generate_sessions(200, seed=2))
+
+    assert first == second
+    assert first != other
+    assert len(first) == 200
+
+def test_generator_produces_realistic_sessions():
+    """生成データの妥当性テスト"""
+    sessions = list(generate_sessions(500))
+
+    assert all(s['card_name'] in CARD_NAMES for s in sessions)
+    assert all(s['end_time'] > s['start_time'] for s in sessions)
+    assert any('集中' in s['notes'] for s in sessions)
+    assert any(s['notes'].isascii() and s['notes'] for s in sessions)
+    starts = [s['start_time'] for s in sessions]
+    assert starts == sorted(starts)
+
+def test_generate_batches_splits_evenly():
+    """バッチ分割のテスト"""
+    batches = list(generate_batches(1050, batch_size=500))
+    assert [len(b) for b in batches] == [500, 500, 50]
+
+def test_run_benchmarks_small(temp_dir):
+    """少量データで全操作が計測されることのテスト"""
+    report = run_benchmarks([300], work_dir=Path(temp_dir))
+
+    assert set(report['results']['300']) == set(OPERATIONS)
+    assert all(seconds >= 0 for seconds in report['results']['300'].values())
+
+def test_run_benchmarks_restores_app_state(temp_dir):
+    """ベンチマークのあとにアプリの設定とデータベースの接続先が元に戻ることのテスト"""
+    original_database = db.database
+    run_benchmarks([50], work_dir=Path(temp_dir))
+
+    assert db.database == original_database
+    assert backup_manager.settings is settings
+
+def test_compare_flags_regressions():
+    """ベースラインとの比較で劣化が検出されることのテスト"""
+    baseline = {'results': {'1000': {'insert': 1.0, 'search': 0.1, 'sort': 0.001}}}
+    current = {'results': {'1000': {'insert': 1.5, 'search': 0.105, 'sort': 0.004}}}
+
+    regressions = compare(current, baseline, threshold=0.2)
+
+    assert [r['operation'] for r in regressions] == ['insert']
+    assert regressions[0]['ratio'] == pytest.approx(1.5)
+
+def test_main_compare_exit_code(temp_dir, monkeypatch):
+    """比較モードで劣化があれば終了コード1を返すことのテスト"""
+    fast = {'results': {'10': {op: 0.0 for op in OPERATIONS}}}
+    slow = {'meta': {}, 'results': {'10': {op: 1.0 for op in OPERATIONS}}}
+    baseline_path = Path(temp_dir) / 'baseline.json'
+    baseline_path.write_text(json.dumps(fast), encoding='utf-8')
+    monkeypatch.setattr('tests.performance.benchmark.run_benchmarks', lambda sizes, seed: slow)
+
+    assert main(['--sizes', '10', '--compare', str(baseline_path)]) == 1
@@ -0,0 +1,74 @@
+import json
+import logging
+import threading
+import pytest
+from pathlib import Path
+from app_logging import setup_logging, shutdown_logging, JsonFormatter
+
+@pytest.fixture
+def log_file(temp_dir):
+    """テスト後にルートロガーの設定を元に戻す"""
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield Path(temp_dir) / 'app.log'
+    shutdown_logging()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+def _read_entries(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+def test_records_are_written_as_json(log_file):
+    """ログがJSON形式でファイルに書き込まれることのテスト"""
+    setup_logging(log_file=log_file)
+    logging.getLogger('backup_manager').info('バックアップ %s', '完了')
+    shutdown_logging()
+
+    entries = _read_entries(log_file)
+    assert entries[-1]['message'] == 'バックアップ 完了'
+    assert entries[-1]['logger'] == 'backup_manager'
+    assert entries[-1]['level'] == 'INFO'
+
+def test_debug_level_depends_on_mode(log_file):
+    """通常モードではDEBUGログが書き込まれないことのテスト"""
+    setup_logging(debug_mode=False, log_file=log_file)
+    logging.debug('hidden')
+    logging.info('shown')
+    shutdown_logging()
+
+    messages = [entry['message'] for entry in _read_entries(log_file)]
+    assert 'hidden' not in messages
+    assert 'shown' in messages
+
+def test_exception_is_serialized(log_file):
+    """例外情報がJSONに含まれることのテスト"""
+    setup_logging(log_file=log_file)
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        logging.exception('failed')
+    shutdown_logging()
+
+    entry = _read_entries(log_file)[-1]
+    assert 'ValueError: boom' in entry['exception']
+
+def test_writes_happen_off_the_calling_thread(log_file, monkeypatch):
+    """ファイルへの書き込みが呼び出し元以外のスレッドで行われることのテスト"""
+    writer_threads = []
+    original_format = JsonFormatter.format
+
+    def recording_format(self, record):
+        writer_threads.append(threading.current_thread())
+        return original_format(self, record)
+
+    monkeypatch.setattr(JsonFormatter, 'format', recording_format)
+    setup_logging(log_file=log_file)
+    logging.info('queued')
+    shutdown_logging()
+
+    assert writer_threads
+    assert threading.current_thread() not in writer_threads
@@ -0,0 +1,112 @@
+import sqlite3
+from datetime import datetime, timedelta
+from pathlib import Path
+import pytest
+from peewee import SqliteDatabase
+import change_log
+from archive import ARCHIVE_VIEW, RECORD_TABLE, ArchiveManager
+from database import MeditationRecord, db
+
+@pytest.fixture
+def db_path(temp_dir):
+    """2021年・2022年と最近の記録を持つ一時データベース"""
+    path = Path(temp_dir) / 'meditation.db'
+    database = SqliteDatabase(str(path))
+    with database.bind_ctx([MeditationRecord]):
+        database.create_tables([MeditationRecord])
+    database.close()
+    recent = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d 07:00:00')
+    with sqlite3.connect(path) as conn:
+        change_log.install(conn)
+        conn.executemany(
+            f"INSERT INTO {RECORD_TABLE} (date, start_time, end_time, duration, card_name, notes, created_at, updated_at) "
+            "VALUES (?, ?, ?, 10, '地の地', ?, ?, ?)",
+            [(start[:10], start, start, notes, start, start) for start, notes in [
+                ('2021-03-01 07:00:00', 'old peace'),
+                ('2021-12-31 23:00:00', 'old'),
+                ('2022-06-01 07:00:00', 'older peace'),
+                (recent, 'recent peace'),
+            ]]
+        )
+    return path
+
+def test_archive_moves_old_sessions_by_year(db_path):
+    """古い記録が年ごとのアーカイブに移り、墓標が残らないことを確認"""
+    manager = ArchiveManager(db_path)
+    assert manager.archive_old_sessions(older_than_days=30) == {2021: 2, 2022: 1}
+    assert list(manager.archive_files()) == [2021, 2022]
+
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute(f'SELECT COUNT(*) FROM {RECORD_TABLE}').fetchone()[0] == 1
+        assert conn.execute("SELECT COUNT(*) FROM record_change WHERE op = 'D'").fetchone()[0] == 0
+        changes, _ = change_log.changes_since(conn, 0)
+        assert [change['record']['notes'] for change in changes] == ['recent peace']
+
+    # 2回目は移すものがない
+    assert manager.archive_old_sessions(older_than_days=30) == {}
+
+def test_attach_reads_all_periods(db_path):
+    """接続したアーカイブを含めて全期間を参照できることを確認"""
+    manager = ArchiveManager(db_path)
+    with sqlite3.connect(db_path) as conn:
+        assert manager.attach(conn) == RECORD_TABLE
+
+    manager.archive_old_sessions(older_than_days=30)
+    with sqlite3.connect(db_path) as conn:
+        assert manager.attach(conn) == ARCHIVE_VIEW
+        assert manager.attach(conn) == ARCHIVE_VIEW
+        rows = conn.execute(f"SELECT notes FROM {ARCHIVE_VIEW} WHERE notes LIKE '%peace%' ORDER BY start_time").fetchall()
+    assert [row[0] for row in rows] == ['old peace', 'older peace', 'recent peace']
+
+def test_select_through_app_connection(db_path):
+    """アプリの接続でアーカイブを含む検索ができることを確認"""
+    manager = ArchiveManager(db_path)
+    manager.archive_old_sessions(older_than_days=30)
+    original_database, original_params = db.database, dict(db.connect_params)
+    db.init(str(db_path))
+    try:
+        Record = manager.model()
+        records = list(Record.select().where(Record.notes.contains('peace')).order_by(Record.start_time))
+        assert [record.notes for record in records] == ['old peace', 'older peace', 'recent peace']
+        assert records[0].start_time.year == 2021
+    finally:
+        # アプリのデータベースの接続先を元に戻す
+        db.close()
+        db.init(original_database, **original_params)
+
+def test_archived_ids_are_not_reused(temp_dir):
+    """アーカイブに移した記録のIDが再利用されず、再度の移動で上書きされないことを確認"""
+    path = Path(temp_dir) / 'meditation.db'
+    insert = (f"INSERT INTO {RECORD_TABLE} (date, start_time, end_time, duration, card_name, notes, created_at, updated_at) "
+              "VALUES (?, ?, ?, 10, '地の地', ?, ?, ?)")
+    with sqlite3.connect(path) as conn:
+        # AUTOINCREMENT のない以前のテーブル
+        conn.execute(f"""
+            CREATE TABLE "{RECORD_TABLE}" ("id" INTEGER NOT NULL PRIMARY KEY, "date" DATE NOT NULL,
+                "start_time" DATETIME NOT NULL, "end_time" DATETIME NOT NULL, "duration" INTEGER NOT NULL,
+                "card_name" VARCHAR(255) NOT NULL, "notes" TEXT NOT NULL,
+                "created_at" DATETIME NOT NULL, "updated_at" DATETIME NOT NULL)
+        """)
+        change_log.install(conn)
+        conn.execute(insert, ('2021-03-01', '2021-03-01 07:00:00', '2021-03-01 07:00:00', 'A1', 'x', 'x'))
+
+    manager = ArchiveManager(path)
+    assert manager.archive_old_sessions(older_than_days=30) == {2021: 1}
+    with sqlite3.connect(path) as conn:
+        conn.execute(insert, ('2021-04-01', '2021-04-01 07:00:00', '2021-04-01 07:00:00', 'A2', 'x', 'x'))
+        conn.execute(insert, ('2021-05-01', '2021-05-01 07:00:00', '2021-05-01 07:00:00', 'B1', 'x', 'x'))
+        assert [row[0] for row in conn.execute(f'SELECT id FROM {RECORD_TABLE} ORDER BY id')] == [2, 3]
+    assert manager.archive_old_sessions(older_than_days=30) == {2021: 2}
+
+    with sqlite3.connect(manager.archive_path(2021)) as conn:
+        rows = conn.execute(f'SELECT id, notes FROM {RECORD_TABLE} ORDER BY id').fetchall()
+    assert rows == [(1, 'A1'), (2, 'A2'), (3, 'B1')]
+    with sqlite3.connect(path) as conn:
+        # 移動前の変更履歴は残る
+        assert conn.execute("SELECT COUNT(*) FROM record_change WHERE op = 'I'").fetchone()[0] == 3
+        assert conn.execute("SELECT COUNT(*) FROM record_change WHERE op = 'D'").fetchone()[0] == 0
+        # トリガーが作り直されている
+        conn.execute(insert, ('2024-01-01', '2024-01-01 07:00:00', '2024-01-01 07:00:00', 'new', 'x', 'x'))
+        assert conn.execute(f'SELECT MAX(id) FROM {RECORD_TABLE}').fetchone()[0] == 4
+        changes, _ = change_log.changes_since(conn, 0)
+        assert [change['record']['notes'] for change in changes] == ['new']
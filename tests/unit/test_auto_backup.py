@@ -0,0 +1,117 @@
+import sqlite3
+import time
+from pathlib import Path
+import pytest
+from peewee import SqliteDatabase
+import change_log
+from auto_backup import AutoBackupInterrupted, AutoBackupScheduler
+from database import MeditationRecord
+
+@pytest.fixture
+def db_path(temp_dir):
+    """変更ログ付きで記録を3件持つ一時データベース"""
+    path = Path(temp_dir) / 'meditation.db'
+    database = SqliteDatabase(str(path))
+    with database.bind_ctx([MeditationRecord]):
+        database.create_tables([MeditationRecord])
+    database.close()
+    with sqlite3.connect(path) as conn:
+        change_log.install(conn)
+    _insert(path, '2024-01-01 07:00:00', '2024-01-02 07:00:00', '2024-01-03 07:00:00')
+    return path
+
+def _insert(db_path, *starts):
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany(
+            "INSERT INTO meditationrecord (date, start_time, end_time, duration, card_name, notes, created_at, updated_at) "
+            "VALUES (?, ?, ?, 10, '地の地', ?, ?, ?)",
+            [(start[:10], start, start, 'x' * 1000, start, start) for start in starts]
+        )
+
+def _records(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute('SELECT id, start_time, notes FROM meditationrecord ORDER BY id').fetchall()
+
+def test_flush_applies_only_changes(db_path, temp_dir):
+    """終了時は前回のバックアップ以降の追加・更新・削除だけを反映することを確認"""
+    scheduler = AutoBackupScheduler(db_path, Path(temp_dir) / 'meditation.db.bak', max_bytes_per_second=0)
+    assert scheduler.flush() == 'full'
+    assert scheduler.flush() == 'unchanged'
+
+    _insert(db_path, '2024-01-04 07:00:00')
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE meditationrecord SET notes = '更新' WHERE id = 1")
+        conn.execute('DELETE FROM meditationrecord WHERE id = 2')
+    assert scheduler.pending_changes()
+    assert scheduler.flush() == 'incremental'
+    assert _records(scheduler.backup_path) == _records(db_path)
+    assert not scheduler.pending_changes()
+
+    # バックアップ側の変更ログも元と同じになる
+    with sqlite3.connect(scheduler.backup_path) as conn:
+        backup_changes = change_log.changes_since(conn, 0)[0]
+    with sqlite3.connect(db_path) as conn:
+        assert change_log.changes_since(conn, 0)[0] == backup_changes
+
+def test_flush_copies_everything_after_restore(db_path, temp_dir):
+    """変更ログがバックアップより古くなった場合は全体をコピーすることを確認"""
+    scheduler = AutoBackupScheduler(db_path, Path(temp_dir) / 'meditation.db.bak')
+    _insert(db_path, '2024-01-04 07:00:00')
+    scheduler.flush()
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE sqlite_sequence SET seq = 1 WHERE name = 'record_change'")
+    assert scheduler.flush() == 'full'
+
+def test_backup_is_throttled_and_interruptible(db_path, temp_dir):
+    """速度制限のあるバックアップが一時停止で中断され、前回のバックアップが残ることを確認"""
+    _insert(db_path, *[f'2023-01-01 07:{i // 60:02d}:{i % 60:02d}' for i in range(400)])
+    backup_path = Path(temp_dir) / 'meditation.db.bak'
+    scheduler = AutoBackupScheduler(db_path, backup_path, pages_per_step=1, max_bytes_per_second=4096 * 100)
+    scheduler.pause()
+    with pytest.raises(AutoBackupInterrupted):
+        scheduler.run_backup()
+    assert not backup_path.exists()
+    assert not list(Path(temp_dir).glob('*.tmp'))
+
+    scheduler.resume()
+    start = time.perf_counter()
+    scheduler.run_backup()
+    # 1ページずつ100ページ/秒で書くので、全ページのコピーには時間がかかる
+    with sqlite3.connect(db_path) as conn:
+        pages = conn.execute('PRAGMA page_count').fetchone()[0]
+    assert time.perf_counter() - start >= (pages - 1) / 100 * 0.9
+    assert _records(backup_path) == _records(db_path)
+
+def test_due_reason(db_path, temp_dir):
+    """保存件数・間隔・アイドルの条件でバックアップの理由が決まることを確認"""
+    scheduler = AutoBackupScheduler(db_path, Path(temp_dir) / 'meditation.db.bak', idle_delay=3600,
+                                    sessions_per_backup=2, max_bytes_per_second=0)
+    assert scheduler.due_reason() == 'interval'
+    scheduler.run_backup()
+    assert scheduler.due_reason() is None
+
+    scheduler.session_saved()
+    scheduler.session_saved()
+    assert scheduler.due_reason() == 'sessions'
+    scheduler.pause()
+    assert scheduler.due_reason() is None
+    scheduler.resume()
+    scheduler.run_backup()
+
+    _insert(db_path, '2024-01-04 07:00:00')
+    assert scheduler.due_reason() is None
+    scheduler.idle_delay = 0
+    assert scheduler.due_reason() == 'idle'
+
+def test_background_thread_backs_up_after_sessions(db_path, temp_dir):
+    """保存件数に達したら補助スレッドがすぐにバックアップすることを確認"""
+    backup_path = Path(temp_dir) / 'meditation.db.bak'
+    scheduler = AutoBackupScheduler(db_path, backup_path, idle_delay=3600, check_interval=3600,
+                                    sessions_per_backup=1, max_bytes_per_second=0)
+    scheduler.start()
+    scheduler.session_saved()
+    deadline = time.monotonic() + 5
+    while not backup_path.exists() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    scheduler.stop()
+    assert _records(backup_path) == _records(db_path)
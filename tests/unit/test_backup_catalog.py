@@ -0,0 +1,72 @@
+import shutil
+import sqlite3
+from pathlib import Path
+import pytest
+from peewee import SqliteDatabase
+from backup_catalog import CATALOG_FILE, BackupCatalog, describe_backup
+from backup_manager import BackupManager, file_checksum
+from database import MeditationRecord
+from settings import settings
+
+@pytest.fixture
+def manager(temp_dir, monkeypatch):
+    """記録を2件持つ一時データベースのBackupManager"""
+    monkeypatch.setattr(settings, 'settings_file', Path(temp_dir) / 'settings.json')
+    monkeypatch.setattr(settings, '_settings', dict(settings._settings))
+    db_path = Path(temp_dir) / 'meditation.db'
+    database = SqliteDatabase(str(db_path))
+    with database.bind_ctx([MeditationRecord]):
+        database.create_tables([MeditationRecord])
+    database.close()
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany(
+            "INSERT INTO meditationrecord (date, start_time, end_time, duration, card_name, notes, created_at, updated_at) "
+            "VALUES (?, ?, ?, 10, '地の地', '', ?, ?)",
+            [(start[:10], start, start, start, start) for start in ('2024-01-01 07:00:00', '2024-03-01 07:00:00')]
+        )
+    yield BackupManager(db_path=db_path, backup_dir=Path(temp_dir) / 'backups')
+    settings.flush()
+
+def test_create_backup_records_summary(manager):
+    """バックアップの作成時に要約が索引に記録されることを確認"""
+    backup_path = manager.backup_dir / 'first.db'
+    assert manager.create_backup(backup_path)[0]
+
+    entry = BackupCatalog(manager.backup_dir).get(backup_path)
+    assert entry.record_count == 2
+    assert entry.first_session.startswith('2024-01-01')
+    assert entry.last_session.startswith('2024-03-01')
+    assert entry.size == backup_path.stat().st_size
+    assert manager.recorded_checksum(backup_path) == entry.checksum == file_checksum(backup_path)
+
+def test_list_backups_reads_catalog_only(manager, monkeypatch):
+    """記録済みのバックアップは一覧の表示でファイルを開かないことを確認"""
+    manager.create_backup(manager.backup_dir / 'first.db')
+
+    def fail(*args, **kwargs):
+        raise AssertionError('backup file opened')
+    monkeypatch.setattr('backup_catalog.describe_backup', fail)
+    entries = manager.list_backups()
+    assert [Path(entry.path).name for entry in entries] == ['first.db']
+
+def test_refresh_follows_directory(manager):
+    """削除されたバックアップは消え、手で置いたバックアップは追加されることを確認"""
+    first = manager.backup_dir / 'first.db'
+    manager.create_backup(first)
+    copied = manager.backup_dir / 'copied.db'
+    shutil.copy(first, copied)
+    first.unlink()
+
+    entries = manager.list_backups()
+    assert [Path(entry.path).name for entry in entries] == ['copied.db']
+    assert entries[0].record_count == 2
+    assert entries[0].checksum is None
+    # 索引自体は一覧に出ない
+    assert (manager.backup_dir / CATALOG_FILE).exists()
+
+def test_describe_rejects_non_database(temp_dir):
+    """データベースでないファイルの要約はエラーになることを確認"""
+    path = Path(temp_dir) / 'notes.db'
+    path.write_text('not a database')
+    with pytest.raises(sqlite3.DatabaseError):
+        describe_backup(path)
@@ -0,0 +1,244 @@
+import csv
+import sqlite3
+from pathlib import Path
+import pytest
+from peewee import SqliteDatabase
+import change_log
+from backup_catalog import BackupCatalog
+from backup_manager import BackupManager, file_checksum
+from database import MeditationRecord, SCHEMA_VERSION
+from day_buckets import day_buckets
+from i18n import i18n
+from job_runner import JobCancelled
+from settings import settings
+from streak_engine import streak_engine
+
+@pytest.fixture
+def isolated_settings(temp_dir, monkeypatch):
+    """設定の変更をアプリの設定ファイルに書き込まないようにする"""
+    monkeypatch.setattr(settings, 'settings_file', Path(temp_dir) / 'settings.json')
+    monkeypatch.setattr(settings, '_settings', dict(settings._settings))
+    yield settings
+    settings.flush()
+
+@pytest.fixture
+def manager(temp_dir, isolated_settings):
+    """瞑想記録のテーブルと変更ログを持つ一時データベースのBackupManager"""
+    db_path = Path(temp_dir) / 'meditation.db'
+    database = SqliteDatabase(str(db_path))
+    with database.bind_ctx([MeditationRecord]):
+        database.create_tables([MeditationRecord])
+    database.close()
+    with sqlite3.connect(db_path) as conn:
+        change_log.install(conn)
+    return BackupManager(db_path=db_path, backup_dir=Path(temp_dir) / 'backups')
+
+def _insert(db_path, *starts):
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany(
+            "INSERT INTO meditationrecord (date, start_time, end_time, duration, card_name, notes, created_at, updated_at) "
+            "VALUES (?, ?, ?, 10, '地の地', 'メモ', ?, ?)",
+            [(start[:10], start, start[:11] + '07:10:00', start, start) for start in starts]
+        )
+
+def _read_rows(paths):
+    rows = []
+    for path in paths:
+        with open(path, newline='', encoding='utf-8') as f:
+            rows.extend(csv.DictReader(f))
+    return rows
+
+def test_incremental_export_writes_only_changes(manager, temp_dir):
+    """2回目以降の差分エクスポートが変更と削除だけを書き出すことを確認"""
+    export_dir = Path(temp_dir) / 'export'
+    _insert(manager.db_path, '2024-01-01 07:00:00', '2024-01-02 07:00:00', '2024-01-03 07:00:00')
+
+    success, _ = manager.export_csv_incremental(export_dir, chunk_rows=2)
+    assert success
+    first = sorted(export_dir.glob('meditation_changes_*.csv'))
+    assert len(first) == 2
+    assert len(_read_rows(first)) == 3
+
+    # 変更がなければファイルは増えない
+    assert manager.export_csv_incremental(export_dir)[0]
+    assert sorted(export_dir.glob('*.csv')) == first
+
+    _insert(manager.db_path, '2024-01-04 07:00:00')
+    with sqlite3.connect(manager.db_path) as conn:
+        conn.execute("UPDATE meditationrecord SET notes = '更新' WHERE start_time = '2024-01-01 07:00:00'")
+        conn.execute("DELETE FROM meditationrecord WHERE start_time = '2024-01-02 07:00:00'")
+
+    for path in first:
+        path.unlink()
+    success, _ = manager.export_csv_incremental(export_dir, date_format='yyyy/mm/dd')
+    assert success
+    changes = _read_rows(export_dir.glob('meditation_changes_*.csv'))
+    assert sorted((row['Date'], row['Notes']) for row in changes) == [('2024/01/01', '更新'), ('2024/01/04', 'メモ')]
+    deletions = _read_rows(export_dir.glob('meditation_deletions_*.csv'))
+    assert [row['Start Time'] for row in deletions] == ['2024-01-02 07:00:00']
+    assert not list(export_dir.glob('*.part'))
+
+def test_incremental_export_restarts_after_restore(manager, temp_dir):
+    """基準が変更ログより先にある場合は全件を出し直すことを確認"""
+    _insert(manager.db_path, '2024-01-01 07:00:00')
+    with sqlite3.connect(manager.db_path) as conn:
+        change_log.advance_consumer(conn, 'export.csv', 100)
+
+    assert manager.export_csv_incremental(Path(temp_dir) / 'export')[0]
+    assert len(_read_rows((Path(temp_dir) / 'export').glob('meditation_changes_*.csv'))) == 1
+    with sqlite3.connect(manager.db_path) as conn:
+        assert change_log.consumer_cursor(conn, 'export.csv') == 1
+
+def test_incremental_export_migrates_settings_mark(manager, temp_dir, isolated_settings, monkeypatch):
+    """以前の版が設定に保存した基準から続けることを確認"""
+    _insert(manager.db_path, '2024-01-01 07:00:00', '2024-01-02 07:00:00')
+    monkeypatch.setattr(type(isolated_settings), 'export_mark', 1)
+
+    assert manager.export_csv_incremental(Path(temp_dir) / 'export')[0]
+    rows = _read_rows((Path(temp_dir) / 'export').glob('meditation_changes_*.csv'))
+    assert [row['Date'] for row in rows] == ['2024-01-02']
+    # 以後は変更ログの基準だけを使う
+    with sqlite3.connect(manager.db_path) as conn:
+        assert change_log.consumer_cursor(conn, 'export.csv') == 2
+
+def test_backup_records_checksum_and_verifies(manager, temp_dir):
+    """バックアップにチェックサムが記録され、検証に通ることを確認"""
+    _insert(manager.db_path, '2024-01-01 07:00:00')
+    backup_path = Path(temp_dir) / 'backup.db'
+    assert manager.create_backup(backup_path)[0]
+    assert manager.recorded_checksum(backup_path) == file_checksum(backup_path)
+    assert not list(Path(temp_dir).glob('*.tmp'))
+    assert manager.verify_backup(backup_path)[0]
+
+def test_verify_rejects_invalid_backups(manager, temp_dir):
+    """壊れた・別物のファイルや新しいスキーマのバックアップを拒否することを確認"""
+    text_file = Path(temp_dir) / 'notes.db'
+    text_file.write_text('not a database')
+    assert not manager.verify_backup(text_file)[0]
+
+    backup_path = Path(temp_dir) / 'backup.db'
+    manager.create_backup(backup_path)
+    with open(backup_path, 'r+b') as f:
+        f.seek(200)
+        f.write(b'tampered')
+    assert manager.verify_backup(backup_path) == (False, i18n.get('backup.verify_checksum_mismatch'))
+
+    newer = Path(temp_dir) / 'newer.db'
+    manager.create_backup(newer)
+    with sqlite3.connect(newer) as conn:
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION + 1}')
+    newer.with_name(newer.name + '.sha256').unlink()
+    BackupCatalog(newer.parent).remove(newer)
+    assert manager.verify_backup(newer) == (False, i18n.get('backup.verify_schema_mismatch'))
+
+    other = Path(temp_dir) / 'other.db'
+    with sqlite3.connect(other) as conn:
+        conn.execute('CREATE TABLE other (id INTEGER)')
+    assert not manager.verify_backup(other)[0]
+
+def test_restore_replaces_contents_in_place(manager, temp_dir):
+    """復元で内容が置き換わり、開いている接続からも見えることを確認"""
+    _insert(manager.db_path, '2024-01-01 07:00:00')
+    backup_path = Path(temp_dir) / 'backup.db'
+    manager.create_backup(backup_path)
+    _insert(manager.db_path, '2024-01-02 07:00:00', '2024-01-03 07:00:00')
+
+    live = sqlite3.connect(manager.db_path)
+    assert live.execute('SELECT COUNT(*) FROM meditationrecord').fetchone()[0] == 3
+    assert manager.restore_backup(backup_path)[0]
+    assert live.execute('SELECT COUNT(*) FROM meditationrecord').fetchone()[0] == 1
+    live.close()
+    assert not list(Path(temp_dir).glob('meditation.db.*'))
+
+def test_restore_installs_change_log(manager, temp_dir, monkeypatch):
+    """変更ログのない以前のバックアップを復元しても変更が記録され、集計が読み直されることを確認"""
+    old_path = Path(temp_dir) / 'old.db'
+    database = SqliteDatabase(str(old_path))
+    with database.bind_ctx([MeditationRecord]):
+        database.create_tables([MeditationRecord])
+    database.close()
+    _insert(old_path, '2023-01-01 07:00:00', '2023-01-02 07:00:00')
+    monkeypatch.setattr(day_buckets, 'cursor', 100)
+    monkeypatch.setattr(streak_engine, 'cursor', 100)
+
+    assert manager.restore_backup(old_path)[0]
+    with sqlite3.connect(manager.db_path) as conn:
+        assert change_log.latest_seq(conn) == 2
+        _insert(manager.db_path, '2024-01-01 07:00:00')
+        changes, _ = change_log.changes_since(conn, 2)
+        assert [change['record']['start_time'] for change in changes] == ['2024-01-01 07:00:00']
+    assert not day_buckets.loaded and not streak_engine.loaded
+
+def test_restore_refuses_invalid_backup(manager, temp_dir):
+    """検証に失敗したバックアップでは現在のデータベースを変更しないことを確認"""
+    _insert(manager.db_path, '2024-01-01 07:00:00')
+    broken = Path(temp_dir) / 'broken.db'
+    broken.write_bytes(b'SQLite format 3\x00' + b'\x00' * 100)
+    assert not manager.restore_backup(broken)[0]
+    with sqlite3.connect(manager.db_path) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM meditationrecord').fetchone()[0] == 1
+
+def test_export_reports_progress_and_cancels(manager, temp_dir):
+    """エクスポートの進捗が通知され、中断すると書きかけのファイルが消えることを確認"""
+    _insert(manager.db_path, '2024-01-01 07:00:00', '2024-01-02 07:00:00')
+    export_path = Path(temp_dir) / 'records.csv'
+    reported = []
+    assert manager.export_csv(export_path, progress=lambda done, total: reported.append((done, total)))[0]
+    assert reported == [(2, 2)]
+
+    def cancel(done, total):
+        raise JobCancelled()
+    with pytest.raises(JobCancelled):
+        manager.export_csv(export_path, progress=cancel)
+    assert not export_path.exists()
+
+def test_cancelled_import_adds_nothing(manager, temp_dir):
+    """取り消したインポートでは記録が1件も追加されないことを確認"""
+    _insert(manager.db_path, '2024-01-01 07:00:00')
+    export_path = Path(temp_dir) / 'records.csv'
+    manager.export_csv(export_path)
+
+    def cancel(done, total):
+        if total:
+            raise JobCancelled()
+    with pytest.raises(JobCancelled):
+        manager.import_csv(export_path, progress=cancel)
+    with sqlite3.connect(manager.db_path) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM meditationrecord').fetchone()[0] == 1
+
+def test_cancelled_restore_keeps_database(manager, temp_dir):
+    """取り消した復元では現在のデータベースが変わらないことを確認"""
+    # 1ステップで終わらない大きさにする
+    _insert(manager.db_path, *[f'2023-01-01 07:{i // 60:02d}:{i % 60:02d}' for i in range(600)])
+    with sqlite3.connect(manager.db_path) as conn:
+        conn.execute("UPDATE meditationrecord SET notes = printf('%.3000c', 'x')")
+    backup_path = Path(temp_dir) / 'backup.db'
+    reported = []
+    assert manager.create_backup(backup_path, progress=lambda done, total: reported.append(total))[0]
+    assert reported
+    with sqlite3.connect(manager.db_path) as conn:
+        conn.execute('DELETE FROM meditationrecord')
+
+    def cancel(done, total):
+        raise JobCancelled()
+    with pytest.raises(JobCancelled):
+        manager.restore_backup(backup_path, progress=cancel)
+    with sqlite3.connect(manager.db_path) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM meditationrecord').fetchone()[0] == 0
+
+def test_parallel_import_writes_rejected_report(manager, temp_dir):
+    """並列インポートが取り込めなかった行の一覧を書くことを確認"""
+    _insert(manager.db_path, '2024-01-01 07:00:00', '2024-01-02 07:00:00')
+    export_path = Path(temp_dir) / 'records.csv'
+    manager.export_csv(export_path)
+    with open(export_path, 'a', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerow([9, '2024-13-01', '07:00:00', '07:10:00', 10, '地の地', ''])
+
+    success, message = manager.import_csv_parallel(export_path, workers=1)
+    assert success
+    assert i18n.get('csv.import_report').format(inserted=2, rejected=1) in message
+    with open(Path(temp_dir) / 'records.rejected.csv', newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ['Line', 'Error'] and rows[1][0] == '4'
+    with sqlite3.connect(manager.db_path) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM meditationrecord').fetchone()[0] == 4
@@ -0,0 +1,57 @@
+import os
+import shutil
+import pytest
+from pathlib import Path
+from card_catalog import load_catalog, parse_tattva_csv, NO_INTERPRETATION
+
+REPO_CSV = Path(__file__).parent.parent.parent / 'tattva.csv'
+
+@pytest.fixture
+def csv_path(temp_dir):
+    path = Path(temp_dir) / 'tattva.csv'
+    shutil.copy(REPO_CSV, path)
+    return path
+
+@pytest.fixture
+def cache_file(temp_dir):
+    return Path(temp_dir) / 'cache' / 'tattva.catalog'
+
+def test_parse_bundled_csv():
+    """同梱のtattva.csvから25枚のカードが読み込まれることのテスト"""
+    cards = parse_tattva_csv(REPO_CSV, Path('images'))
+    assert len(cards) == 25
+    assert cards[0].name == '空の空'
+    assert cards[0].image_path == os.path.join('images', 'akasha_akasha.png')
+    assert cards[0].positive
+
+def test_catalog_lookup(csv_path, cache_file):
+    """カード名での検索テスト"""
+    catalog = load_catalog(csv_path, Path('images'), cache_file)
+    assert len(catalog) == 25
+    assert '地の地' in catalog
+    assert catalog.get('地の地').image_file == 'prithvi_prithvi.png'
+    assert catalog.get('存在しない') is None
+
+def test_cached_catalog_skips_parsing(csv_path, cache_file, monkeypatch):
+    """キャッシュがある場合はCSVを解析しないことのテスト"""
+    first = load_catalog(csv_path, Path('images'), cache_file)
+    assert cache_file.exists()
+
+    monkeypatch.setattr('card_catalog.parse_tattva_csv', lambda *args: pytest.fail('CSV was parsed'))
+    second = load_catalog(csv_path, Path('images'), cache_file)
+    assert second.names() == first.names()
+
+    # 内容が同じなら更新日時が変わってもキャッシュを使う
+    mtime = os.path.getmtime(csv_path) + 10
+    os.utime(csv_path, (mtime, mtime))
+    assert load_catalog(csv_path, Path('images'), cache_file).names() == first.names()
+
+def test_cache_invalidated_on_content_change(csv_path, cache_file):
+    """CSVの内容が変わった場合に作り直されることのテスト"""
+    load_catalog(csv_path, Path('images'), cache_file)
+    with open(csv_path, 'a', encoding='utf-8') as f:
+        f.write('\nテスト,テストの札,a,b,a_b.png,,\n')
+
+    catalog = load_catalog(csv_path, Path('images'), cache_file)
+    assert len(catalog) == 26
+    assert catalog.get('テストの札').positive == NO_INTERPRETATION
@@ -0,0 +1,101 @@
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from peewee import SqliteDatabase
+import change_log
+from database import MeditationRecord
+
+def _create_db(db_path):
+    """瞑想記録のテーブルと変更ログを持つデータベースを作る"""
+    database = SqliteDatabase(str(db_path))
+    with database.bind_ctx([MeditationRecord]):
+        database.create_tables([MeditationRecord])
+    database.close()
+    conn = sqlite3.connect(str(db_path), isolation_level=None)
+    change_log.install(conn)
+    return conn
+
+def _insert(conn, start, updated='2024-01-01 10:00:00'):
+    conn.execute(
+        "INSERT INTO meditationrecord (date, start_time, end_time, duration, card_name, notes, created_at, updated_at) "
+        "VALUES (?, ?, ?, 10, '地の地', '', ?, ?)",
+        (start[:10], start, start, updated, updated)
+    )
+
+def test_install_seeds_existing_records(temp_dir):
+    """既存の記録が追加として変更ログに載ることを確認"""
+    db_path = Path(temp_dir) / 'test.db'
+    database = SqliteDatabase(str(db_path))
+    with database.bind_ctx([MeditationRecord]):
+        database.create_tables([MeditationRecord])
+        now = datetime.now()
+        MeditationRecord.create(date=now.date(), start_time=now, end_time=now, duration=5,
+                                card_name='水の水', notes='')
+    database.close()
+
+    conn = sqlite3.connect(str(db_path), isolation_level=None)
+    change_log.install(conn)
+    change_log.install(conn)
+    changes, cursor = change_log.changes_since(conn, 0)
+    assert [change['op'] for change in changes] == ['upsert']
+    assert cursor == 1
+    conn.close()
+
+def test_bulk_update_touches_updated_at(temp_dir):
+    """save() を通らない一括更新でも updated_at が進むことを確認"""
+    db_path = Path(temp_dir) / 'test.db'
+    conn = _create_db(db_path)
+    _insert(conn, '2024-01-01 07:00:00')
+    _insert(conn, '2024-01-02 07:00:00')
+
+    database = SqliteDatabase(str(db_path))
+    with database.bind_ctx([MeditationRecord]):
+        MeditationRecord.update(notes='bulk').execute()
+        MeditationRecord.update(notes='explicit', updated_at='2030-01-01 00:00:00').where(
+            MeditationRecord.start_time == '2024-01-02 07:00:00').execute()
+    database.close()
+
+    rows = conn.execute('SELECT notes, updated_at FROM meditationrecord ORDER BY id').fetchall()
+    assert rows[0][0] == 'bulk' and rows[0][1] > '2024-01-01 10:00:00'
+    # updated_at を明示した更新はそのまま残る
+    assert rows[1] == ('explicit', '2030-01-01 00:00:00')
+    conn.close()
+
+def test_consumer_reads_deltas_and_tombstones(temp_dir):
+    """処理する側が前回以降の差分だけを読めることを確認"""
+    conn = _create_db(Path(temp_dir) / 'test.db')
+    _insert(conn, '2024-01-01 07:00:00')
+    _insert(conn, '2024-01-02 07:00:00')
+
+    batches = list(change_log.read_consumer(conn, 'export', limit=1))
+    assert [len(changes) for changes, _ in batches] == [1, 1]
+    change_log.advance_consumer(conn, 'export', batches[-1][1])
+    assert list(change_log.read_consumer(conn, 'export')) == []
+
+    conn.execute("DELETE FROM meditationrecord WHERE start_time = '2024-01-01 07:00:00'")
+    (changes, cursor), = change_log.read_consumer(conn, 'export')
+    assert changes[0]['op'] == 'delete'
+    assert changes[0]['start_time'] == '2024-01-01 07:00:00'
+    change_log.advance_consumer(conn, 'export', cursor)
+    assert change_log.consumer_cursor(conn, 'export') == cursor
+    conn.close()
+
+def test_compact_keeps_latest_state(temp_dir):
+    """圧縮しても差分の結果が変わらず、読み終えた墓標だけが消えることを確認"""
+    conn = _create_db(Path(temp_dir) / 'test.db')
+    _insert(conn, '2024-01-01 07:00:00')
+    _insert(conn, '2024-01-02 07:00:00')
+    for notes in ('a', 'b', 'c'):
+        conn.execute('UPDATE meditationrecord SET notes = ?', (notes,))
+    conn.execute("DELETE FROM meditationrecord WHERE start_time = '2024-01-02 07:00:00'")
+    before = change_log.changes_since(conn, 0)
+
+    removed = change_log.compact(conn)
+    assert removed == 7
+    assert change_log.changes_since(conn, 0) == before
+
+    # 処理する側が読み終えた墓標は削除される
+    change_log.advance_consumer(conn, 'export', change_log.latest_seq(conn))
+    assert change_log.compact(conn) == 1
+    assert conn.execute('SELECT COUNT(*) FROM record_change').fetchone()[0] == 1
+    conn.close()
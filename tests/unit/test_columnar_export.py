@@ -0,0 +1,86 @@
+import sqlite3
+from pathlib import Path
+import numpy as np
+import pytest
+from peewee import SqliteDatabase
+from columnar_export import (HAS_PYARROW, decode_strings, encode_strings, export_columnar,
+                             load_npz, read_columns, resolve_format)
+from database import MeditationRecord
+
+@pytest.fixture
+def db_path(temp_dir):
+    """3件の記録を持つ一時データベース"""
+    path = Path(temp_dir) / 'meditation.db'
+    database = SqliteDatabase(str(path))
+    with database.bind_ctx([MeditationRecord]):
+        database.create_tables([MeditationRecord])
+    database.close()
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "INSERT INTO meditationrecord (date, start_time, end_time, duration, card_name, notes, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                ('2024-01-01', '2024-01-01 07:00:00', '2024-01-01 07:10:00', 10, '地の地', '平和', '2024-01-01 07:10:00.123456', '2024-01-01 07:10:00.123456'),
+                ('2024-01-02', '2024-01-02 07:00:00', '2024-01-02 07:20:00', 20, '水の水', '', '2024-01-02 07:20:00', '2024-01-02 07:20:00'),
+                ('2024-01-03', '2024-01-03 23:50:00', '2024-01-04 00:05:00', 15, '地の地', 'note, "quoted"', '2024-01-04 00:05:00', '2024-01-04 00:05:00'),
+            ]
+        )
+    return path
+
+def test_string_table_roundtrip():
+    """文字列表が元の文字列に戻ることを確認"""
+    values = ['', '瞑想', 'abc', '']
+    data, offsets = encode_strings(values)
+    assert data.dtype == np.uint8
+    assert decode_strings(data, offsets).tolist() == values
+
+def test_read_columns_are_typed(db_path):
+    """列が型付きで読み込まれることを確認"""
+    columns = read_columns(db_path)
+    assert columns['start_time'].dtype == np.dtype('datetime64[s]')
+    assert columns['start_time'][2] == np.datetime64('2024-01-03T23:50:00')
+    assert columns['date'][0] == np.datetime64('2024-01-01')
+    assert columns['updated_at'][0] == np.datetime64('2024-01-01T07:10:00.123')
+    assert columns['duration'].tolist() == [10, 20, 15]
+    assert columns['card_names'][columns['card_code']].tolist() == ['地の地', '水の水', '地の地']
+
+def test_npz_export_roundtrip(db_path, temp_dir):
+    """.npz に書き出した内容が pickle なしで読み戻せることを確認"""
+    path = Path(temp_dir) / 'records.npz'
+    count, used_format = export_columnar(db_path, path, 'npz')
+    assert (count, used_format) == (3, 'npz')
+    assert not Path(f'{path}.tmp').exists()
+
+    columns = load_npz(path)
+    assert columns['notes'].tolist() == ['平和', '', 'note, "quoted"']
+    assert columns['card_name'].tolist() == ['地の地', '水の水', '地の地']
+    assert (columns['end_time'] - columns['start_time']).astype(int).tolist() == [600, 1200, 900]
+
+def test_empty_database_exports(temp_dir):
+    """記録がなくても書き出せることを確認"""
+    path = Path(temp_dir) / 'empty.db'
+    database = SqliteDatabase(str(path))
+    with database.bind_ctx([MeditationRecord]):
+        database.create_tables([MeditationRecord])
+    database.close()
+    export_columnar(path, Path(temp_dir) / 'empty.npz')
+    assert len(load_npz(Path(temp_dir) / 'empty.npz')['id']) == 0
+
+def test_resolve_format():
+    """拡張子と pyarrow の有無から形式が決まることを確認"""
+    assert resolve_format(Path('a.npz')) == 'npz'
+    assert resolve_format(Path('a.bin')) == ('parquet' if HAS_PYARROW else 'npz')
+    with pytest.raises(ValueError):
+        resolve_format(Path('a.npz'), 'xlsx')
+    if not HAS_PYARROW:
+        with pytest.raises(ImportError):
+            resolve_format(Path('a.parquet'))
+
+@pytest.mark.skipif(not HAS_PYARROW, reason='pyarrow is not installed')
+def test_parquet_export(db_path, temp_dir):
+    """Parquet に書き出した内容を pandas で読めることを確認"""
+    import pandas as pd
+    path = Path(temp_dir) / 'records.parquet'
+    assert export_columnar(db_path, path) == (3, 'parquet')
+    frame = pd.read_parquet(path)
+    assert frame['card_name'].tolist() == ['地の地', '水の水', '地の地']
@@ -0,0 +1,100 @@
+import sqlite3
+from datetime import date, timedelta
+from pathlib import Path
+import numpy as np
+import pytest
+from peewee import SqliteDatabase
+import change_log
+from archive import ArchiveManager
+from database import MeditationRecord
+from day_buckets import DayBuckets
+
+def _day(text):
+    return date.fromisoformat(text).toordinal()
+
+@pytest.fixture
+def database(temp_dir):
+    """変更ログ付きの一時データベース"""
+    db_path = Path(temp_dir) / 'meditation.db'
+    database = SqliteDatabase(str(db_path))
+    with database.bind_ctx([MeditationRecord]):
+        database.create_tables([MeditationRecord])
+        change_log.install(database.connection())
+        yield database
+    database.close()
+
+def _insert(conn, *sessions):
+    conn.executemany(
+        "INSERT INTO meditationrecord (date, start_time, end_time, duration, card_name, notes, created_at, updated_at) "
+        "VALUES (?, ?, ?, ?, '地の地', '', ?, ?)",
+        [(start[:10], start, start, duration, start, start) for start, duration in sessions]
+    )
+
+def test_load_and_range():
+    """日ごとの合計と、配列の外の日が0になることを確認"""
+    buckets = DayBuckets()
+    buckets.load([_day('2024-01-01'), _day('2024-01-01'), _day('2024-01-03')], [10, 5, 20])
+    assert buckets.range(_day('2023-12-31'), _day('2024-01-03')).tolist() == [0, 15, 0, 20]
+    assert buckets.range(_day('1990-01-01'), _day('1990-01-02')).tolist() == [0, 0]
+    assert buckets.first_day() == _day('2024-01-01')
+
+    # 配列の外への追加で広がる
+    buckets.add(_day('2030-06-01'), 30)
+    assert buckets.range(_day('2030-06-01'), _day('2030-06-01')).tolist() == [30]
+    assert buckets.range(_day('2024-01-01'), _day('2024-01-01')).tolist() == [15]
+
+def test_levels():
+    """瞑想した日の時間の四分位で段階が決まることを確認"""
+    buckets = DayBuckets()
+    buckets.load([_day('2024-01-01') + i for i in range(8)], [5, 10, 15, 20, 25, 30, 35, 40])
+    levels = buckets.levels(np.array([0, 5, 10, 20, 30, 40]))
+    assert levels[0] == 0
+    assert list(levels[1:]) == sorted(levels[1:])
+    assert levels[1] == 1 and levels[-1] == 4
+
+def test_refresh_applies_changes(database, temp_dir):
+    """追加・変更・削除した記録の日だけが更新されることを確認"""
+    conn = database.connection()
+    _insert(conn, ('2024-01-01 07:00:00', 10), ('2024-01-02 07:00:00', 20))
+    buckets = DayBuckets(database, ArchiveManager(Path(temp_dir) / 'meditation.db'))
+    assert buckets.refresh()
+    assert not buckets.refresh()
+    first, last = _day('2024-01-01'), _day('2024-01-03')
+    assert buckets.range(first, last).tolist() == [10, 20, 0]
+
+    _insert(conn, ('2024-01-03 07:00:00', 5))
+    conn.execute("UPDATE meditationrecord SET duration = 15 WHERE id = 1")
+    conn.execute('DELETE FROM meditationrecord WHERE id = 2')
+    version = buckets.version
+    assert buckets.refresh()
+    assert buckets.version > version
+    assert buckets.range(first, last).tolist() == [15, 0, 5]
+    # 読み込み位置が変更ログに登録され、未読の墓標が圧縮で消されない
+    assert change_log.consumer_cursor(conn, 'heatmap') == buckets.cursor == change_log.latest_seq(conn)
+
+def test_reload_includes_archives(database, temp_dir):
+    """アーカイブに移した記録も含まれることを確認"""
+    conn = database.connection()
+    old = (date.today() - timedelta(days=400)).strftime('%Y-%m-%d 07:00:00')
+    _insert(conn, (old, 25))
+    archives = ArchiveManager(Path(temp_dir) / 'meditation.db')
+    archives.archive_old_sessions(older_than_days=30)
+    buckets = DayBuckets(database, archives)
+    buckets.reload()
+    day = _day(old[:10])
+    assert buckets.range(day, day).tolist() == [25]
+
+def test_refresh_without_change_log(temp_dir):
+    """変更ログのないデータベースでは毎回全体を読み込むことを確認"""
+    database = SqliteDatabase(str(Path(temp_dir) / 'meditation.db'))
+    with database.bind_ctx([MeditationRecord]):
+        database.create_tables([MeditationRecord])
+        conn = database.connection()
+        _insert(conn, ('2024-01-01 07:00:00', 10))
+        buckets = DayBuckets(database, ArchiveManager(Path(temp_dir) / 'meditation.db'))
+        assert buckets.refresh()
+        assert not buckets.loaded
+        _insert(conn, ('2024-01-01 08:00:00', 5))
+        assert buckets.refresh()
+        assert buckets.range(_day('2024-01-01'), _day('2024-01-01')).tolist() == [15]
+    database.close()
@@ -0,0 +1,109 @@
+import sqlite3
+import time
+import pytest
+from datetime import datetime, timedelta
+from pathlib import Path
+from archive import ArchiveManager
+from database import MeditationRecord, db
+from db_merge import merge_database, session_hash, RECORD_TABLE
+from tests.performance.data_generator import generate_batches
+
+def _create_db(path, rows):
+    db.init(str(path))
+    db.create_tables([MeditationRecord])
+    with db.atomic():
+        for i in range(0, len(rows), 500):
+            MeditationRecord.insert_many(rows[i:i + 500]).execute()
+    db.close()
+
+def _session(start, card='地の地', notes='', updated_at=None):
+    return {
+        'date': start, 'start_time': start, 'end_time': start + timedelta(minutes=10),
+        'duration': 10, 'card_name': card, 'notes': notes,
+        'created_at': start, 'updated_at': updated_at or start,
+    }
+
+def _rows(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute(f'SELECT start_time, card_name, notes FROM {RECORD_TABLE} ORDER BY start_time').fetchall()
+
+def test_session_hash_is_stable():
+    """日時の表記の違いに依存しないハッシュのテスト"""
+    start = datetime(2025, 1, 1, 7, 0, 0)
+    end = start + timedelta(minutes=10)
+    assert session_hash(start, end, '空の空') == session_hash('2025-01-01T07:00:00.000000', str(end), '空の空')
+    assert session_hash(start, end, '空の空') != session_hash(start, end, '空の風')
+
+def test_merge_inserts_missing_sessions(temp_dir):
+    """存在しないセッションだけが追加されることのテスト"""
+    base = datetime(2025, 1, 1, 7, 0)
+    target, source = Path(temp_dir) / 'a.db', Path(temp_dir) / 'b.db'
+    _create_db(target, [_session(base), _session(base + timedelta(days=1))])
+    _create_db(source, [_session(base), _session(base + timedelta(days=2)), _session(base + timedelta(days=2))])
+
+    result = merge_database(source, target)
+
+    assert (result.inserted, result.updated, result.skipped) == (1, 0, 2)
+    assert len(_rows(target)) == 3
+    # 2回目は何も追加されない
+    assert merge_database(source, target).inserted == 0
+
+def test_merge_resolves_note_conflicts(temp_dir):
+    """メモの競合が updated_at の新しい方で解決されることのテスト"""
+    base = datetime(2025, 1, 1, 7, 0)
+    target, source = Path(temp_dir) / 'a.db', Path(temp_dir) / 'b.db'
+    _create_db(target, [
+        _session(base, notes='古いメモ', updated_at=base),
+        _session(base + timedelta(days=1), notes='新しいメモ', updated_at=base + timedelta(days=5)),
+    ])
+    _create_db(source, [
+        _session(base, notes='新しいメモ', updated_at=base + timedelta(days=3)),
+        _session(base + timedelta(days=1), notes='古いメモ', updated_at=base + timedelta(days=2)),
+    ])
+
+    result = merge_database(source, target)
+
+    assert (result.inserted, result.updated, result.skipped) == (0, 1, 1)
+    assert [notes for _, _, notes in _rows(target)] == ['新しいメモ', '新しいメモ']
+
+def test_merge_skips_archived_sessions(temp_dir):
+    """アーカイブに移したセッションが重複して追加されないことのテスト"""
+    old = datetime(2021, 3, 1, 7, 0)
+    recent = datetime.now().replace(microsecond=0) - timedelta(days=1)
+    target, source = Path(temp_dir) / 'a.db', Path(temp_dir) / 'b.db'
+    _create_db(target, [_session(old), _session(recent)])
+    _create_db(source, [_session(old, notes='別の端末', updated_at=recent), _session(recent)])
+    assert ArchiveManager(target).archive_old_sessions(older_than_days=30) == {2021: 1}
+
+    result = merge_database(source, target)
+
+    assert (result.inserted, result.updated, result.skipped) == (0, 0, 2)
+    assert len(_rows(target)) == 1
+
+def test_merge_rejects_invalid_source(temp_dir):
+    """瞑想記録テーブルがないファイルはエラーになり、変更されないことのテスト"""
+    target, source = Path(temp_dir) / 'a.db', Path(temp_dir) / 'other.db'
+    _create_db(target, [_session(datetime(2025, 1, 1))])
+    sqlite3.connect(source).execute('CREATE TABLE other (id INTEGER)').connection.close()
+
+    with pytest.raises(sqlite3.DatabaseError):
+        merge_database(source, target)
+    with pytest.raises(FileNotFoundError):
+        merge_database(Path(temp_dir) / 'missing.db', target)
+    assert len(_rows(target)) == 1
+
+def test_merge_large_histories(temp_dir):
+    """大量の記録が集合演算で短時間にマージされることのテスト"""
+    rows = [row for batch in generate_batches(40_000) for row in batch]
+    target, source = Path(temp_dir) / 'a.db', Path(temp_dir) / 'b.db'
+    _create_db(target, rows[:30_000])
+    _create_db(source, rows[10_000:])
+
+    start = time.perf_counter()
+    result = merge_database(source, target)
+    elapsed = time.perf_counter() - start
+
+    assert result.inserted == 10_000
+    assert result.skipped == 20_000
+    assert len(_rows(target)) == 40_000
+    assert elapsed < 5.0, f'Merge took {elapsed:.2f}s'
@@ -0,0 +1,91 @@
+import shutil
+import pytest
+from pathlib import Path
+from PIL import Image
+from deck_loader import discover_decks, load_deck_catalog, ThumbnailCache, Deck, DEFAULT_DECK
+
+@pytest.fixture
+def deck_dirs(temp_dir, test_image_path):
+    """標準デッキと2つのユーザーデッキを作成する"""
+    root = Path(temp_dir)
+    default_dir = root / 'images'
+    default_dir.mkdir()
+    shutil.copy(test_image_path, default_dir / 'prithvi_prithvi.png')
+
+    decks_dir = root / 'decks'
+    large = decks_dir / 'large'
+    large.mkdir(parents=True)
+    for i in range(3):
+        Image.new('RGB', (1200, 1600), (i * 40, 80, 120)).save(large / f'card_{i}.jpg')
+    (large / 'notes.txt').write_text('ignored')
+    (decks_dir / 'empty').mkdir()
+    return default_dir, decks_dir
+
+def test_discover_decks(deck_dirs):
+    """ディレクトリ単位でデッキが検出されることのテスト"""
+    default_dir, decks_dir = deck_dirs
+    decks = discover_decks(decks_dir, default_dir)
+
+    assert list(decks) == [DEFAULT_DECK, 'large']
+    assert [p.name for p in decks['large'].images] == ['card_0.jpg', 'card_1.jpg', 'card_2.jpg']
+
+def test_generate_thumbnails(deck_dirs, temp_dir):
+    """各サイズのサムネイルが生成されることのテスト"""
+    _, decks_dir = deck_dirs
+    cache = ThumbnailCache(Path(temp_dir) / 'thumbs', sizes=(64, 300), max_workers=2)
+    deck = Deck('large', decks_dir / 'large')
+
+    assert cache.lookup(deck.images[0], 300) is None
+    assert cache.generate_deck(deck) == {}
+
+    for image in deck.images:
+        small = cache.lookup(image, 64)
+        large = cache.lookup(image, 300)
+        with Image.open(small) as thumb:
+            assert max(thumb.size) == 64
+        with Image.open(large) as thumb:
+            assert thumb.size == (225, 300)
+
+def test_thumbnails_shared_by_content(deck_dirs, temp_dir):
+    """同じ内容の画像がキャッシュを共有することのテスト"""
+    _, decks_dir = deck_dirs
+    source = decks_dir / 'large' / 'card_0.jpg'
+    copy = decks_dir / 'large' / 'card_copy.jpg'
+    shutil.copy(source, copy)
+    cache = ThumbnailCache(Path(temp_dir) / 'thumbs', sizes=(64,), max_workers=1)
+
+    cache.generate([source, copy])
+    assert cache.lookup(copy, 64) == cache.lookup(source, 64)
+    assert len(list((Path(temp_dir) / 'thumbs').rglob('*.png'))) == 1
+
+def test_lookup_does_not_read_new_images(deck_dirs, temp_dir):
+    """索引にない画像はlookupで読まずに未生成として扱うことのテスト"""
+    _, decks_dir = deck_dirs
+    source = decks_dir / 'large' / 'card_0.jpg'
+    copy = decks_dir / 'large' / 'card_copy.jpg'
+    cache = ThumbnailCache(Path(temp_dir) / 'thumbs', sizes=(64,), max_workers=1)
+    cache.generate([source])
+    shutil.copy(source, copy)
+
+    # 同じ内容でも、内容ハッシュを計算するまではキャッシュを使わない
+    assert cache.lookup(copy, 64) is None
+    assert cache.cached_hash(copy) is None
+    assert cache.lookup(source, 64) is not None
+
+def test_load_deck_catalog(deck_dirs, temp_dir):
+    """tattva.csv のないデッキは画像ファイル名がカード名になることのテスト"""
+    _, decks_dir = deck_dirs
+    catalog = load_deck_catalog(Deck('large', decks_dir / 'large'), Path(temp_dir) / 'catalogs')
+
+    assert catalog.names() == ['card_0', 'card_1', 'card_2']
+    assert catalog.get('card_1').image_path == str(decks_dir / 'large' / 'card_1.jpg')
+
+def test_invalid_image_reports_error(temp_dir):
+    """デコードできない画像がエラーとして報告されることのテスト"""
+    broken = Path(temp_dir) / 'broken.png'
+    broken.write_bytes(b'not an image')
+    cache = ThumbnailCache(Path(temp_dir) / 'thumbs', sizes=(64,), max_workers=1)
+
+    errors = cache.generate([broken])
+    assert str(broken) in errors
+    assert cache.lookup(broken, 64) is None
@@ -0,0 +1,81 @@
+import json
+import os
+import pytest
+from pathlib import Path
+import i18n as i18n_module
+from i18n import I18n, flatten_translations
+from settings import Settings
+
+@pytest.fixture
+def locales(temp_dir):
+    """テスト用の言語ファイルを作成する"""
+    locales_dir = Path(temp_dir) / 'locales'
+    locales_dir.mkdir()
+    with open(locales_dir / 'ja.json', 'w', encoding='utf-8') as f:
+        json.dump({'app': {'title': 'タイトル'}, 'search_placeholder': '検索'}, f, ensure_ascii=False)
+    with open(locales_dir / 'en.json', 'w', encoding='utf-8') as f:
+        json.dump({'app': {'title': 'Title'}, 'search_placeholder': 'Search'}, f)
+    return locales_dir
+
+@pytest.fixture
+def translator(locales, temp_dir):
+    translator = I18n(locales, Path(temp_dir) / 'cache')
+    translator.set_language('ja')
+    return translator
+
+def test_flatten_translations():
+    """入れ子の辞書がドット区切りキーに変換されることのテスト"""
+    flat = flatten_translations({'a': {'b': {'c': 'x'}, 'd': 'y'}, 'e': 'z', 'n': 1})
+    assert flat == {'a.b.c': 'x', 'a.d': 'y', 'e': 'z'}
+
+def test_get_uses_active_language(translator):
+    """現在の言語での翻訳取得テスト"""
+    assert translator.get('app.title') == 'タイトル'
+    assert translator.get('app.title', 'en') == 'Title'
+    assert translator.get('missing.key') == 'missing.key'
+    assert translator.get('app') == 'app'
+
+def test_only_active_language_is_loaded(translator):
+    """現在の言語だけが先に読み込まれることのテスト"""
+    assert set(translator._catalogs) == {'ja'}
+    assert translator.available_languages() == ['en', 'ja']
+
+def test_bind_returns_lookup(translator):
+    """言語に束縛された翻訳関数のテスト"""
+    tr = translator.bind('en')
+    assert tr('search_placeholder') == 'Search'
+    assert tr('unknown') == 'unknown'
+
+def test_catalog_cache_invalidated_by_mtime(locales, temp_dir):
+    """言語ファイル更新時にキャッシュが作り直されることのテスト"""
+    cache_dir = Path(temp_dir) / 'cache'
+    I18n(locales, cache_dir).set_language('en')
+    assert (cache_dir / 'en.catalog').exists()
+
+    source = locales / 'en.json'
+    with open(source, 'w', encoding='utf-8') as f:
+        json.dump({'app': {'title': 'New Title'}}, f)
+    mtime = os.path.getmtime(source) + 10
+    os.utime(source, (mtime, mtime))
+
+    translator = I18n(locales, cache_dir)
+    assert translator.get('app.title', 'en') == 'New Title'
+
+def test_follows_settings_language_change(locales, temp_dir, monkeypatch):
+    """設定の言語が直接変わった場合も翻訳が切り替わることのテスト"""
+    store = Settings(Path(temp_dir) / 'settings.json')
+    store.SAVE_DELAY = 60
+    monkeypatch.setattr(i18n_module, 'settings', store)
+    store.language = 'ja'
+    translator = I18n(locales, Path(temp_dir) / 'cache')
+    assert translator.get('app.title') == 'タイトル'
+
+    # 設定ファイルの外部編集の読み込み直しと同じく、set_language を通らない変更
+    store.language = 'en'
+    assert translator.get('app.title') == 'Title'
+    assert translator.language == 'en'
+    store.flush()
+
+    # 翻訳の取得では設定を読まない
+    monkeypatch.setattr(store, '_get', None)
+    assert translator.get('app.title') == 'Title'
@@ -0,0 +1,86 @@
+import os
+import shutil
+import struct
+import zlib
+import pytest
+from pathlib import Path
+from image_validator import ImageValidator, read_png_size, validate_png, CARD_SIZE
+
+def _chunk(chunk_type: bytes, body: bytes) -> bytes:
+    return struct.pack('>I', len(body)) + chunk_type + body + struct.pack('>I', zlib.crc32(chunk_type + body))
+
+def _write_png(path: Path, width: int, height: int):
+    """最小限のPNGファイルを作成する"""
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0)
+    raw = b''.join(b'\x00' + b'\x00' * width for _ in range(height))
+    data = b'\x89PNG\r\n\x1a\n' + _chunk(b'IHDR', ihdr) + _chunk(b'IDAT', zlib.compress(raw)) + _chunk(b'IEND', b'')
+    path.write_bytes(data)
+
+@pytest.fixture
+def images_dir(temp_dir):
+    directory = Path(temp_dir) / 'images'
+    directory.mkdir()
+    return directory
+
+def test_read_png_size(test_image_path):
+    """IHDRからサイズを読み取るテスト"""
+    assert read_png_size(test_image_path) == CARD_SIZE
+
+def test_validate_valid_card(test_image_path):
+    """正しいカード画像の検証テスト"""
+    result = validate_png(test_image_path)
+    assert result.valid, result.error
+    assert (result.width, result.height) == CARD_SIZE
+
+def test_validate_wrong_size(images_dir):
+    """サイズが異なる画像が不正と判定されることのテスト"""
+    path = images_dir / 'akasha_vayu.png'
+    _write_png(path, 10, 20)
+
+    result = validate_png(str(path))
+    assert not result.valid
+    assert 'unexpected size 10x20' in result.error
+    assert validate_png(str(path), expected_size=None).valid
+
+def test_validate_corrupted(images_dir, test_image_path):
+    """破損したファイルが検出されることのテスト"""
+    data = bytearray(Path(test_image_path).read_bytes())
+    corrupted = images_dir / 'corrupted_crc.png'
+    data[40] ^= 0xFF
+    corrupted.write_bytes(bytes(data))
+    truncated = images_dir / 'truncated_file.png'
+    truncated.write_bytes(Path(test_image_path).read_bytes()[:-20])
+    not_png = images_dir / 'not_png.png'
+    not_png.write_bytes(b'GIF89a')
+
+    assert 'CRC mismatch' in validate_png(str(corrupted)).error
+    assert 'truncated' in validate_png(str(truncated)).error
+    assert validate_png(str(not_png)).error == 'invalid PNG signature'
+
+def test_validate_all_uses_cache(images_dir, temp_dir, test_image_path, monkeypatch):
+    """並列検証の結果がキャッシュされることのテスト"""
+    shutil.copy(test_image_path, images_dir / 'prithvi_prithvi.png')
+    _write_png(images_dir / 'apas_apas.png', 1, 1)
+    cache_file = Path(temp_dir) / 'cache.json'
+
+    results = ImageValidator(cache_file).validate_all(images_dir)
+    assert [r.valid for r in results.values()] == [False, True]
+    assert cache_file.exists()
+
+    calls = []
+    monkeypatch.setattr('image_validator.validate_png', lambda *args: calls.append(args))
+    cached = ImageValidator(cache_file).validate_all(images_dir)
+    assert calls == []
+    assert [r.valid for r in cached.values()] == [False, True]
+
+def test_cache_invalidated_on_change(images_dir, temp_dir):
+    """ファイル更新時に再検証されることのテスト"""
+    path = images_dir / 'tejas_tejas.png'
+    _write_png(path, 1, 1)
+    validator = ImageValidator(Path(temp_dir) / 'cache.json')
+    assert not validator.validate(str(path)).valid
+
+    _write_png(path, *CARD_SIZE)
+    mtime = os.path.getmtime(path) + 10
+    os.utime(path, (mtime, mtime))
+    assert validator.validate(str(path)).valid
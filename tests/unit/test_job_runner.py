@@ -0,0 +1,66 @@
+import threading
+import pytest
+from job_runner import JobCancelled, JobRunner
+
+@pytest.fixture
+def runner(app):
+    """1件ずつ実行するJobRunner"""
+    runner = JobRunner()
+    yield runner
+    runner.wait()
+
+def test_result_delivered_on_main_thread(runner, qtbot):
+    """戻り値がメインスレッドの on_result に渡されることを確認"""
+    results = []
+    worker = []
+
+    def work(a, b):
+        worker.append(threading.current_thread())
+        return a + b
+
+    runner.run(None, '', work, 1, 2, on_result=lambda result: results.append((result, threading.current_thread())))
+    qtbot.waitUntil(lambda: bool(results))
+    assert results[0] == (3, threading.main_thread())
+    assert worker[0] is not threading.main_thread()
+    qtbot.waitUntil(lambda: not runner.busy)
+
+def test_progress_and_cancel(runner, qtbot):
+    """進捗が通知され、取り消すと処理が中断されることを確認"""
+    reported, cancelled, results = [], [], []
+    started = threading.Event()
+    release = threading.Event()
+
+    def work(progress):
+        progress(1, 10)
+        started.set()
+        release.wait(5)
+        progress(2, 10)
+        return 'finished'
+
+    job = runner.run(None, '', work, cancellable=True,
+                     on_result=results.append, on_cancel=lambda: cancelled.append(True))
+    job.signals.progress.connect(lambda done, total: reported.append((done, total)))
+    assert started.wait(5)
+    job.cancel()
+    release.set()
+    qtbot.waitUntil(lambda: bool(cancelled))
+    assert results == []
+
+def test_errors_reported(runner, qtbot):
+    """例外のメッセージが on_error に渡されることを確認"""
+    errors = []
+
+    def work():
+        raise ValueError('broken')
+
+    runner.run(None, '', work, on_error=errors.append)
+    qtbot.waitUntil(lambda: bool(errors))
+    assert errors == ['broken']
+
+def test_report_raises_after_cancel(runner):
+    """取り消し後の report が JobCancelled を投げることを確認"""
+    job = runner.run(None, '', lambda: None)
+    runner.wait()
+    job.cancel()
+    with pytest.raises(JobCancelled):
+        job.report(1, 2)
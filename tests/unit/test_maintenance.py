@@ -0,0 +1,71 @@
+import sqlite3
+import time
+from pathlib import Path
+import pytest
+from maintenance import JOB_INTERVALS, MaintenanceScheduler
+
+@pytest.fixture
+def db_path(temp_dir):
+    """大きな行を追加してから削除した（空きページの多い）データベース"""
+    path = Path(temp_dir) / 'meditation.db'
+    with sqlite3.connect(path) as conn:
+        conn.execute('CREATE TABLE meditationrecord (id INTEGER PRIMARY KEY, notes TEXT)')
+        conn.executemany('INSERT INTO meditationrecord (notes) VALUES (?)', [('x' * 2000,)] * 2000)
+    with sqlite3.connect(path) as conn:
+        conn.execute('DELETE FROM meditationrecord WHERE id > 100')
+    return path
+
+def test_run_due_runs_all_jobs_and_records_them(db_path):
+    """初回は全ジョブが実行され、VACUUMでファイルが小さくなることを確認"""
+    before = db_path.stat().st_size
+    scheduler = MaintenanceScheduler(db_path)
+    results = scheduler.run_due()
+    assert set(results) == set(JOB_INTERVALS)
+    assert set(results.values()) == {'ok'}
+    assert db_path.stat().st_size < before / 4
+
+    runs = scheduler.last_runs()
+    assert runs['integrity_check']['detail'] == 'ok'
+    assert runs['vacuum']['duration'] >= 0
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+        # 期限が来るまでは何も実行しない
+        assert scheduler.due_jobs(conn) == []
+
+def test_incremental_vacuum_frees_pages(db_path):
+    """auto_vacuum を有効にした後の削除分が少しずつ解放されることを確認"""
+    scheduler = MaintenanceScheduler(db_path)
+    scheduler.run_due()
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('DELETE FROM meditationrecord')
+        assert conn.execute('PRAGMA freelist_count').fetchone()[0] > 0
+
+    scheduler.run_due(force=True)
+    assert scheduler.last_runs()['incremental_vacuum']['detail'].startswith('freed')
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute('PRAGMA freelist_count').fetchone()[0] == 0
+
+def test_pause_interrupts_maintenance(db_path):
+    """一時停止中はジョブが中断として記録されることを確認"""
+    scheduler = MaintenanceScheduler(db_path)
+    scheduler.pause()
+    assert scheduler.run_due() == {'incremental_vacuum': 'interrupted'}
+    assert scheduler.last_runs()['incremental_vacuum']['status'] == 'interrupted'
+
+    scheduler.resume()
+    assert set(scheduler.run_due().values()) == {'ok'}
+
+def test_background_thread_waits_for_idle(db_path):
+    """補助スレッドがアイドル時だけジョブを実行することを確認"""
+    scheduler = MaintenanceScheduler(db_path, idle_delay=0.0, check_interval=0.01)
+    scheduler.pause()
+    scheduler.start()
+    time.sleep(0.1)
+    assert scheduler.last_runs() == {}
+
+    scheduler.resume()
+    deadline = time.monotonic() + 5
+    while len(scheduler.last_runs()) < len(JOB_INTERVALS) and time.monotonic() < deadline:
+        time.sleep(0.02)
+    scheduler.stop()
+    assert set(scheduler.last_runs()) == set(JOB_INTERVALS)
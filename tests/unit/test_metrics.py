@@ -0,0 +1,90 @@
+import json
+import pytest
+from pathlib import Path
+from metrics import MetricsRegistry, Histogram
+from database import MeditationRecord, db
+
+@pytest.fixture
+def registry():
+    registry = MetricsRegistry()
+    registry.enable()
+    return registry
+
+def test_disabled_registry_records_nothing():
+    """無効時は計測値が記録されないことのテスト"""
+    registry = MetricsRegistry()
+    with registry.timer('noop'):
+        pass
+
+    @registry.timed('noop.func')
+    def func():
+        return 42
+
+    assert func() == 42
+    assert registry.snapshot() == {}
+
+def test_timer_and_decorator(registry):
+    """コンテキストマネージャとデコレータによる計測のテスト"""
+    with registry.timer('block'):
+        pass
+
+    @registry.timed('func')
+    def func(x):
+        return x * 2
+
+    assert func(2) == 4
+    assert func(3) == 6
+
+    snapshot = registry.snapshot()
+    assert snapshot['block']['count'] == 1
+    assert snapshot['func']['count'] == 2
+
+def test_timed_records_on_exception(registry):
+    """例外発生時も計測されることのテスト"""
+    @registry.timed('fail')
+    def fail():
+        raise ValueError()
+
+    with pytest.raises(ValueError):
+        fail()
+    assert registry.snapshot()['fail']['count'] == 1
+
+def test_histogram_buckets():
+    """ヒストグラムの集計テスト"""
+    histogram = Histogram()
+    for ms in (0.05, 3, 3, 700, 20000):
+        histogram.add(ms)
+
+    data = histogram.to_dict()
+    assert data['count'] == 5
+    assert data['max_ms'] == 20000
+    assert data['buckets']['le_0.1'] == 1
+    assert data['buckets']['le_5'] == 2
+    assert data['buckets']['le_1000'] == 1
+    assert data['buckets']['le_inf'] == 1
+    assert data['p50_ms'] == 5
+
+def test_dump_writes_json(registry, temp_dir):
+    """JSONへの書き出しテスト"""
+    registry.record('backup.create', 0.01)
+    path = registry.dump(Path(temp_dir) / 'metrics.json')
+
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    assert data['backup.create']['count'] == 1
+
+def test_sql_statements_are_timed(temp_dir, monkeypatch):
+    """peeweeのSQL実行が計測されることのテスト"""
+    from metrics import metrics
+    monkeypatch.setattr(metrics, 'enabled', True)
+    metrics.reset()
+
+    db.init(str(Path(temp_dir) / 'metrics.db'))
+    db.create_tables([MeditationRecord])
+    list(MeditationRecord.select())
+    db.close()
+
+    snapshot = metrics.snapshot()
+    metrics.reset()
+    assert snapshot['sql.create']['count'] >= 1
+    assert snapshot['sql.select']['count'] >= 1
@@ -0,0 +1,102 @@
+import csv
+import sqlite3
+from pathlib import Path
+import pytest
+from job_runner import JobCancelled
+from parallel_import import import_csv_parallel, parse_chunk, read_header, split_chunks
+
+HEADER = ['ID', 'Date', 'Start Time', 'End Time', 'Duration', 'Card Name', 'Notes']
+TABLE = 'meditationrecord'
+
+def _write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+
+def _row(i, notes='メモ'):
+    return [i, f'2024-01-{i % 28 + 1:02d}', '07:00:00', '07:10:00', 10, '地の地', notes]
+
+def _create_db(path):
+    with sqlite3.connect(path) as conn:
+        conn.execute(f"""
+            CREATE TABLE {TABLE} (id INTEGER PRIMARY KEY, date, start_time, end_time, duration,
+                                  card_name, notes, created_at, updated_at)
+        """)
+
+def test_chunks_end_on_record_boundaries(temp_dir):
+    """チャンクが引用符の中の改行では切れないことを確認"""
+    path = Path(temp_dir) / 'records.csv'
+    _write_csv(path, [_row(i, notes='1行目\n2行目\n"引用"') for i in range(200)])
+    fieldnames, start = read_header(path)
+    chunks = split_chunks(path, start, chunk_bytes=100)
+
+    assert len(chunks) > 1
+    assert chunks[0][0] == start and chunks[-1][1] == path.stat().st_size
+    assert all(a[1] == b[0] for a, b in zip(chunks, chunks[1:]))
+    rows = []
+    for chunk in chunks:
+        parsed, rejected, _ = parse_chunk(str(path), *chunk, fieldnames, '%Y-%m-%d', 'now')
+        assert rejected == []
+        rows.extend(parsed)
+    assert len(rows) == 200
+    assert all(row[5] == '1行目\n2行目\n"引用"' for row in rows)
+
+def test_read_header_requires_columns(temp_dir):
+    """必要な列がないCSVは読み込まないことを確認"""
+    path = Path(temp_dir) / 'other.csv'
+    path.write_text('when,minutes\n2024-01-01,10\n', encoding='utf-8')
+    with pytest.raises(ValueError):
+        read_header(path)
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_import_reports_rejected_lines(temp_dir, workers):
+    """変換できない行を飛ばし、ファイル上の行番号を報告することを確認"""
+    path = Path(temp_dir) / 'records.csv'
+    rows = [_row(i, notes='複数\n行') for i in range(300)]
+    rows[10][1] = 'not a date'
+    rows[250][4] = 'ten'
+    _write_csv(path, rows)
+    db_path = Path(temp_dir) / 'meditation.db'
+    _create_db(db_path)
+
+    reported = []
+    report = import_csv_parallel(db_path, path, TABLE, '%Y-%m-%d', workers=workers, chunk_bytes=1024,
+                                 progress=lambda done, total: reported.append((done, total)))
+
+    # ヘッダーが1行目で、各行は2行ずつ
+    assert [line for line, _ in report.rejected] == [2 + 10 * 2, 2 + 250 * 2]
+    assert 'ValueError' in report.rejected[0][1]
+    assert report.inserted == 298
+    assert reported[-1] == (path.stat().st_size, path.stat().st_size)
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute(f'SELECT COUNT(*) FROM {TABLE}').fetchone()[0] == 298
+
+def test_cancelled_import_writes_nothing(temp_dir):
+    """途中で中断した場合は何も書き込まないことを確認"""
+    path = Path(temp_dir) / 'records.csv'
+    _write_csv(path, [_row(i) for i in range(300)])
+    db_path = Path(temp_dir) / 'meditation.db'
+    _create_db(db_path)
+
+    def cancel(done, total):
+        if done < total:
+            raise JobCancelled()
+    with pytest.raises(JobCancelled):
+        import_csv_parallel(db_path, path, TABLE, '%Y-%m-%d', workers=2, chunk_bytes=1024, progress=cancel)
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute(f'SELECT COUNT(*) FROM {TABLE}').fetchone()[0] == 0
+
+def test_worker_error_is_raised(temp_dir):
+    """子プロセスでの変換の失敗が呼び出し側に伝わり、何も書き込まないことを確認"""
+    path = Path(temp_dir) / 'records.csv'
+    _write_csv(path, [_row(i) for i in range(300)])
+    with open(path, 'ab') as f:
+        f.write(b'\xff\xfe,broken\n')
+    db_path = Path(temp_dir) / 'meditation.db'
+    _create_db(db_path)
+
+    with pytest.raises(UnicodeDecodeError):
+        import_csv_parallel(db_path, path, TABLE, '%Y-%m-%d', workers=2, chunk_bytes=1024)
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute(f'SELECT COUNT(*) FROM {TABLE}').fetchone()[0] == 0
@@ -0,0 +1,80 @@
+import sqlite3
+from datetime import date
+from pathlib import Path
+import pytest
+from peewee import SqliteDatabase
+from archive import ArchiveManager
+from database import MeditationRecord
+from query_service import QueryService
+
+@pytest.fixture
+def service(temp_dir):
+    """記録を持つ一時データベースに対するQueryService"""
+    db_path = Path(temp_dir) / 'meditation.db'
+    database = SqliteDatabase(str(db_path))
+    with database.bind_ctx([MeditationRecord]):
+        database.create_tables([MeditationRecord])
+    _insert(db_path, [
+        ('2024-01-01 07:00:00', '地の地', 10),
+        ('2024-01-02 07:00:00', '地の水', 20),
+        ('2024-01-03 07:00:00', '水の火', 30),
+        ('2024-01-03 21:00:00', '地の地', 5),
+        ('2024-02-10 07:00:00', '地の地', 15),
+    ])
+    with database.bind_ctx([MeditationRecord]):
+        yield QueryService(database, archives=ArchiveManager(db_path))
+    database.close()
+
+def _insert(db_path, sessions):
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany(
+            "INSERT INTO meditationrecord (date, start_time, end_time, duration, card_name, notes, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, '', ?, ?)",
+            [(start[:10], start, start, duration, card, start, start) for start, card, duration in sessions]
+        )
+
+def test_aggregates(service):
+    """期間・カード・元素ごとの集計と最近の瞑想を確認"""
+    assert service.totals('month') == [
+        {'period': '2024-01', 'sessions': 4, 'minutes': 65},
+        {'period': '2024-02', 'sessions': 1, 'minutes': 15},
+    ]
+    assert [row['period'] for row in service.totals('day', start=date(2024, 1, 2), end=date(2024, 1, 3))] == \
+        ['2024-01-02', '2024-01-03']
+    assert service.card_stats()[0] == {'card_name': '地の地', 'sessions': 3, 'minutes': 30,
+                                       'average': 10.0, 'last_session': '2024-02-10 07:00:00'}
+    assert [(row['element'], row['sessions'], row['minutes']) for row in service.element_stats()] == \
+        [('地', 4, 50), ('水', 1, 30)]
+    assert [row['card_name'] for row in service.recent_sessions(2)] == ['地の地', '地の地']
+    with pytest.raises(ValueError):
+        service.totals('decade')
+
+def test_streaks(service):
+    """最長と現在の連続日数を確認"""
+    assert service.streaks(today=date(2024, 2, 11)) == {
+        'current': 1, 'longest': 3, 'longest_start': '2024-01-01', 'longest_end': '2024-01-03'}
+    assert service.streaks(today=date(2024, 2, 12))['current'] == 0
+
+def test_cache_invalidated_by_changes(service, temp_dir):
+    """変更がなければキャッシュから返し、どの接続からの変更でも取り直すことを確認"""
+    first = service.card_stats()
+    assert service.card_stats() is first
+    assert (service.hits, service.misses) == (1, 1)
+
+    # 別の接続からの変更（PRAGMA data_version）
+    _insert(Path(temp_dir) / 'meditation.db', [('2024-02-11 07:00:00', '火の火', 10)])
+    assert len(service.card_stats()) == len(first) + 1
+
+    # 同じ接続からの変更（total_changes）
+    MeditationRecord.delete().where(MeditationRecord.card_name == '火の火').execute()
+    assert service.card_stats() == first
+    assert service.misses == 3
+
+def test_cache_is_bounded(service):
+    """保持するクエリの数が上限を超えないことを確認"""
+    service.cache_size = 2
+    for limit in range(1, 5):
+        service.recent_sessions(limit)
+    assert len(service._cache) == 2
+    service.recent_sessions(4)
+    assert service.hits == 1
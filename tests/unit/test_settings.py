@@ -0,0 +1,116 @@
+import gc
+import json
+import os
+import time
+import weakref
+import pytest
+from pathlib import Path
+from settings import Settings
+
+@pytest.fixture
+def settings_store(temp_dir):
+    """一時ディレクトリの設定ファイルを使うSettingsインスタンスを提供する"""
+    store = Settings(Path(temp_dir) / 'settings.json')
+    store.SAVE_DELAY = 60  # テスト中にタイマーで書き込まれないようにする
+    yield store
+    store.flush()
+
+def test_setters_are_buffered(settings_store):
+    """設定変更がすぐにはファイルへ書き込まれないことのテスト"""
+    settings_store.language = 'en'
+    settings_store.date_format = 'yyyy/mm/dd'
+
+    assert settings_store.dirty
+    assert not settings_store.settings_file.exists()
+    assert settings_store.language == 'en'
+
+def test_flush_writes_once(settings_store):
+    """flushで変更がまとめて保存されることのテスト"""
+    settings_store.language = 'en'
+    settings_store.last_backup = '20250101_000000'
+    settings_store.flush()
+
+    assert not settings_store.dirty
+    with open(settings_store.settings_file, 'r', encoding='utf-8') as f:
+        saved = json.load(f)
+    assert saved['language'] == 'en'
+    assert saved['last_backup'] == '20250101_000000'
+    # 一時ファイルが残っていないことを確認
+    assert list(settings_store.settings_file.parent.glob('*.tmp')) == []
+
+def test_unchanged_value_is_not_dirty(settings_store):
+    """同じ値の設定では書き込みが予約されないことのテスト"""
+    settings_store.language = settings_store.language
+    assert not settings_store.dirty
+
+def test_debounce_timer_flushes(temp_dir):
+    """待機時間経過後に自動保存されることのテスト"""
+    store = Settings(Path(temp_dir) / 'settings.json')
+    store.SAVE_DELAY = 0.05
+    store.language = 'en'
+
+    deadline = time.monotonic() + 2
+    while store.dirty and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert not store.dirty
+    assert store.settings_file.exists()
+
+def test_reload_on_external_change(settings_store):
+    """他のプロセスによる変更を読み込み直すことのテスト"""
+    settings_store.language = 'en'
+    settings_store.flush()
+
+    with open(settings_store.settings_file, 'w', encoding='utf-8') as f:
+        json.dump({'language': 'ja', 'date_format': 'yyyy/mm/dd'}, f)
+    mtime = os.path.getmtime(settings_store.settings_file) + 10
+    os.utime(settings_store.settings_file, (mtime, mtime))
+
+    # 未保存の変更はファイルより優先される
+    settings_store.backup_dir = '/tmp/backups'
+    settings_store.RELOAD_INTERVAL = 0
+
+    assert settings_store.language == 'ja'
+    assert settings_store.date_format == 'yyyy/mm/dd'
+    assert settings_store.backup_dir == Path('/tmp/backups')
+
+def test_listeners_see_local_and_external_changes(settings_store):
+    """値の変更と外部での変更の読み込み直しで登録した関数が呼ばれることのテスト"""
+    seen = []
+    settings_store.add_listener('language', seen.append)
+    settings_store.language = 'en'
+    settings_store.language = 'en'
+    settings_store.flush()
+
+    with open(settings_store.settings_file, 'w', encoding='utf-8') as f:
+        json.dump({'language': 'ja', 'date_format': 'yyyy/mm/dd'}, f)
+    mtime = os.path.getmtime(settings_store.settings_file) + 10
+    os.utime(settings_store.settings_file, (mtime, mtime))
+    settings_store.RELOAD_INTERVAL = 0
+    assert settings_store.date_format == 'yyyy/mm/dd'
+
+    assert seen == ['en', 'ja']
+
+def test_debounce_restarts_on_each_change(temp_dir):
+    """変更が続く間は保存が先送りされることのテスト"""
+    store = Settings(Path(temp_dir) / 'settings.json')
+    store.SAVE_DELAY = 0.3
+    store.language = 'en'
+    time.sleep(0.2)
+    store.date_format = 'yyyy/mm/dd'
+    time.sleep(0.2)
+    # 最初の変更からは待機時間が過ぎているが、最後の変更からはまだ
+    assert not store.settings_file.exists()
+
+    deadline = time.monotonic() + 2
+    while store.dirty and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not store.dirty
+
+def test_instances_are_not_kept_for_exit(temp_dir):
+    """終了時の保存のためにインスタンスが残り続けないことのテスト"""
+    store = Settings(Path(temp_dir) / 'settings.json')
+    ref = weakref.ref(store)
+    del store
+    gc.collect()
+    assert ref() is None
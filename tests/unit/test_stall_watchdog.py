@@ -0,0 +1,49 @@
+import time
+import pytest
+from PySide6.QtWidgets import QApplication
+from stall_watchdog import StallWatchdog
+
+def _pump(seconds):
+    """指定時間イベントループを回す"""
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        QApplication.processEvents()
+        time.sleep(0.002)
+
+def _block_main_thread(seconds):
+    time.sleep(seconds)
+
+@pytest.fixture
+def watchdog(app):
+    watchdog = StallWatchdog(threshold=0.1, interval=0.01)
+    watchdog.start()
+    yield watchdog
+    watchdog.stop()
+
+def test_no_stall_while_responsive(watchdog):
+    """イベントループが回っている間は停止が記録されないことのテスト"""
+    _pump(0.2)
+    assert watchdog.stalls() == []
+
+def test_stall_is_recorded_with_stack(watchdog):
+    """メインスレッドの停止がスタック付きで記録されることのテスト"""
+    _pump(0.05)
+    _block_main_thread(0.3)
+    _pump(0.05)
+
+    stalls = watchdog.stalls()
+    assert len(stalls) == 1
+    assert stalls[0].finished
+    assert stalls[0].duration >= 0.3
+    assert '_block_main_thread' in stalls[0].stack
+    assert stalls[0].to_dict()['duration_ms'] >= 300
+
+def test_stop_is_idempotent(app):
+    """開始前や二重の停止でエラーにならないことのテスト"""
+    watchdog = StallWatchdog()
+    watchdog.stop()
+    watchdog.start()
+    assert watchdog.running
+    watchdog.stop()
+    watchdog.stop()
+    assert not watchdog.running
@@ -0,0 +1,117 @@
+import random
+import sqlite3
+from datetime import date
+from pathlib import Path
+import pytest
+from peewee import SqliteDatabase
+import change_log
+from archive import ArchiveManager
+from database import MeditationRecord
+from streak_engine import StreakEngine
+
+def _day(text):
+    return date.fromisoformat(text).toordinal()
+
+def _summary(engine, today):
+    stats = engine.stats(today)
+    return (stats['current'], stats['longest'], stats['active_days'], stats['sessions'],
+            stats['weekday_consistency'], stats['gaps'], engine._starts, engine._ends)
+
+def test_stats_from_days():
+    """連続日数・曜日ごとの継続率・空白の統計を確認"""
+    engine = StreakEngine()
+    # 2024-01-01 は月曜日
+    engine.load_days([_day(d) for d in ('2024-01-01', '2024-01-02', '2024-01-02', '2024-01-03',
+                                        '2024-01-08', '2024-01-10', '2024-01-11')])
+    stats = engine.stats(today=date(2024, 1, 12))
+    assert (stats['current'], stats['longest'], stats['active_days'], stats['sessions']) == (2, 3, 6, 7)
+    assert stats['gaps'] == {'count': 2, 'longest': 4, 'average': 2.5}
+    # 1/1〜1/14 で月曜は2回とも瞑想している
+    assert stats['weekday_consistency'][0] == 1.0
+    assert stats['weekday_consistency'][4] == 0.0
+    assert engine.current_streak(today=date(2024, 1, 14)) == 0
+
+def test_incremental_matches_full_recompute():
+    """1日ずつの追加・削除の結果が全体の計算と一致することを確認"""
+    rng = random.Random(1)
+    engine = StreakEngine()
+    engine.load_days([])
+    sessions = []
+    base = _day('2024-01-01')
+    for _ in range(2000):
+        if sessions and rng.random() < 0.4:
+            engine.remove_session(sessions.pop(rng.randrange(len(sessions))))
+        else:
+            day = base + rng.randrange(120)
+            sessions.append(day)
+            engine.add_session(day)
+    expected = StreakEngine()
+    expected.load_days(sessions)
+    today = date(2024, 5, 1)
+    assert _summary(engine, today) == _summary(expected, today)
+
+@pytest.fixture
+def database(temp_dir):
+    """変更ログ付きの一時データベース"""
+    db_path = Path(temp_dir) / 'meditation.db'
+    database = SqliteDatabase(str(db_path))
+    with database.bind_ctx([MeditationRecord]):
+        database.create_tables([MeditationRecord])
+        change_log.install(database.connection())
+        yield database
+    database.close()
+
+def _insert(conn, *starts):
+    conn.executemany(
+        "INSERT INTO meditationrecord (date, start_time, end_time, duration, card_name, notes, created_at, updated_at) "
+        "VALUES (?, ?, ?, 10, '地の地', '', ?, ?)",
+        [(start[:10], start, start, start, start) for start in starts]
+    )
+
+def test_refresh_follows_change_log(database, temp_dir):
+    """保存・日付の変更・削除が変更ログから反映されることを確認"""
+    conn = database.connection()
+    _insert(conn, '2024-01-01 07:00:00', '2024-01-02 07:00:00')
+    engine = StreakEngine(database, ArchiveManager(Path(temp_dir) / 'meditation.db'))
+    assert engine.refresh() == -1
+    assert engine.longest_streak() == 2
+
+    _insert(conn, '2024-01-03 07:00:00')
+    conn.execute("UPDATE meditationrecord SET date = '2024-01-05' WHERE id = 1")
+    assert engine.refresh() == 2
+    assert engine.longest_streak() == 2
+    assert engine.gap_stats()['count'] == 1
+
+    conn.execute('DELETE FROM meditationrecord WHERE id = 2')
+    assert engine.refresh() == 1
+    assert engine.stats()['active_days'] == 2
+    assert engine.refresh() == 0
+    assert change_log.consumer_cursor(conn, 'streaks') == change_log.latest_seq(conn)
+
+def test_reload_counts_archived_sessions(database, temp_dir):
+    """アーカイブに移した記録も連続日数に含まれることを確認"""
+    db_path = Path(temp_dir) / 'meditation.db'
+    conn = database.connection()
+    _insert(conn, '2021-12-30 07:00:00', '2021-12-31 07:00:00', '2022-01-01 07:00:00')
+    archives = ArchiveManager(db_path)
+    assert archives.archive_old_sessions(older_than_days=30) == {2021: 2, 2022: 1}
+    _insert(conn, '2022-01-02 07:00:00')
+
+    engine = StreakEngine(database, archives)
+    engine.reload()
+    assert engine.longest_streak() == 4
+    assert len(engine._record_days) == 1
+
+def test_refresh_without_change_log(temp_dir):
+    """変更ログのないデータベースでは毎回全体を計算し直すことを確認"""
+    database = SqliteDatabase(str(Path(temp_dir) / 'meditation.db'))
+    with database.bind_ctx([MeditationRecord]):
+        database.create_tables([MeditationRecord])
+        conn = database.connection()
+        _insert(conn, '2024-01-01 07:00:00')
+        engine = StreakEngine(database, ArchiveManager(Path(temp_dir) / 'meditation.db'))
+        assert engine.refresh() == -1
+        _insert(conn, '2024-01-02 07:00:00')
+        assert engine.refresh() == -1
+        assert engine.longest_streak() == 2
+    database.close()
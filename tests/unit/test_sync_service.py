@@ -0,0 +1,172 @@
+import gzip
+import http.client
+import sqlite3
+from pathlib import Path
+import pytest
+import change_log
+from sync_service import (MAX_BODY_BYTES, MAX_PAYLOAD_BYTES, PayloadTooLarge, SyncClient, SyncServer,
+                          apply_changes, decode_payload, encode_payload, open_database)
+
+def _insert(conn, start, card='地の地', notes='', updated='2024-01-01 10:00:00'):
+    conn.execute(
+        "INSERT INTO meditationrecord (date, start_time, end_time, duration, card_name, notes, created_at, updated_at) "
+        "VALUES (?, ?, ?, 10, ?, ?, ?, ?)",
+        (start[:10], start, start[:11] + '23:59:00', card, notes, updated, updated)
+    )
+
+def _sessions(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return sorted(conn.execute('SELECT start_time, card_name, notes FROM meditationrecord').fetchall())
+
+@pytest.fixture
+def server(temp_dir):
+    """一時データベースを配信する同期サーバー"""
+    server = SyncServer(Path(temp_dir) / 'server.db', host='127.0.0.1', port=0, token='secret')
+    server.start()
+    yield server
+    server.stop()
+
+def test_payload_roundtrip():
+    """ペイロードが圧縮されて元に戻ることを確認"""
+    data = {'changes': [{'notes': '平和な瞑想'}] * 100}
+    payload = encode_payload(data)
+    assert len(payload) < len(str(data))
+    assert decode_payload(payload) == data
+
+def test_payload_expansion_is_bounded():
+    """展開すると上限を超える本文を読み込まないことを確認"""
+    bomb = gzip.compress(b'[' + b' ' * (MAX_PAYLOAD_BYTES + 1) + b']')
+    assert len(bomb) < MAX_BODY_BYTES
+    with pytest.raises(PayloadTooLarge):
+        decode_payload(bomb)
+    with pytest.raises(ValueError):
+        decode_payload(b'not gzip')
+
+def test_changes_since_coalesces_updates(temp_dir):
+    """同じ記録への複数の変更が1件にまとまることを確認"""
+    conn = open_database(Path(temp_dir) / 'test.db')
+    _insert(conn, '2024-01-01 07:00:00')
+    conn.execute("UPDATE meditationrecord SET notes = 'a'")
+    conn.execute("UPDATE meditationrecord SET notes = 'b'")
+    changes, cursor = change_log.changes_since(conn, 0)
+    assert len(changes) == 1
+    assert changes[0]['record']['notes'] == 'b'
+    assert cursor == change_log.latest_seq(conn)
+    assert change_log.changes_since(conn, cursor) == ([], cursor)
+
+    conn.execute('DELETE FROM meditationrecord')
+    changes, _ = change_log.changes_since(conn, cursor)
+    assert changes[0]['op'] == 'delete'
+    assert changes[0]['start_time'] == '2024-01-01 07:00:00'
+    conn.close()
+
+def test_apply_changes_is_idempotent_and_marks_remote(temp_dir):
+    """反映が冪等で、反映による変更が送信対象にならないことを確認"""
+    source = open_database(Path(temp_dir) / 'a.db')
+    target = open_database(Path(temp_dir) / 'b.db')
+    _insert(source, '2024-01-01 07:00:00', notes='one')
+    changes, _ = change_log.changes_since(source, 0)
+
+    assert apply_changes(target, changes) == 1
+    assert apply_changes(target, changes) == 0
+    assert change_log.changes_since(target, 0, origin='local')[0] == []
+    source.close()
+    target.close()
+
+def test_clients_converge_through_server(server, temp_dir):
+    """2台の端末がサーバー経由で追加・更新・削除を同期できることを確認"""
+    url = f'http://127.0.0.1:{server.port}'
+    a = SyncClient(url, Path(temp_dir) / 'a.db', token='secret', batch_size=2)
+    b = SyncClient(url, Path(temp_dir) / 'b.db', token='secret', batch_size=2)
+
+    for day in range(1, 6):
+        _insert(a.conn, f'2024-01-0{day} 07:00:00', notes=f'a{day}')
+    _insert(b.conn, '2024-02-01 07:00:00', notes='b')
+
+    assert a.sync() == (5, 0)
+    assert b.sync() == (1, 5)
+    a.sync()
+    assert _sessions(Path(temp_dir) / 'a.db') == _sessions(Path(temp_dir) / 'b.db')
+    assert len(_sessions(Path(temp_dir) / 'server.db')) == 6
+
+    # 新しい更新が優先され、削除も伝わる
+    b.conn.execute("UPDATE meditationrecord SET notes = 'edited', updated_at = '2024-03-01 00:00:00' "
+                   "WHERE start_time = '2024-01-01 07:00:00'")
+    b.conn.execute("DELETE FROM meditationrecord WHERE start_time = '2024-01-02 07:00:00'")
+    b.sync()
+    a.sync()
+    sessions = _sessions(Path(temp_dir) / 'a.db')
+    assert sessions == _sessions(Path(temp_dir) / 'b.db')
+    assert ('2024-01-01 07:00:00', '地の地', 'edited') in sessions
+    assert all(start != '2024-01-02 07:00:00' for start, _, _ in sessions)
+
+    a.close()
+    b.close()
+
+def test_server_rejects_invalid_token(server, temp_dir):
+    """トークンが一致しない場合は拒否されることを確認"""
+    client = SyncClient(f'http://127.0.0.1:{server.port}', Path(temp_dir) / 'c.db', token='wrong')
+    with pytest.raises(ConnectionError):
+        client.pull()
+    client.close()
+
+def test_server_requires_token_off_loopback(temp_dir):
+    """トークンなしではこの端末以外から接続できるアドレスで待ち受けないことを確認"""
+    with pytest.raises(ValueError):
+        SyncServer(Path(temp_dir) / 'server.db', host='0.0.0.0')
+    assert SyncServer(Path(temp_dir) / 'server.db').host == '127.0.0.1'
+    assert SyncServer(Path(temp_dir) / 'server.db', host='0.0.0.0', token='secret').host == '0.0.0.0'
+
+def test_server_rejects_large_body(server):
+    """上限を超える本文の要求には 413 を返すことを確認"""
+    conn = http.client.HTTPConnection('127.0.0.1', server.port, timeout=5)
+    conn.putrequest('POST', '/changes')
+    conn.putheader('X-Sync-Token', 'secret')
+    conn.putheader('Content-Length', str(MAX_BODY_BYTES + 1))
+    conn.endheaders()
+    response = conn.getresponse()
+    assert response.status == 413
+    conn.close()
+
+def test_server_rejects_invalid_limit(server):
+    """件数の上限に1未満を指定した要求には 400 を返すことを確認"""
+    conn = http.client.HTTPConnection('127.0.0.1', server.port, timeout=5)
+    for limit, status in (('-1', 400), ('0', 400), ('1', 200)):
+        conn.request('GET', f'/changes?since=0&limit={limit}', headers={'X-Sync-Token': 'secret'})
+        response = conn.getresponse()
+        response.read()
+        assert response.status == status
+    conn.close()
+
+def test_compaction_keeps_unsent_deletes(server, temp_dir):
+    """他の処理する側が読み終えても、送信前の削除は圧縮で消えないことを確認"""
+    url = f'http://127.0.0.1:{server.port}'
+    client = SyncClient(url, Path(temp_dir) / 'a.db', token='secret')
+    _insert(client.conn, '2024-01-01 07:00:00')
+    client.push()
+    client.conn.execute('DELETE FROM meditationrecord')
+    # 差分エクスポートなどの別の処理する側が削除まで読み終えた
+    change_log.advance_consumer(client.conn, 'export.csv', change_log.latest_seq(client.conn))
+    change_log.compact(client.conn)
+
+    client.push()
+    assert _sessions(Path(temp_dir) / 'server.db') == []
+    client.close()
+
+def test_server_keeps_deletes_for_clients(server, temp_dir):
+    """サーバーはクライアントが受け取る前の削除を圧縮で消さないことを確認"""
+    url = f'http://127.0.0.1:{server.port}'
+    a = SyncClient(url, Path(temp_dir) / 'a.db', token='secret')
+    b = SyncClient(url, Path(temp_dir) / 'b.db', token='secret')
+    _insert(a.conn, '2024-01-01 07:00:00')
+    a.sync()
+    b.sync()
+    a.conn.execute('DELETE FROM meditationrecord')
+    a.sync()
+    with sqlite3.connect(Path(temp_dir) / 'server.db') as conn:
+        change_log.compact(conn)
+
+    b.sync()
+    assert _sessions(Path(temp_dir) / 'b.db') == []
+    a.close()
+    b.close()